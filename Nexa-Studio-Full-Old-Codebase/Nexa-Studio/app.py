@@ -7,34 +7,48 @@ import psycopg2.extras
 import logging
 import atexit
 import re
-import io
-import base64
 import random
 import string
 import time
 import uuid
+import base64
+import hashlib
+import contextvars
+from contextlib import ExitStack, closing
+from concurrent.futures import ThreadPoolExecutor
 
 # Set library path for WeasyPrint
 os.environ["LD_LIBRARY_PATH"] = os.getcwd()
 from weasyprint import HTML
 
 # Flask imports
-from flask import Flask, render_template, request, send_file, jsonify, session, redirect, url_for
+from flask import Flask, Response, stream_with_context, render_template, request, send_file, jsonify, session, redirect, url_for
 
 # Utility imports
 from utils.pdf_generator import generate_pdf, generate_sow_pdf_document, generate_loe_pdf_document
-from utils.image_analysis import upload_to_imgbb, analyze_image_with_openai
+from utils.image_analysis import analyze_image_with_openai
 from utils.vision_api import analyze_image_with_vision_api, generate_stack_analysis_with_openai
+from utils.session_store import (SessionStore, SessionLocked, create_backend, begin_request, end_request,
+                                  request_scope, mark_dirty, lock_timed_out)
+from utils.db_pool import ConnectionPool
+from utils.session_writer import SessionWriter
+from utils.json_patch import apply_patch, changed_paths, check_protected, JsonPatchError
+from utils.log_payload import log_payload
+from utils.openai_client import get_openai_client, TIMEOUT_CHAT, TIMEOUT_ASSISTANT_STEP
+from utils.pipeline import Pipeline
+from utils.llm_cache import llm_cache, set_cache_bypass, bypass_cache
+from utils.assistant_runner import run_assistant
+from utils.jobs import JobQueue, JobQueueFull, job_progress, FINISHED as JOB_FINISHED
+from utils.llm_stream import stream_completion, sse_event
+from utils.image_pipeline import prepare_image, decode_data_url, image_mime_type, ImageError
+from utils.blob_store import create_blob_store, blob_url, key_from_url
 
 # Environment and OpenAI
 from dotenv import load_dotenv
 from psycopg2 import sql
-import openai
-from openai import OpenAI
 
 # LangFuse imports
 from langfuse import Langfuse
-from langfuse.openai import openai as langfuse_openai
 
 # Load environment variables from .env file if it exists
 load_dotenv()
@@ -65,23 +79,74 @@ except Exception as e:
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
 
-# Global solution session dictionary to store user data
-solution_session = {}
+# Editing sessions live in a bounded store (TTL + LRU + memory budget) with
+# per-session locking. SESSION_STORE_BACKEND=sqlite shares them between
+# gunicorn workers; the default keeps them in this process.
+session_backend = create_backend()
+
+# Solution sessions to store user data
+solution_session = SessionStore('solution', session_backend)
+
+# SoW sessions to store SoW data
+sow_session = SessionStore('sow', session_backend)
 
-# Global SoW session dictionary to store SoW data
-sow_session = {}
+# Structuring sessions to store structuring data
+structuring_session = SessionStore('structuring', session_backend)
 
-# Global structuring session dictionary to store structuring data
-structuring_session = {}
+# Visuals sessions to store visuals data
+visuals_session = SessionStore('visuals', session_backend)
 
-# Global visuals session dictionary to store visuals data
-visuals_session = {}
+# LoE sessions to store LoE data
+loe_session = SessionStore('loe', session_backend)
 
-# Global LoE session dictionary to store LoE data
-loe_session = {}
+# Generic sessions to store session data
+global_sessions = SessionStore('global', session_backend)
 
-# Global sessions dictionary to store session data
-global_sessions = {}
+@app.before_request
+def open_session_scope():
+    """Sessions touched by a request stay locked and are written back when it ends."""
+    begin_request()
+
+@app.after_request
+def answer_session_lock_timeout(response):
+    """
+    A request that could not get a session's lock has failed, whatever its
+    route made of the error: answer 503 so the client retries the edit.
+    """
+    error = lock_timed_out()
+    if error is None:
+        return response
+    response = jsonify({
+        'success': False,
+        'message': f'{str(error)}, please retry'
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+@app.errorhandler(SessionLocked)
+def session_locked(error):
+    return jsonify({
+        'success': False,
+        'message': f'{str(error)}, please retry'
+    }), 503, {'Retry-After': '1'}
+
+@app.teardown_request
+def close_session_scope(exception=None):
+    end_request()
+
+def llm_cache_bypass_requested():
+    """?nocache=1 or an X-LLM-Cache: bypass header asks for fresh model responses."""
+    return (request.args.get('nocache') == '1' or
+            request.headers.get('X-LLM-Cache', '').lower() == 'bypass')
+
+@app.before_request
+def read_llm_cache_bypass():
+    set_cache_bypass(llm_cache_bypass_requested())
+
+@app.teardown_request
+def clear_llm_cache_bypass(exception=None):
+    set_cache_bypass(False)
 
 # Function to generate a random session identifier
 def generate_session_id():
@@ -90,31 +155,334 @@ def generate_session_id():
     letters = ''.join(random.choices(string.ascii_uppercase + string.ascii_lowercase, k=8))
     return f"{letters}{timestamp}"
 
+# Shared PostgreSQL connection pool (DATABASE_URL or PG* settings, sized by
+# DB_POOL_MIN_SIZE/DB_POOL_MAX_SIZE). Connections are reused across requests
+# instead of paying TCP/TLS/auth setup on every query.
+db_pool = ConnectionPool()
+atexit.register(db_pool.close_all)
+
 # Database connection function
 def get_db_connection():
-    """Get PostgreSQL database connection"""
+    """
+    Check out a pooled PostgreSQL connection. conn.close() returns it to the
+    pool; prefer `with db_pool.connection() as conn:` in new code.
+    """
     try:
-        # Try to get database URL from environment, fallback to default Replit PostgreSQL
-        database_url = os.environ.get("DATABASE_URL")
-        if database_url:
-            conn = psycopg2.connect(database_url)
-        else:
-            # Default Replit PostgreSQL connection
-            conn = psycopg2.connect(
-                host=os.environ.get("PGHOST", "localhost"),
-                database=os.environ.get("PGDATABASE", "postgres"),
-                user=os.environ.get("PGUSER", "postgres"),
-                password=os.environ.get("PGPASSWORD", ""),
-                port=os.environ.get("PGPORT", "5432")
-            )
-        return conn
+        return db_pool.acquire()
     except Exception as e:
         logger.error(f"Database connection error: {str(e)}")
         return None
 
+# Write-behind persistence of the editing sessions into ai_architecture_sessions
+session_writer = SessionWriter(db_pool)
+session_writer.register('solution', solution_session, 'session_objects',
+                        lambda data: (data.get('basic', {}).get('title', ''),
+                                      data.get('basic', {}).get('prepared_for', '')))
+session_writer.register('sow', sow_session, 'sow_objects',
+                        lambda data: (data.get('project', ''), data.get('client', '')))
+session_writer.register('structuring', structuring_session, 'diagram_texts_json',
+                        lambda data: (data.get('basic', {}).get('title', ''),
+                                      data.get('basic', {}).get('client', '')))
+session_writer.register('visuals', visuals_session, 'visual_assets_json',
+                        lambda data: (data.get('basic', {}).get('title', ''),
+                                      data.get('basic', {}).get('client', '')))
+session_writer.register('loe', loe_session, 'loe_objects',
+                        lambda data: (data.get('basic', {}).get('project', ''),
+                                      data.get('basic', {}).get('client', '')))
+session_writer.start()
+# Registered after the pool so it runs first at exit, while connections remain
+atexit.register(session_writer.stop)
+
+# Background jobs for the long-running generation routes. Each job runs in
+# its own session scope, like a request.
+job_queue = JobQueue(setup=begin_request, teardown=end_request)
+atexit.register(job_queue.shutdown)
+
+# Uploaded images, stored once by content hash. Sessions reference them as
+# /blobs/<sha256> instead of carrying base64 data URLs.
+blob_store = create_blob_store()
+
+# Seconds between keep-alive comments on an idle job event stream
+JOB_EVENTS_HEARTBEAT = 15
+
+def wants_background_job(data):
+    """Clients opt in to a background job with {"async": true}, ?async=1 or Prefer: respond-async."""
+    return (bool((data or {}).get('async')) or request.args.get('async') == '1' or
+            'respond-async' in request.headers.get('Prefer', ''))
+
+def respond_with_job(kind, key, data, func, *args):
+    """
+    Answer a long-running generation route: run func(*args), which returns
+    (response body, HTTP status), inline as before, or, if the client asked
+    for it, as a background job answered at once with 202 and the job's
+    status and event-stream URLs.
+
+    Args:
+        kind (str): Job kind, e.g. "solution-to-sow"
+        key (str): Identifies the work (e.g. the session id); resubmitting
+            while a job for it is queued or running returns that job. An
+            Idempotency-Key header replaces it and also matches finished jobs.
+        data (dict): Request body
+    """
+    if not wants_background_job(data):
+        body, status = func(*args)
+        return jsonify(body), status
+
+    client_key = request.headers.get('Idempotency-Key')
+    try:
+        job, created = job_queue.submit(kind, func, *args,
+                                        key=f"{kind}:{client_key or key}",
+                                        reuse_finished=bool(client_key))
+    except JobQueueFull as e:
+        return jsonify({
+            'success': False,
+            'message': f'Server busy ({str(e)}). Please try again shortly.'
+        }), 503, {'Retry-After': '10'}
+
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'created': created,
+        'status_url': url_for('job_status', job_id=job.id),
+        'events_url': url_for('job_events', job_id=job.id)
+    }), 202
+
+def wants_event_stream(data):
+    """Clients opt in to token streaming with {"stream": true}, ?stream=1 or Accept: text/event-stream."""
+    return (bool((data or {}).get('stream')) or request.args.get('stream') == '1' or
+            'text/event-stream' in request.headers.get('Accept', ''))
+
+def stream_generation(name, fragments, finish, error_message, trace_input=None, session_id=None):
+    """
+    Answer a text-generation route as server-sent events: a "token" event
+    for each piece of the model's response as it arrives, then a "done"
+    event carrying the JSON body the route returns when not streaming, or
+    an "error" event if generation failed. The route's LangFuse span stays
+    open until the stream ends, finish() runs in a session scope of its own,
+    and a client that disconnects stops generation.
+
+    Args:
+        name (str): Route name, used for the trace span, e.g. "enhance-explanation"
+        fragments (callable): Starts the model call; returns an iterator of text pieces
+        finish (callable): finish(full_text) -> (response body, HTTP status); applies
+            any session update, as the non-streaming route does
+        error_message (str): Prefix of the error event's message
+        trace_input (dict, optional): Span input
+        session_id (str, optional): Trace session id
+    """
+    metadata = {
+        "route": request.path,
+        "method": request.method,
+        "user_agent": request.headers.get('User-Agent', ''),
+        "ip_address": request.remote_addr,
+        "streaming": True
+    }
+    user_id = request.headers.get('X-User-ID', 'anonymous')
+    # stream_with_context keeps the request context open while the stream is
+    # read and runs its teardown only when the stream ends, so the stream
+    # pins the cache bypass itself, and the request's session scope is
+    # closed before the stream starts (below): its locks would otherwise be
+    # held for the whole generation. finish() locks what it edits in a
+    # scope of its own.
+    cache_bypass = llm_cache_bypass_requested()
+
+    def generate():
+        with ExitStack() as trace:
+            trace.enter_context(bypass_cache(cache_bypass))
+            span = None
+            if langfuse:
+                try:
+                    span = trace.enter_context(langfuse.start_as_current_span(name=name, metadata=metadata))
+                    span.update_trace(user_id=user_id, session_id=session_id or None)
+                    if trace_input:
+                        span.update(input=trace_input)
+                except Exception as trace_error:
+                    logger.error(f"Error in LangFuse tracing for /{name}: {str(trace_error)}")
+
+            # Send the headers now rather than with the first token
+            yield ": stream open\n\n"
+
+            started = time.time()
+            first_token_ms = None
+            parts = []
+            try:
+                with closing(iter(fragments())) as stream:
+                    for text in stream:
+                        if first_token_ms is None:
+                            first_token_ms = (time.time() - started) * 1000
+                            logger.info(f"⚡ /{name}: first token after {first_token_ms:.0f} ms")
+                        parts.append(text)
+                        yield sse_event('token', {'text': text})
+                with request_scope():
+                    body, status = finish(''.join(parts))
+                event = 'done'
+            except GeneratorExit:
+                logger.info(f"/{name}: client disconnected after {len(parts)} tokens, generation stopped")
+                if span is not None:
+                    span.update(output={"success": False, "message": "Client disconnected"}, level="WARNING")
+                raise
+            except Exception as e:
+                logger.error(f"{error_message}: {str(e)}")
+                body, status = {'success': False, 'message': f"{error_message}: {str(e)}"}, 500
+                event = 'error'
+
+            text = ''.join(parts)
+            succeeded = status < 400 and body.get('success', False)
+            logger.info(f"✅ /{name}: streamed {len(text)} characters in {time.time() - started:.1f}s")
+            if span is not None:
+                span.update(
+                    output={"success": succeeded,
+                            "text": text[:500] + "..." if len(text) > 500 else text,
+                            "message": body.get('message')},
+                    metadata={"first_token_ms": first_token_ms, "output_length": len(text), "status": status},
+                    level=None if succeeded else "ERROR"
+                )
+            yield sse_event(event, {**body, 'status': status})
+
+    end_request()
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def store_image(data, content_type=None):
+    """
+    Store an image in the blob store.
+
+    Args:
+        data (bytes): The image
+        content_type (str, optional): Its MIME type, if already known from decoding it
+
+    Returns:
+        str: The image's blob URL (/blobs/<sha256>), or None if it is not an
+        image or could not be stored
+    """
+    try:
+        return blob_url(blob_store.put(data, content_type or image_mime_type(data)))
+    except (ImageError, OSError) as e:
+        logger.error(f"Error storing image: {str(e)}")
+        return None
+
+def store_session_images(value):
+    """
+    Replace base64 image data URLs anywhere in a session value (or in JSON
+    patch operations) with blob URLs, storing each distinct image once.
+    Images that cannot be stored are left as they are.
+    """
+    if isinstance(value, str):
+        if value.startswith('data:image/'):
+            try:
+                return store_image(decode_data_url(value)) or value
+            except ImageError as e:
+                logger.warning(f"Keeping unreadable image data URL in session: {str(e)}")
+        return value
+    if isinstance(value, dict):
+        return {key: store_session_images(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [store_session_images(item) for item in value]
+    return value
+
+def session_image_bytes(image_link):
+    """Bytes of an image a session refers to, by blob URL or data URL; None if there is none."""
+    key = key_from_url(image_link)
+    if key:
+        return blob_store.get(key)
+    if image_link and image_link.startswith('data:image'):
+        try:
+            return decode_data_url(image_link)
+        except ImageError:
+            return None
+    return None
+
+def record_session_edit(namespace, session_id, session_data, paths=None):
+    """
+    Bookkeeping after an in-memory edit of a session: mark it for write-back
+    at the end of the request, advance its version (badge.version, which
+    JSON-patch updates are checked against) and queue it for write-behind
+    if it has already been saved to a row.
+
+    Args:
+        paths (set): Key paths that changed, or None if it may be anything
+
+    Returns:
+        int: The session's new version
+    """
+    mark_dirty(namespace, session_id)
+    badge = session_data.setdefault('badge', {})
+    badge['version'] = badge.get('version', 0) + 1
+    if paths is not None:
+        paths = paths | {('badge', 'version')}
+    if session_writer.enabled and (badge.get('row', 0) or 0) > 0:
+        session_writer.mark_dirty(namespace, session_id, session_data, paths)
+    return badge['version']
+
+# Session members a JSON patch may not touch
+SERVER_MANAGED_PATHS = ['/badge']
+
+def patch_session(namespace, store, session_id, data):
+    """
+    Apply a delta update to an editing session.
+
+    The body carries an RFC 6902 JSON Patch against the whole session and the
+    version it was computed from: {"sessionId", "baseVersion", "patch"}. The
+    patch is applied atomically, and only if no other edit landed since
+    baseVersion; otherwise the client gets a 409 with the current version and
+    should re-read the session. Only the patched paths are persisted.
+
+    Returns:
+        Flask response
+    """
+    if not session_id or session_id not in store:
+        return jsonify({
+            'success': False,
+            'message': f'Session {session_id} not found'
+        }), 404
+
+    session_data = store[session_id]
+    current_version = session_data.get('badge', {}).get('version', 0)
+    base_version = data.get('baseVersion')
+    if base_version is None:
+        return jsonify({
+            'success': False,
+            'message': 'baseVersion is required with a patch'
+        }), 400
+    if base_version != current_version:
+        logger.info(f"⚠️ Patch conflict on {namespace} session {session_id}: "
+                    f"base version {base_version}, current {current_version}")
+        return jsonify({
+            'success': False,
+            'conflict': True,
+            'message': 'Session was changed by another edit',
+            'version': current_version
+        }), 409
+
+    operations = store_session_images(data.get('patch'))
+    try:
+        # badge holds the row the session is written to and the version
+        # checked above; only the server may change them
+        check_protected(operations, SERVER_MANAGED_PATHS)
+        patched = apply_patch(session_data, operations)
+    except JsonPatchError as e:
+        return jsonify({
+            'success': False,
+            'message': f'Invalid patch: {str(e)}'
+        }), 400
+
+    if patched is not session_data:
+        # A whole-document replace keeps the session's identity and row
+        patched['badge'] = session_data.get('badge', {})
+        store[session_id] = patched
+
+    version = record_session_edit(namespace, session_id, patched, changed_paths(patched, operations))
+    logger.info(f"🩹 Applied {len(operations)} patch operations to {namespace} session {session_id} (version {version})")
+
+    return jsonify({
+        'success': True,
+        'sessionId': session_id,
+        'version': version
+    })
+
 # Log API key status
 logger.info(f"OPENAI_API_KEY configured: {'Yes' if os.environ.get('OPENAI_API_KEY') else 'No'}")
-logger.info(f"IMGBB_API_KEY configured: {'Yes' if os.environ.get('IMGBB_API_KEY') else 'No'}")
 
 @app.route('/solutioning')
 def index():
@@ -175,7 +543,7 @@ def index():
         }
         
         logger.info(f"New session created: {session_id}")
-        logger.info(f"Initial multi-solution session structure: {json.dumps(solution_session[session_id], indent=2)}")
+        log_payload(logger, "Initial multi-solution session structure", solution_session[session_id])
     
     today = datetime.datetime.now().strftime('%Y-%m-%d')
     
@@ -249,6 +617,10 @@ def root():
 @app.route('/enhance-explanation', methods=['POST'])
 def enhance_explanation():
     """Enhance explanation text using OpenAI."""
+    data = request.get_json(silent=True) or {}
+    if wants_event_stream(data):
+        return stream_enhance_explanation(data)
+    
     # Start a LangFuse trace for this request
     if langfuse:
         try:
@@ -340,9 +712,37 @@ def enhance_explanation():
                 'message': f"Error enhancing explanation: {str(e)}"
             }), 500
 
+def stream_enhance_explanation(data):
+    """/enhance-explanation streamed as server-sent events (see stream_generation)."""
+    explanation = data.get('explanation', '')
+    
+    if not explanation.strip():
+        return jsonify({
+            'success': False,
+            'message': 'No explanation text provided'
+        }), 400
+    
+    # Import here to avoid circular imports
+    from utils.vision_api import stream_enhance_text_with_openai
+    
+    logger.info("Streaming explanation enhancement from OpenAI")
+    return stream_generation(
+        'enhance-explanation',
+        lambda: stream_enhance_text_with_openai(explanation),
+        lambda enhanced_explanation: ({
+            'success': True,
+            'enhanced_explanation': enhanced_explanation
+        }, 200),
+        "Error enhancing explanation",
+        trace_input={"explanation": explanation[:500] + "..." if len(explanation) > 500 else explanation})
+
 @app.route('/enhance-structured-content', methods=['POST'])
 def enhance_structured_content():
     """Enhance structured content (title, steps, approach) using OpenAI with specific HTML formatting."""
+    data = request.get_json(silent=True) or {}
+    if wants_event_stream(data):
+        return stream_enhance_structured_content(data)
+    
     # Start a LangFuse trace for this request
     if langfuse:
         try:
@@ -448,6 +848,43 @@ def enhance_structured_content():
                 'message': f"Error enhancing structured content: {str(e)}"
             }), 500
 
+def stream_enhance_structured_content(data):
+    """/enhance-structured-content streamed as server-sent events (see stream_generation)."""
+    title = data.get('title', '').strip()
+    steps = data.get('steps', '').strip()
+    approach = data.get('approach', '').strip()
+    
+    if not title and not steps and not approach:
+        return jsonify({
+            'success': False,
+            'message': 'No content provided for enhancement'
+        }), 400
+    
+    # Import here to avoid circular imports
+    from utils.vision_api import stream_structured_content_with_openai, parse_enhanced_structured_content
+    
+    def finish(enhanced_content_text):
+        try:
+            enhanced_content = parse_enhanced_structured_content(enhanced_content_text, title, steps, approach)
+        except ValueError as e:
+            # Keep the original content, as the non-streaming route does
+            logger.error(f"Error enhancing structured content: {str(e)}")
+            enhanced_content = {"title": title, "steps": steps, "approach": approach}
+        return {
+            'success': True,
+            'enhanced_title': enhanced_content.get('title', ''),
+            'enhanced_steps': enhanced_content.get('steps', ''),
+            'enhanced_approach': enhanced_content.get('approach', '')
+        }, 200
+    
+    logger.info("Streaming structured content enhancement from OpenAI")
+    return stream_generation(
+        'enhance-structured-content',
+        lambda: stream_structured_content_with_openai(title, steps, approach),
+        finish,
+        "Error enhancing structured content",
+        trace_input={"title": title, "steps": steps[:200] + "..." if len(steps) > 200 else steps, "approach": approach[:200] + "..." if len(approach) > 200 else approach})
+
 @app.route('/generate-stack-analysis', methods=['POST'])
 def generate_stack_analysis():
     # Start a LangFuse trace for this request
@@ -525,6 +962,7 @@ def generate_stack_analysis():
                         }
                     
                     solution_session[session_id][solution_key]['structure']['stack'] = stack_analysis
+                    version = record_session_edit('solution', session_id, solution_session[session_id])
                     
                     span.update(
                         output={"success": True, "stack_analysis": stack_analysis[:500] + "..." if len(stack_analysis) > 500 else stack_analysis},
@@ -533,6 +971,7 @@ def generate_stack_analysis():
                     
                     return jsonify({
                         'success': True,
+                        'version': version,
                         'stack_analysis': stack_analysis,
                         'message': 'Stack analysis generated successfully'
                     })
@@ -590,9 +1029,11 @@ def generate_stack_analysis():
                 }
             
             solution_session[session_id][solution_key]['structure']['stack'] = stack_analysis
+            version = record_session_edit('solution', session_id, solution_session[session_id])
             
             return jsonify({
                 'success': True,
+                'version': version,
                 'stack_analysis': stack_analysis,
                 'message': 'Stack analysis generated successfully'
             })
@@ -707,7 +1148,9 @@ def structure_solution():
                     
                     # Log the updated session
                     logger.info(f"Updated structured solution for session {session_id}, solution {current_solution}")
-                    logger.info(f"solution_session['{session_id}']: {json.dumps(solution_session[session_id], indent=2)}")
+                    log_payload(logger, f"solution_session['{session_id}']", solution_session[session_id])
+                    
+                    version = record_session_edit('solution', session_id, solution_session[session_id])
                     
                     span.update(
                         output={
@@ -728,6 +1171,7 @@ def structure_solution():
                     # Return structured data
                     return jsonify({
                         'success': True,
+                        'version': version,
                         'title': response['title'],
                         'steps': response['steps'],
                         'approach': response['approach'],
@@ -814,11 +1258,14 @@ def structure_solution():
             
             # Log the updated session
             logger.info(f"Updated structured solution for session {session_id}, solution {current_solution}")
-            logger.info(f"solution_session['{session_id}']: {json.dumps(solution_session[session_id], indent=2)}")
+            log_payload(logger, f"solution_session['{session_id}']", solution_session[session_id])
+            
+            version = record_session_edit('solution', session_id, solution_session[session_id])
             
             # Return structured data
             return jsonify({
                 'success': True,
+                'version': version,
                 'title': response['title'],
                 'steps': response['steps'],
                 'approach': response['approach'],
@@ -832,6 +1279,56 @@ def structure_solution():
                 'message': f"Error structuring solution: {str(e)}"
             }), 500
 
+# Blobs never change once stored, so clients may cache them for good
+BLOB_CACHE_SECONDS = 365 * 24 * 60 * 60
+
+@app.route('/blobs/<key>')
+def serve_blob(key):
+    """Serve a stored image by content hash, with long-lived cache headers."""
+    info = blob_store.info(key)
+    if info is None:
+        return jsonify({
+            'success': False,
+            'message': 'Image not found'
+        }), 404
+    
+    response = send_file(blob_store.path(key), mimetype=info.content_type,
+                         etag=key, conditional=True, max_age=BLOB_CACHE_SECONDS)
+    response.headers['Cache-Control'] = f'public, max-age={BLOB_CACHE_SECONDS}, immutable'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+@app.route('/blobs', methods=['POST'])
+def upload_blob():
+    """Store an uploaded image and return its blob URL, so sessions can reference it by hash."""
+    if 'image' not in request.files:
+        return jsonify({
+            'success': False,
+            'message': 'No image file uploaded'
+        }), 400
+    
+    raw = request.files['image'].read()
+    try:
+        content_type = image_mime_type(raw)
+    except ImageError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    url = store_image(raw, content_type)
+    if not url:
+        return jsonify({
+            'success': False,
+            'message': 'Failed to store image'
+        }), 500
+    
+    return jsonify({
+        'success': True,
+        'key': key_from_url(url),
+        'url': url
+    })
+
 @app.route('/analyze-image', methods=['POST'])
 def analyze_image():
     """Analyze an uploaded image using OpenAI Vision API."""
@@ -882,32 +1379,30 @@ def analyze_image():
                             "session_id": session_id,
                             "filename": image_file.filename,
                             "content_type": image_file.content_type
-                        },
-                        metadata={
-                            "file_size": len(image_file.read()),
-                            "content_type": image_file.content_type
                         }
                     )
-                    # Reset file pointer after reading for size
-                    image_file.seek(0)
                     
                     logger.info(f"Analyzing image: {image_file.filename}")
                     
-                    # Upload image to ImgBB
-                    image_url = upload_to_imgbb(image_file)
-                    
-                    if not image_url:
+                    # Decode once and size the image for the vision model
+                    try:
+                        image = prepare_image(image_file.read())
+                    except ImageError as e:
                         span.update(
-                            output={"success": False, "message": "Failed to upload image"},
+                            output={"success": False, "message": str(e)},
                             level="ERROR"
                         )
                         return jsonify({
                             'success': False,
-                            'message': 'Failed to upload image'
-                        }), 500
+                            'message': str(e)
+                        }), 400
+                    span.update(metadata={**image.summary(), "content_type": image_file.content_type})
+                    
+                    # Keep the original in the blob store (once per distinct image)
+                    image_url = store_image(image.original, image.original_mime_type)
                         
-                    # Analyze the image using OpenAI Vision API
-                    analysis = analyze_image_with_vision_api(image_url=image_url)
+                    # Analyze the image using OpenAI Vision API, sent inline
+                    analysis = analyze_image_with_vision_api(image_url=image.data_url())
                     
                     if analysis.startswith("Error"):
                         span.update(
@@ -927,6 +1422,7 @@ def analyze_image():
                         },
                         metadata={
                             "image_url": image_url,
+                            "image_sha256": image.sha256,
                             "analysis_length": len(analysis)
                         }
                     )
@@ -934,6 +1430,7 @@ def analyze_image():
                     return jsonify({
                         'success': True,
                         'image_url': image_url,
+                        'image_sha256': image.sha256,
                         'analysis': analysis
                     })
                     
@@ -971,17 +1468,20 @@ def analyze_image():
         
         logger.info(f"Analyzing image: {image_file.filename}")
         
-        # Upload image to ImgBB
-        image_url = upload_to_imgbb(image_file)
-        
-        if not image_url:
+        # Decode once and size the image for the vision model
+        try:
+            image = prepare_image(image_file.read())
+        except ImageError as e:
             return jsonify({
                 'success': False,
-                'message': 'Failed to upload image'
-            }), 500
+                'message': str(e)
+            }), 400
+        
+        # Keep the original in the blob store (once per distinct image)
+        image_url = store_image(image.original, image.original_mime_type)
             
-        # Analyze the image using OpenAI Vision API
-        analysis = analyze_image_with_vision_api(image_url=image_url)
+        # Analyze the image using OpenAI Vision API, sent inline
+        analysis = analyze_image_with_vision_api(image_url=image.data_url())
         
         if analysis.startswith("Error"):
             return jsonify({
@@ -992,6 +1492,7 @@ def analyze_image():
         return jsonify({
             'success': True,
             'image_url': image_url,
+            'image_sha256': image.sha256,
             'analysis': analysis
         })
         
@@ -1017,7 +1518,7 @@ def create_pdf():
         
         session_data = solution_session[session_id]
         logger.info(f"Generating multi-solution PDF for session: {session_id}")
-        logger.info(f"Session data: {json.dumps(session_data, indent=2)}")
+        log_payload(logger, "Session data", session_data)
         
         # Extract basic information
         basic_info = session_data.get('basic', {})
@@ -1045,12 +1546,11 @@ def create_pdf():
                     variables = value.get('variables', {})
                     additional = value.get('additional', {})
                     
-                    # Extract image data
+                    # Extract image data (stored blob or legacy data URL)
                     solution_image_data = None
-                    image_link = additional.get('image_link', '')
-                    if image_link and image_link.startswith('data:image'):
-                        # Extract base64 data from data URL
-                        solution_image_data = image_link.split(',')[1] if ',' in image_link else None
+                    image_bytes = session_image_bytes(additional.get('image_link', ''))
+                    if image_bytes:
+                        solution_image_data = base64.b64encode(image_bytes).decode('ascii')
                     
                     # Get solution explanation (prefer variables over additional)
                     solution_explanation = variables.get('solution_explanation', additional.get('explanation', ''))
@@ -1175,12 +1675,11 @@ def preview_pdf():
                     variables = value.get('variables', {})
                     additional = value.get('additional', {})
                     
-                    # Extract image data
+                    # Extract image data (stored blob or legacy data URL)
                     solution_image_data = None
-                    image_link = additional.get('image_link', '')
-                    if image_link and image_link.startswith('data:image'):
-                        # Extract base64 data from data URL
-                        solution_image_data = image_link.split(',')[1] if ',' in image_link else None
+                    image_bytes = session_image_bytes(additional.get('image_link', ''))
+                    if image_bytes:
+                        solution_image_data = base64.b64encode(image_bytes).decode('ascii')
                     
                     # Get solution explanation (prefer variables over additional)
                     solution_explanation = variables.get('solution_explanation', additional.get('explanation', ''))
@@ -1284,10 +1783,13 @@ def save_basic_info():
         
         # Log the updated session
         logger.info(f"Updated basic info for session {session_id}")
-        logger.info(f"solution_session['{session_id}']: {json.dumps(solution_session[session_id], indent=2)}")
+        log_payload(logger, f"solution_session['{session_id}']", solution_session[session_id])
+        
+        version = record_session_edit('solution', session_id, solution_session[session_id])
         
         return jsonify({
             'success': True,
+            'version': version,
             'message': 'Basic information saved successfully'
         })
         
@@ -1305,7 +1807,7 @@ def save_additional_info():
         # Get data from request
         data = request.get_json()
         session_id = data.get('sessionId', '')
-        image_link = data.get('imageLink', '')
+        image_link = store_session_images(data.get('imageLink', ''))
         explanation = data.get('explanation', '')
         
         if not session_id or session_id not in solution_session:
@@ -1328,10 +1830,13 @@ def save_additional_info():
         
         # Log the updated session
         logger.info(f"Updated additional info for session {session_id}, solution {current_solution}")
-        logger.info(f"solution_session['{session_id}']: {json.dumps(solution_session[session_id], indent=2)}")
+        log_payload(logger, f"solution_session['{session_id}']", solution_session[session_id])
+        
+        version = record_session_edit('solution', session_id, solution_session[session_id])
         
         return jsonify({
             'success': True,
+            'version': version,
             'message': 'Additional information saved successfully'
         })
         
@@ -1373,10 +1878,13 @@ def save_layout():
         
         # Log the updated session
         logger.info(f"Updated layout for session {session_id}, solution {current_solution}: {layout}")
-        logger.info(f"solution_session['{session_id}']: {json.dumps(solution_session[session_id], indent=2)}")
+        log_payload(logger, f"solution_session['{session_id}']", solution_session[session_id])
+        
+        version = record_session_edit('solution', session_id, solution_session[session_id])
         
         return jsonify({
             'success': True,
+            'version': version,
             'message': 'Layout saved successfully'
         })
         
@@ -1395,6 +1903,10 @@ def update_solution_data():
         data = request.get_json()
         session_id = data.get('sessionId', '')
         
+        # Delta update: RFC 6902 patch against a known session version
+        if 'patch' in data:
+            return patch_session('solution', solution_session, data.get('sessionId'), data)
+        
         # Get form values
         structured_title = data.get('title', '')
         structured_steps = data.get('steps', '')
@@ -1438,10 +1950,13 @@ def update_solution_data():
         
         # Log the updated session
         logger.info(f"Updated solution data for session {session_id}, solution {current_solution}")
-        logger.info(f"solution_session['{session_id}']: {json.dumps(solution_session[session_id], indent=2)}")
+        log_payload(logger, f"solution_session['{session_id}']", solution_session[session_id])
+        
+        version = record_session_edit('solution', session_id, solution_session[session_id])
         
         return jsonify({
             'success': True,
+            'version': version,
             'message': 'Solution data updated successfully'
         })
         
@@ -1491,10 +2006,13 @@ def next_solution():
         
         logger.info(f"Created new solution: {new_solution_key}")
         logger.info(f"Updated session counters - current_solution: {new_solution_number}, solution_count: {new_solution_number}")
-        logger.info(f"Full session structure: {json.dumps(solution_session[session_id], indent=2)}")
+        log_payload(logger, "Full session structure", solution_session[session_id])
+        
+        version = record_session_edit('solution', session_id, solution_session[session_id])
         
         return jsonify({
             'success': True,
+            'version': version,
             'message': f'Started solution {new_solution_number}',
             'current_solution': new_solution_number,
             'solution_count': new_solution_number
@@ -1565,10 +2083,13 @@ def switch_solution():
         if target_solution == 'basic':
             # Switch to basic info (Step 1)
             solution_session[session_id]['current_solution'] = 'basic'
+            version = record_session_edit('solution', session_id, solution_session[session_id],
+                                          {('current_solution',)})
             basic_data = solution_session[session_id].get('basic', {})
             
             return jsonify({
                 'success': True,
+                'version': version,
                 'target': 'basic',
                 'data': basic_data
             })
@@ -1587,6 +2108,8 @@ def switch_solution():
                 
                 # Update current solution
                 solution_session[session_id]['current_solution'] = solution_num
+                version = record_session_edit('solution', session_id, solution_session[session_id],
+                                              {('current_solution',)})
                 
                 # Get solution data
                 solution_data = solution_session[session_id][solution_key]
@@ -1595,6 +2118,7 @@ def switch_solution():
                 
                 return jsonify({
                     'success': True,
+                    'version': version,
                     'target': 'solution',
                     'solution_number': solution_num,
                     'data': solution_data
@@ -1757,8 +2281,12 @@ def delete_solution():
         logger.info(f"Successfully deleted solution {solution_num} for session {session_id}")
         logger.info(f"Updated solution count from {current_count} to {new_count}")
         
+        # Solutions were removed and renumbered: write the whole session back
+        version = record_session_edit('solution', session_id, solution_session[session_id])
+        
         return jsonify({
             'success': True,
+            'version': version,
             'message': f'Solution {solution_num} deleted successfully',
             'new_total': new_count,
             'solution_count': new_count
@@ -1786,91 +2314,18 @@ def save_session():
         
         session_data = solution_session[session_id]
         logger.info(f"💾 Saving session {session_id} to database")
-        logger.info(f"📊 Complete Session Object Structure:")
-        logger.info(f"Session Data: {json.dumps(session_data, indent=2)}")
+        log_payload(logger, "Session Data", session_data)
         
-        # Get database connection
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({
-                'success': False,
-                'message': 'Database connection failed'
-            }), 500
+        # Written by the write-behind session writer; a new session gets its row id now
+        row_id = session_writer.save('solution', session_id, session_data)
         
-        try:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
-            # Get the current row value from badge
-            badge = session_data.get('badge', {})
-            current_row = badge.get('row', 0)
-            
-            # Check if row exists in database
-            cursor.execute("SELECT id FROM ai_architecture_sessions WHERE id = %s", (current_row,))
-            existing_row = cursor.fetchone()
-            
-            if existing_row and current_row > 0:
-                # Row exists - update session_objects
-                logger.info(f"🔄 Updating existing row {current_row} with session data")
-                cursor.execute(
-                    "UPDATE ai_architecture_sessions SET session_objects = %s WHERE id = %s",
-                    (json.dumps(session_data), current_row)
-                )
-                row_id = current_row
-                
-            else:
-                # Row doesn't exist - create new row
-                logger.info("🆕 Creating new row for session data")
-                
-                # Extract title and client from session data
-                basic_info = session_data.get('basic', {})
-                title = basic_info.get('title', '')
-                client = basic_info.get('prepared_for', '')
-                
-                logger.info(f"📝 Extracted metadata - Title: '{title}', Client: '{client}'")
-                
-                # Insert new row and get the generated ID
-                cursor.execute(
-                    """INSERT INTO ai_architecture_sessions (session_objects, title, client) 
-                       VALUES (%s, %s, %s) RETURNING id""",
-                    (json.dumps(session_data), title, client)
-                )
-                
-                new_row = cursor.fetchone()
-                row_id = new_row['id']
-                
-                # Update the badge row value in the session with the new row ID
-                solution_session[session_id]['badge']['row'] = row_id
-                
-                # Update the database with the corrected session data (with updated badge)
-                cursor.execute(
-                    "UPDATE ai_architecture_sessions SET session_objects = %s WHERE id = %s",
-                    (json.dumps(solution_session[session_id]), row_id)
-                )
-                
-                logger.info(f"✅ Created new row {row_id} and updated badge row value")
-            
-            # Commit the transaction
-            conn.commit()
-            
-            logger.info(f"🎉 Successfully saved session {session_id} to database row {row_id}")
-            
-            return jsonify({
-                'success': True,
-                'message': f'Session saved successfully to row {row_id}',
-                'row_id': row_id
-            })
-            
-        except Exception as db_error:
-            conn.rollback()
-            logger.error(f"💥 Database operation error: {str(db_error)}")
-            return jsonify({
-                'success': False,
-                'message': f'Database error: {str(db_error)}'
-            }), 500
-            
-        finally:
-            cursor.close()
-            conn.close()
+        logger.info(f"🎉 Queued session {session_id} for database row {row_id}")
+        
+        return jsonify({
+            'success': True,
+            'message': f'Session saved successfully to row {row_id}',
+            'row_id': row_id
+        })
             
     except Exception as e:
         logger.error(f"💥 Error saving session: {str(e)}")
@@ -1946,7 +2401,7 @@ def structuring_page():
         }
         
         logger.info(f"New structuring session created: {session_id}")
-        logger.info(f"Initial structuring session structure: {json.dumps(structuring_session[session_id], indent=2)}")
+        log_payload(logger, "Initial structuring session structure", structuring_session[session_id])
     
     # Pass additional context for loaded sessions
     is_loaded_session = loaded_param == 'true'
@@ -2040,7 +2495,7 @@ def sow_page():
         }
         
         logger.info(f"New SoW session created: {session_id}")
-        logger.info(f"Initial SoW session structure: {json.dumps(sow_session[session_id], indent=2)}")
+        log_payload(logger, "Initial SoW session structure", sow_session[session_id])
     
     today = datetime.datetime.now().strftime('%Y-%m-%d')
     
@@ -2070,6 +2525,88 @@ def sow_debug(session_id):
             'available_sessions': list(sow_session.keys())
         }), 404
 
+@app.route('/debug/session-store')
+def session_store_debug():
+    """Debug route to inspect session store occupancy, evictions and pending writes"""
+    return jsonify({**session_backend.stats(), 'write_behind': session_writer.stats()})
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Status, progress and (once finished) result of a background job."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': f'Job {job_id} not found or expired'
+        }), 404
+    return jsonify({'success': True, **job.snapshot()})
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Server-sent events for a background job: "progress" events, then one
+    "succeeded", "failed" or "cancelled" event carrying the job with its
+    result. Reconnecting clients resume after Last-Event-ID.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': f'Job {job_id} not found or expired'
+        }), 404
+
+    try:
+        after = int(request.headers.get('Last-Event-ID') or request.args.get('after', 0))
+    except ValueError:
+        after = 0
+
+    def stream():
+        seen = after
+        while True:
+            events = job.wait_for_events(seen, JOB_EVENTS_HEARTBEAT)
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for number, event, payload in events:
+                seen = number
+                yield f"id: {number}\nevent: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+                if event in JOB_FINISHED:
+                    return
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running background job."""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': f'Job {job_id} not found or expired'
+        }), 404
+    return jsonify({'success': True, **job.snapshot(include_result=False)})
+
+@app.route('/debug/jobs')
+def jobs_debug():
+    """Debug route to inspect the background job queue"""
+    return jsonify(job_queue.stats())
+
+@app.route('/debug/llm-cache')
+def llm_cache_debug():
+    """Debug route to inspect LLM response cache hit rates and occupancy"""
+    return jsonify(llm_cache.stats())
+
+@app.route('/debug/blob-store')
+def blob_store_debug():
+    """Debug route to inspect the image blob store"""
+    return jsonify(blob_store.stats())
+
+@app.route('/debug/db-pool')
+def db_pool_debug():
+    """Debug route to inspect database pool size, utilization and wait times"""
+    return jsonify(db_pool.stats())
+
 @app.route('/structuring/debug/<session_id>')
 def structuring_debug(session_id):
     """Debug route to view structuring session data."""
@@ -2092,6 +2629,10 @@ def update_structuring_session():
     try:
         data = request.get_json()
         session_id = data.get('sessionId', '')
+        
+        # Delta update: RFC 6902 patch against a known session version
+        if 'patch' in data:
+            return patch_session('structuring', structuring_session, data.get('sessionId'), data)
         session_data = data.get('data', {})
         
         if not session_id:
@@ -2101,7 +2642,7 @@ def update_structuring_session():
             }), 400
         
         logger.info(f"📝 Updating structuring session: {session_id}")
-        logger.info(f"📝 Session data: {session_data}")
+        log_payload(logger, "📝 Session data", session_data)
         
         # Initialize session if it doesn't exist
         if session_id not in structuring_session:
@@ -2139,8 +2680,11 @@ def update_structuring_session():
         
         logger.info(f"✅ Structuring session {session_id} updated successfully")
         
+        version = record_session_edit('structuring', session_id, current_session)
+        
         return jsonify({
             'success': True,
+            'version': version,
             'message': 'Structuring session updated successfully',
             'session_id': session_id,
             'data': current_session
@@ -2165,6 +2709,10 @@ def update_sow_session():
                 'message': 'No data provided'
             }), 400
         
+        # Delta update: RFC 6902 patch against a known session version
+        if 'patch' in data:
+            return patch_session('sow', sow_session, data.get('sessionId'), data)
+        
         session_id = data.get('sessionId')
         step = data.get('step')
         step_data = data.get('data', {})
@@ -2219,10 +2767,13 @@ def update_sow_session():
             }), 400
         
         logger.info(f"✅ Updated SoW session {session_id} for step {step}")
-        logger.info(f"Updated session data: {json.dumps(sow_session[session_id], indent=2)}")
+        log_payload(logger, "Updated session data", sow_session[session_id])
+        
+        version = record_session_edit('sow', session_id, sow_session[session_id])
         
         return jsonify({
             'success': True,
+            'version': version,
             'message': f'Step {step} data updated successfully',
             'session_id': session_id
         })
@@ -2234,10 +2785,88 @@ def update_sow_session():
             'message': f'Error updating SoW session: {str(e)}'
         }), 500
 
+# Sessions listing page size (?limit=) and its upper bound
+SESSIONS_PAGE_SIZE = int(os.environ.get("SESSIONS_PAGE_SIZE", "50"))
+SESSIONS_PAGE_SIZE_MAX = 200
+
+# Listing status flag -> JSON column it reports on
+SESSION_STATUS_COLUMNS = [
+    ('diagram_texts', 'diagram_texts_json'),
+    ('visual_assets', 'visual_assets_json'),
+    ('solution_document', 'session_objects'),
+    ('sow', 'sow_objects'),
+    ('loe', 'loe_objects'),
+]
+
+
+def session_column_has_content(column):
+    """
+    SQL expression that is true when a JSON column is not empty (null, {}, [] or "").
+
+    Any value whose stored size is beyond that of an empty document counts as
+    content from pg_column_size() alone, which does not detoast it, so the
+    large diagram/image blobs are never read just to list sessions.
+
+    Args:
+        column (str): Column name from SESSION_STATUS_COLUMNS
+
+    Returns:
+        sql.Composed: Boolean SQL expression
+    """
+    return sql.SQL("""CASE
+                    WHEN {col} IS NULL THEN FALSE
+                    WHEN pg_column_size({col}) > 32 THEN TRUE
+                    ELSE btrim({col}::text) NOT IN ('', '{{}}', '[]', 'null', '""')
+                END""").format(col=sql.Identifier(column))
+
+
+def encode_sessions_cursor(created_at, session_id):
+    """Opaque keyset cursor pointing just after the given row."""
+    return f"{created_at.isoformat() if created_at else ''}|{session_id}"
+
+
+def decode_sessions_cursor(cursor_value):
+    """
+    Parse a cursor from encode_sessions_cursor().
+
+    Returns:
+        tuple: (created_at or None, id); raises ValueError if malformed
+    """
+    created_at, _, session_id = cursor_value.partition('|')
+    return (datetime.datetime.fromisoformat(created_at) if created_at else None,
+            int(session_id))
+
+
 @app.route('/api/sessions', methods=['GET'])
 def get_sessions():
-    """Get all sessions from the database."""
+    """
+    List sessions newest first, one page at a time.
+
+    Query args:
+        limit: Page size (default SESSIONS_PAGE_SIZE, at most SESSIONS_PAGE_SIZE_MAX)
+        cursor: next_cursor from the previous page
+
+    Only id, title, client, date and per-workflow status flags are returned;
+    the flags are computed in SQL so the JSON documents never leave the
+    database. Pages are keyset-paginated on (created_at, id), so each page
+    costs the same however many sessions there are.
+    """
     try:
+        try:
+            limit = int(request.args.get('limit', SESSIONS_PAGE_SIZE))
+            limit = max(1, min(limit, SESSIONS_PAGE_SIZE_MAX))
+            after = request.args.get('cursor')
+            after = decode_sessions_cursor(after) if after else None
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'Invalid limit or cursor'
+            }), 400
+
+        # Rows must include edits still waiting in the write-behind queue
+        # (sessions a request is editing right now are written when it ends)
+        session_writer.flush(wait_for_locks=False)
+        
         # Get database connection
         conn = get_db_connection()
         if not conn:
@@ -2248,39 +2877,45 @@ def get_sessions():
         
         try:
             cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
-            # Fetch all sessions
-            cursor.execute("""
-                SELECT id, title, client, created_at, 
-                       diagram_texts_json, visual_assets_json, 
-                       session_objects, sow_objects, loe_objects
-                FROM ai_architecture_sessions 
-                ORDER BY created_at DESC
-            """)
+
+            # Rows after the cursor in (created_at DESC NULLS LAST, id DESC) order
+            if after is None:
+                keyset = sql.SQL("TRUE")
+                params = []
+            elif after[0] is None:
+                keyset = sql.SQL("created_at IS NULL AND id < %s")
+                params = [after[1]]
+            else:
+                keyset = sql.SQL("((created_at, id) < (%s, %s) OR created_at IS NULL)")
+                params = [after[0], after[1]]
+
+            status_columns = sql.SQL(', ').join(
+                sql.SQL("{} AS {}").format(session_column_has_content(column),
+                                           sql.Identifier(f"has_{flag}"))
+                for flag, column in SESSION_STATUS_COLUMNS
+            )
+
+            # Fetch one extra row to know whether another page follows
+            cursor.execute(sql.SQL("""
+                SELECT id, title, client, created_at, {status_columns}
+                FROM ai_architecture_sessions
+                WHERE {keyset}
+                ORDER BY created_at DESC NULLS LAST, id DESC
+                LIMIT %s
+            """).format(status_columns=status_columns, keyset=keyset), params + [limit + 1])
             
             sessions = cursor.fetchall()
+            has_more = len(sessions) > limit
+            sessions = sessions[:limit]
             
-            # Convert to list of dictionaries and check if fields are empty
             sessions_list = []
             for session in sessions:
-                session_dict = dict(session)
-                
-                # Check if each field is empty (null or empty JSON)
-                def is_empty(field_value):
-                    if field_value is None:
-                        return True
-                    if isinstance(field_value, (dict, list)) and len(field_value) == 0:
-                        return True
-                    if isinstance(field_value, str) and field_value.strip() == '':
-                        return True
-                    return False
-                
-                session_dict['status'] = {
-                    'diagram_texts': not is_empty(session_dict.get('diagram_texts_json')),
-                    'visual_assets': not is_empty(session_dict.get('visual_assets_json')),
-                    'solution_document': not is_empty(session_dict.get('session_objects')),
-                    'sow': not is_empty(session_dict.get('sow_objects')),
-                    'loe': not is_empty(session_dict.get('loe_objects'))
+                session_dict = {
+                    'id': session['id'],
+                    'title': session['title'],
+                    'client': session['client'],
+                    'created_at': session['created_at'],
+                    'status': {flag: session[f"has_{flag}"] for flag, _ in SESSION_STATUS_COLUMNS}
                 }
                 
                 # Format created_at for display
@@ -2291,11 +2926,18 @@ def get_sessions():
                 
                 sessions_list.append(session_dict)
             
-            logger.info(f"📋 Retrieved {len(sessions_list)} sessions from database")
+            next_cursor = None
+            if has_more:
+                last = sessions[-1]
+                next_cursor = encode_sessions_cursor(last['created_at'], last['id'])
+            
+            logger.info(f"📋 Retrieved {len(sessions_list)} sessions from database (more: {has_more})")
             
             return jsonify({
                 'success': True,
-                'sessions': sessions_list
+                'sessions': sessions_list,
+                'has_more': has_more,
+                'next_cursor': next_cursor
             })
             
         except Exception as db_error:
@@ -2322,6 +2964,9 @@ def load_session(session_id):
     try:
         logger.info(f"🔄 Loading session {session_id} from database")
         
+        # Rows must include edits still waiting in the write-behind queue
+        session_writer.flush(rows=[session_id])
+        
         # Get database connection
         conn = get_db_connection()
         if not conn:
@@ -2359,7 +3004,7 @@ def load_session(session_id):
             solution_session[new_session_id] = loaded_session_data.copy()
             
             logger.info(f"✅ Successfully loaded session {session_id} as new session {new_session_id}")
-            logger.info(f"📊 Loaded session structure: {json.dumps(loaded_session_data, indent=2)}")
+            log_payload(logger, "📊 Loaded session structure", loaded_session_data)
             
             # Redirect to main page with the new session ID and a flag indicating it's loaded
             return redirect(f'/solutioning?session_id={new_session_id}&loaded=true')
@@ -2397,7 +3042,7 @@ def generate_sow_pdf():
         
         session_data = sow_session[session_id]
         logger.info(f"Generating SoW PDF for session: {session_id}")
-        logger.info(f"SoW session data: {json.dumps(session_data, indent=2)}")
+        log_payload(logger, "SoW session data", session_data)
         
         # Validate required fields
         if not session_data.get('project') or not session_data.get('client'):
@@ -2505,6 +3150,9 @@ def delete_sow_session():
         badge = session_data.get('badge', {})
         row_id = badge.get('row', 0)
         
+        # A queued write would otherwise recreate the deleted row
+        session_writer.discard('sow', session_id)
+        
         # Delete from database if row ID exists
         if row_id and row_id > 0:
             logger.info(f"🗑️ Deleting SoW session {session_id} from database row {row_id}")
@@ -2573,90 +3221,18 @@ def save_sow_session():
         
         session_data = sow_session[session_id]
         logger.info(f"💾 Saving SoW session {session_id} to database")
-        logger.info(f"📊 Complete SoW Session Object Structure:")
-        logger.info(f"SoW Session Data: {json.dumps(session_data, indent=2)}")
+        log_payload(logger, "SoW Session Data", session_data)
         
-        # Get database connection
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({
-                'success': False,
-                'message': 'Database connection failed'
-            }), 500
+        # Written by the write-behind session writer; a new session gets its row id now
+        row_id = session_writer.save('sow', session_id, session_data)
         
-        try:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
-            # Get the current row value from badge
-            badge = session_data.get('badge', {})
-            current_row = badge.get('row', 0)
-            
-            # Check if row exists in database
-            cursor.execute("SELECT id FROM ai_architecture_sessions WHERE id = %s", (current_row,))
-            existing_row = cursor.fetchone()
-            
-            if existing_row and current_row > 0:
-                # Row exists - update sow_objects
-                logger.info(f"🔄 Updating existing row {current_row} with SoW session data")
-                cursor.execute(
-                    "UPDATE ai_architecture_sessions SET sow_objects = %s WHERE id = %s",
-                    (json.dumps(session_data), current_row)
-                )
-                row_id = current_row
-                
-            else:
-                # Row doesn't exist - create new row
-                logger.info("🆕 Creating new row for SoW session data")
-                
-                # Extract title and client from session data
-                project = session_data.get('project', '')
-                client = session_data.get('client', '')
-                
-                logger.info(f"📝 Extracted SoW metadata - Project: '{project}', Client: '{client}'")
-                
-                # Insert new row and get the generated ID
-                cursor.execute(
-                    """INSERT INTO ai_architecture_sessions (sow_objects, title, client) 
-                       VALUES (%s, %s, %s) RETURNING id""",
-                    (json.dumps(session_data), project, client)
-                )
-                
-                new_row = cursor.fetchone()
-                row_id = new_row['id']
-                
-                # Update the badge row value in the session with the new row ID
-                sow_session[session_id]['badge']['row'] = row_id
-                
-                # Update the database with the corrected session data (with updated badge)
-                cursor.execute(
-                    "UPDATE ai_architecture_sessions SET sow_objects = %s WHERE id = %s",
-                    (json.dumps(sow_session[session_id]), row_id)
-                )
-                
-                logger.info(f"✅ Created new row {row_id} and updated SoW badge row value")
-            
-            # Commit the transaction
-            conn.commit()
-            
-            logger.info(f"🎉 Successfully saved SoW session {session_id} to database row {row_id}")
-            
-            return jsonify({
-                'success': True,
-                'message': f'SoW session saved successfully to row {row_id}',
-                'row_id': row_id
-            })
-            
-        except Exception as db_error:
-            conn.rollback()
-            logger.error(f"💥 Database operation error: {str(db_error)}")
-            return jsonify({
-                'success': False,
-                'message': f'Database error: {str(db_error)}'
-            }), 500
-            
-        finally:
-            cursor.close()
-            conn.close()
+        logger.info(f"🎉 Queued SoW session {session_id} for database row {row_id}")
+        
+        return jsonify({
+            'success': True,
+            'message': f'SoW session saved successfully to row {row_id}',
+            'row_id': row_id
+        })
             
     except Exception as e:
         logger.error(f"💥 Error saving SoW session: {str(e)}")
@@ -2671,6 +3247,9 @@ def load_sow_session(session_id):
     try:
         logger.info(f"🔄 Loading SoW session {session_id} from database")
         
+        # Rows must include edits still waiting in the write-behind queue
+        session_writer.flush(rows=[session_id])
+        
         # Get database connection
         conn = get_db_connection()
         if not conn:
@@ -2708,7 +3287,7 @@ def load_sow_session(session_id):
             sow_session[new_session_id] = loaded_sow_session_data.copy()
             
             logger.info(f"✅ Successfully loaded SoW session {session_id} as new session {new_session_id}")
-            logger.info(f"📊 Loaded SoW session structure: {json.dumps(loaded_sow_session_data, indent=2)}")
+            log_payload(logger, "📊 Loaded SoW session structure", loaded_sow_session_data)
             
             # Redirect to SoW page with the new session ID and a flag indicating it's loaded
             return redirect(f'/sow?session_id={new_session_id}&loaded=true')
@@ -2764,25 +3343,16 @@ def test_sow_debug(session_id):
         </html>
         """
 
-@app.route('/diagnose-pain-points', methods=['POST'])
-def diagnose_pain_points():
-    """Analyze content and identify pain points that could be solved with AI, Automation, or Software."""
-    try:
-        data = request.get_json()
-        content = data.get('content', '')
-        session_id = data.get('sessionId', '')
-        
-        if not content.strip():
-            return jsonify({
-                'success': False,
-                'message': 'Content is required for pain point analysis'
-            }), 400
-        
-        logger.info(f"🔍 Analyzing pain points for session: {session_id}")
-        logger.info(f"🔍 Content length: {len(content)} characters")
-        
-        # Prepare the prompt for OpenAI
-        prompt = f"""
+def pain_points_request(content):
+    """chat.completions.create() arguments for /diagnose-pain-points."""
+    # Truncate content if it's too long to prevent context length issues
+    max_content_length = 16384  # Conservative limit to leave room for prompt and response
+    if len(content) > max_content_length:
+        content = content[:max_content_length] + "... [Content truncated due to length]"
+        logger.info(f"⚠️ Content truncated to {max_content_length} characters")
+    
+    # Prepare the prompt for OpenAI
+    prompt = f"""
 You are an expert business analyst specializing in identifying pain points that can be solved through AI, Automation, and Software solutions.
 
 Analyze the following content and identify specific pain points that could be addressed with technology solutions. Focus on:
@@ -2813,114 +3383,142 @@ Content to analyze:
 
 Identify real, specific problems that exist in the content. Each pain point should be a detailed paragraph that clearly explains what is broken, inefficient, or missing. Focus on actionable problems that can be solved with technology. Return ONLY the JSON response.
 """
+    
+    return {
+        "model": "gpt-4o",  # Use gpt-4o which has a larger context window
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are an expert business analyst specializing in identifying pain points that can be solved through AI, Automation, and Software solutions. You provide detailed, actionable insights about client needs and challenges."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "max_tokens": 16384,  # Reduced to be more reasonable
+        "temperature": 0.4
+    }
+
+def extract_pain_points_json(text):
+    """Extract JSON from OpenAI response that might contain markdown or other text."""
+    # First, try to parse the entire response as JSON
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    # If that fails, try to find JSON within the text
+    # Look for JSON blocks wrapped in ```json or ``` or just find JSON-like structures
+    json_patterns = [
+        r'```json\s*(\{.*?\})\s*```',  # JSON in markdown code blocks
+        r'```\s*(\{.*?\})\s*```',      # JSON in generic code blocks
+        r'(\{[^{}]*"pain_points"[^{}]*\[.*?\][^{}]*\})',  # Look for JSON with pain_points array
+        r'(\{.*?\})'  # Any JSON-like structure
+    ]
+
+    for pattern in json_patterns:
+        matches = re.findall(pattern, text, re.DOTALL | re.IGNORECASE)
+        for match in matches:
+            try:
+                parsed = json.loads(match)
+                if isinstance(parsed, dict) and 'pain_points' in parsed:
+                    return parsed
+            except json.JSONDecodeError:
+                continue
+
+    # If no JSON found, create a fallback structure
+    logger.warning("⚠️ Could not extract valid JSON from response, creating fallback")
+    return {
+        "pain_points": [
+            f"Analysis completed but response format was not parseable. Raw AI response: {text[:1000]}..."
+        ]
+    }
+
+def pain_points_result(ai_response):
+    """
+    /diagnose-pain-points response from the model's reply.
+    
+    Returns:
+        tuple: (response body, HTTP status)
+    """
+    try:
+        parsed_response = extract_pain_points_json(ai_response)
+
+        # Validate the response structure
+        if 'pain_points' not in parsed_response:
+            raise ValueError("Response missing 'pain_points' field")
 
+        # Ensure pain_points is a list
+        if not isinstance(parsed_response['pain_points'], list):
+            raise ValueError("'pain_points' field must be a list")
+
+        # Convert all pain points to strings
+        pain_points_text = []
+        for pain_point in parsed_response['pain_points']:
+            if isinstance(pain_point, str):
+                pain_points_text.append(pain_point)
+            else:
+                # If it's not a string, convert it
+                pain_points_text.append(str(pain_point))
+
+        logger.info(f"✅ Successfully identified {len(pain_points_text)} pain points")
+
+        return {
+            'success': True,
+            'painPoints': pain_points_text,  # Frontend expects 'painPoints' (camelCase)
+            'message': 'Pain points analyzed successfully'
+        }, 200
+
+    except (json.JSONDecodeError, ValueError) as e:
+        logger.error(f"❌ Failed to parse or validate JSON response: {str(e)}")
+        logger.error(f"❌ Raw response: {ai_response}")
+
+        # Fallback: return the raw response as a single pain point
+        return {
+            'success': True,
+            'painPoints': [ai_response],  # Return raw response as single item
+            'message': 'Pain points analyzed (manual formatting applied)'
+        }, 200
+
+@app.route('/diagnose-pain-points', methods=['POST'])
+def diagnose_pain_points():
+    """Analyze content and identify pain points that could be solved with AI, Automation, or Software."""
+    try:
+        data = request.get_json()
+        content = data.get('content', '')
+        session_id = data.get('sessionId', '')
+        
+        if not content.strip():
+            return jsonify({
+                'success': False,
+                'message': 'Content is required for pain point analysis'
+            }), 400
+        
+        logger.info(f"🔍 Analyzing pain points for session: {session_id}")
+        logger.info(f"🔍 Content length: {len(content)} characters")
+        
+        if wants_event_stream(data):
+            return stream_generation(
+                'diagnose-pain-points',
+                lambda: stream_completion(get_openai_client(timeout=TIMEOUT_CHAT), **pain_points_request(content)),
+                lambda ai_response: pain_points_result(ai_response.strip()),
+                'AI analysis failed',
+                trace_input={"content_length": len(content)},
+                session_id=session_id)
+        
         # Call OpenAI API using LangFuse-wrapped client
         try:
-            # Truncate content if it's too long to prevent context length issues
-            max_content_length = 16384  # Conservative limit to leave room for prompt and response
-            if len(content) > max_content_length:
-                content = content[:max_content_length] + "... [Content truncated due to length]"
-                logger.info(f"⚠️ Content truncated to {max_content_length} characters")
-            
-            # Initialize LangFuse-wrapped OpenAI client
-            client = langfuse_openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-            
-            response = client.chat.completions.create(
-                model="gpt-4o",  # Use gpt-4o which has a larger context window
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert business analyst specializing in identifying pain points that can be solved through AI, Automation, and Software solutions. You provide detailed, actionable insights about client needs and challenges."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=16384,  # Reduced to be more reasonable
-                temperature=0.4
-            )
-            
-            ai_response = response.choices[0].message.content.strip()
-            logger.info(f"🤖 OpenAI response: {ai_response}")
+            # Shared keep-alive client (tracing configured in utils.openai_client)
+            client = get_openai_client(timeout=TIMEOUT_CHAT)
             
-            # Parse the JSON response with robust extraction
-            import json
-            import re
+            response = client.chat.completions.create(**pain_points_request(content))
             
-            def extract_json_from_response(text):
-                """Extract JSON from OpenAI response that might contain markdown or other text."""
-                # First, try to parse the entire response as JSON
-                try:
-                    return json.loads(text)
-                except json.JSONDecodeError:
-                    pass
-                
-                # If that fails, try to find JSON within the text
-                # Look for JSON blocks wrapped in ```json or ``` or just find JSON-like structures
-                json_patterns = [
-                    r'```json\s*(\{.*?\})\s*```',  # JSON in markdown code blocks
-                    r'```\s*(\{.*?\})\s*```',      # JSON in generic code blocks
-                    r'(\{[^{}]*"pain_points"[^{}]*\[.*?\][^{}]*\})',  # Look for JSON with pain_points array
-                    r'(\{.*?\})'  # Any JSON-like structure
-                ]
-                
-                for pattern in json_patterns:
-                    matches = re.findall(pattern, text, re.DOTALL | re.IGNORECASE)
-                    for match in matches:
-                        try:
-                            parsed = json.loads(match)
-                            if isinstance(parsed, dict) and 'pain_points' in parsed:
-                                return parsed
-                        except json.JSONDecodeError:
-                            continue
-                
-                # If no JSON found, create a fallback structure
-                logger.warning("⚠️ Could not extract valid JSON from response, creating fallback")
-                return {
-                    "pain_points": [
-                        f"Analysis completed but response format was not parseable. Raw AI response: {text[:1000]}..."
-                    ]
-                }
+            ai_response = response.choices[0].message.content.strip()
+            log_payload(logger, "🤖 OpenAI response", ai_response)
             
-            try:
-                parsed_response = extract_json_from_response(ai_response)
-                
-                # Validate the response structure
-                if 'pain_points' not in parsed_response:
-                    raise ValueError("Response missing 'pain_points' field")
-                
-                # Ensure pain_points is a list
-                if not isinstance(parsed_response['pain_points'], list):
-                    raise ValueError("'pain_points' field must be a list")
-                
-                # Convert all pain points to strings
-                pain_points_text = []
-                for pain_point in parsed_response['pain_points']:
-                    if isinstance(pain_point, str):
-                        pain_points_text.append(pain_point)
-                    else:
-                        # If it's not a string, convert it
-                        pain_points_text.append(str(pain_point))
-                
-                logger.info(f"✅ Successfully identified {len(pain_points_text)} pain points")
-                
-                return jsonify({
-                    'success': True,
-                    'painPoints': pain_points_text,  # Frontend expects 'painPoints' (camelCase)
-                    'message': 'Pain points analyzed successfully'
-                })
-                
-            except (json.JSONDecodeError, ValueError) as e:
-                logger.error(f"❌ Failed to parse or validate JSON response: {str(e)}")
-                logger.error(f"❌ Raw response: {ai_response}")
-                
-                # Fallback: return the raw response as a single pain point
-                return jsonify({
-                    'success': True,
-                    'painPoints': [ai_response],  # Return raw response as single item
-                    'message': 'Pain points analyzed (manual formatting applied)'
-                })
+            body, status = pain_points_result(ai_response)
+            return jsonify(body), status
                 
         except Exception as openai_error:
             logger.error(f"❌ OpenAI API error: {str(openai_error)}")
@@ -2936,31 +3534,16 @@ Identify real, specific problems that exist in the content. Each pain point shou
             'message': f'Error diagnosing pain points: {str(e)}'
         }), 500
 
-@app.route('/generate-ai-solution', methods=['POST'])
-def generate_ai_solution():
-    """Generate AI/Automation/Software solutions based on solution text."""
-    try:
-        data = request.get_json()
-        solution_text = data.get('solutionText', '')
-        session_id = data.get('sessionId', '')
-        
-        if not solution_text.strip():
-            return jsonify({
-                'success': False,
-                'message': 'Solution text is required for generation'
-            }), 400
-        
-        logger.info(f"🤖 Generating AI solution for session: {session_id}")
-        logger.info(f"🤖 Solution text length: {len(solution_text)} characters")
-        
-        # Truncate content if it's too long to prevent context length issues
-        max_content_length = 8000  # Conservative limit to leave room for prompt and response
-        if len(solution_text) > max_content_length:
-            solution_text = solution_text[:max_content_length] + "... [Content truncated due to length]"
-            logger.info(f"⚠️ Solution text truncated to {max_content_length} characters")
-        
-        # Prepare the prompt for OpenAI
-        prompt = f"""
+def ai_solution_request(solution_text):
+    """chat.completions.create() arguments for /generate-ai-solution."""
+    # Truncate content if it's too long to prevent context length issues
+    max_content_length = 8000  # Conservative limit to leave room for prompt and response
+    if len(solution_text) > max_content_length:
+        solution_text = solution_text[:max_content_length] + "... [Content truncated due to length]"
+        logger.info(f"⚠️ Solution text truncated to {max_content_length} characters")
+    
+    # Prepare the prompt for OpenAI
+    prompt = f"""
 You are an expert solution architect specializing in AI, Automation, and Software solutions. Your goal is to provide the quickest, easiest, and most seamless solution for the client.
 
 Analyze the following problem/need and provide a comprehensive AI/Automation/Software solution that focuses on:
@@ -3000,44 +3583,82 @@ Problem/Need to solve:
 
 Provide a detailed, practical solution that can be implemented immediately:
 """
+    
+    return {
+        "model": "gpt-4o",  # Use gpt-4o which has a larger context window
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are an expert solution architect who specializes in rapid deployment of AI, Automation, and Software solutions. You always recommend the fastest, most cost-effective approach using existing tools and services."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "max_tokens": 4000,  # Generous limit for detailed solutions
+        "temperature": 0.3  # Lower temperature for more focused, practical solutions
+    }
+
+def ai_solution_result(ai_response):
+    """
+    /generate-ai-solution response from the model's reply.
+    
+    Returns:
+        tuple: (response body, HTTP status)
+    """
+    logger.info(f"🤖 OpenAI solution response length: {len(ai_response)} characters")
+    
+    if not ai_response:
+        return {
+            'success': False,
+            'message': 'No solution generated by AI'
+        }, 200
+    
+    logger.info(f"✅ AI solution generated successfully")
+    
+    return {
+        'success': True,
+        'generatedSolution': ai_response,
+        'message': 'AI solution generated successfully'
+    }, 200
 
+@app.route('/generate-ai-solution', methods=['POST'])
+def generate_ai_solution():
+    """Generate AI/Automation/Software solutions based on solution text."""
+    try:
+        data = request.get_json()
+        solution_text = data.get('solutionText', '')
+        session_id = data.get('sessionId', '')
+        
+        if not solution_text.strip():
+            return jsonify({
+                'success': False,
+                'message': 'Solution text is required for generation'
+            }), 400
+        
+        logger.info(f"🤖 Generating AI solution for session: {session_id}")
+        logger.info(f"🤖 Solution text length: {len(solution_text)} characters")
+        
+        if wants_event_stream(data):
+            return stream_generation(
+                'generate-ai-solution',
+                lambda: stream_completion(get_openai_client(timeout=TIMEOUT_CHAT), **ai_solution_request(solution_text)),
+                lambda ai_response: ai_solution_result(ai_response.strip()),
+                'AI solution generation failed',
+                trace_input={"solution_text_length": len(solution_text)},
+                session_id=session_id)
+        
         # Call OpenAI API using LangFuse-wrapped client
         try:
-            # Initialize LangFuse-wrapped OpenAI client
-            client = langfuse_openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+            # Shared keep-alive client (tracing configured in utils.openai_client)
+            client = get_openai_client(timeout=TIMEOUT_CHAT)
             
-            response = client.chat.completions.create(
-                model="gpt-4o",  # Use gpt-4o which has a larger context window
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert solution architect who specializes in rapid deployment of AI, Automation, and Software solutions. You always recommend the fastest, most cost-effective approach using existing tools and services."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=4000,  # Generous limit for detailed solutions
-                temperature=0.3  # Lower temperature for more focused, practical solutions
-            )
+            response = client.chat.completions.create(**ai_solution_request(solution_text))
             
             ai_response = response.choices[0].message.content.strip()
-            logger.info(f"🤖 OpenAI solution response length: {len(ai_response)} characters")
-            
-            if not ai_response:
-                return jsonify({
-                    'success': False,
-                    'message': 'No solution generated by AI'
-                })
-            
-            logger.info(f"✅ AI solution generated successfully")
-            
-            return jsonify({
-                'success': True,
-                'generatedSolution': ai_response,
-                'message': 'AI solution generated successfully'
-            })
+            body, status = ai_solution_result(ai_response)
+            return jsonify(body), status
                 
         except Exception as openai_error:
             logger.error(f"❌ OpenAI API error: {str(openai_error)}")
@@ -3068,91 +3689,18 @@ def save_structuring_session():
         
         session_data = structuring_session[session_id]
         logger.info(f"💾 Saving structuring session {session_id} to database")
-        logger.info(f"📊 Complete Structuring Session Object Structure:")
-        logger.info(f"Structuring Session Data: {json.dumps(session_data, indent=2)}")
+        log_payload(logger, "Structuring Session Data", session_data)
         
-        # Get database connection
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({
-                'success': False,
-                'message': 'Database connection failed'
-            }), 500
+        # Written by the write-behind session writer; a new session gets its row id now
+        row_id = session_writer.save('structuring', session_id, session_data)
         
-        try:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
-            # Get the current row value from badge
-            badge = session_data.get('badge', {})
-            current_row = badge.get('row', 0)
-            
-            # Check if row exists in database
-            cursor.execute("SELECT id FROM ai_architecture_sessions WHERE id = %s", (current_row,))
-            existing_row = cursor.fetchone()
-            
-            if existing_row and current_row > 0:
-                # Row exists - update diagram_texts_json
-                logger.info(f"🔄 Updating existing row {current_row} with structuring session data")
-                cursor.execute(
-                    "UPDATE ai_architecture_sessions SET diagram_texts_json = %s WHERE id = %s",
-                    (json.dumps(session_data), current_row)
-                )
-                row_id = current_row
-                
-            else:
-                # Row doesn't exist - create new row
-                logger.info("🆕 Creating new row for structuring session data")
-                
-                # Extract title and client from session data
-                basic_info = session_data.get('basic', {})
-                title = basic_info.get('title', '')
-                client = basic_info.get('client', '')
-                
-                logger.info(f"📝 Extracted structuring metadata - Title: '{title}', Client: '{client}'")
-                
-                # Insert new row and get the generated ID
-                cursor.execute(
-                    """INSERT INTO ai_architecture_sessions (diagram_texts_json, title, client) 
-                       VALUES (%s, %s, %s) RETURNING id""",
-                    (json.dumps(session_data), title, client)
-                )
-                
-                new_row = cursor.fetchone()
-                row_id = new_row['id']
-                
-                # Update the badge row value in the session with the new row ID
-                structuring_session[session_id]['badge']['row'] = row_id
-                
-                # Update the database with the corrected session data (with updated badge)
-                cursor.execute(
-                    "UPDATE ai_architecture_sessions SET diagram_texts_json = %s WHERE id = %s",
-                    (json.dumps(structuring_session[session_id]), row_id)
-                )
-                
-                logger.info(f"✅ Created new row {row_id} and updated structuring badge row value")
-            
-            # Commit the transaction
-            conn.commit()
-            
-            logger.info(f"🎉 Successfully saved structuring session {session_id} to database row {row_id}")
-            
-            return jsonify({
-                'success': True,
-                'message': f'Structuring session saved successfully to row {row_id}',
-                'row_id': row_id
-            })
-            
-        except Exception as db_error:
-            conn.rollback()
-            logger.error(f"💥 Database operation error: {str(db_error)}")
-            return jsonify({
-                'success': False,
-                'message': f'Database error: {str(db_error)}'
-            }), 500
-            
-        finally:
-            cursor.close()
-            conn.close()
+        logger.info(f"🎉 Queued structuring session {session_id} for database row {row_id}")
+        
+        return jsonify({
+            'success': True,
+            'message': f'Structuring session saved successfully to row {row_id}',
+            'row_id': row_id
+        })
             
     except Exception as e:
         logger.error(f"💥 Error saving structuring session: {str(e)}")
@@ -3186,6 +3734,9 @@ def delete_structuring_session():
         badge = session_data.get('badge', {})
         row_id = badge.get('row', 0)
         
+        # A queued write would otherwise recreate the deleted row
+        session_writer.discard('structuring', session_id)
+        
         # Delete from database if row ID exists
         if row_id and row_id > 0:
             logger.info(f"🗑️ Deleting structuring session {session_id} from database row {row_id}")
@@ -3245,6 +3796,9 @@ def load_structuring_session(session_id):
     try:
         logger.info(f"🔄 Loading structuring session {session_id} from database")
         
+        # Rows must include edits still waiting in the write-behind queue
+        session_writer.flush(rows=[session_id])
+        
         # Get database connection
         conn = get_db_connection()
         if not conn:
@@ -3282,7 +3836,7 @@ def load_structuring_session(session_id):
             structuring_session[new_session_id] = loaded_structuring_session_data.copy()
             
             logger.info(f"✅ Successfully loaded structuring session {session_id} as new session {new_session_id}")
-            logger.info(f"📊 Loaded structuring session structure: {json.dumps(loaded_structuring_session_data, indent=2)}")
+            log_payload(logger, "📊 Loaded structuring session structure", loaded_structuring_session_data)
             
             # Redirect to structuring page with the new session ID and a flag indicating it's loaded
             return redirect(f'/structuring?session_id={new_session_id}&loaded=true')
@@ -3379,7 +3933,7 @@ def visuals_page():
         }
         
         logger.info(f"New Visuals session created: {session_id}")
-        logger.info(f"Initial Visuals session structure: {json.dumps(visuals_session[session_id], indent=2)}")
+        log_payload(logger, "Initial Visuals session structure", visuals_session[session_id])
     
     # Pass additional context for loaded sessions
     is_loaded_session = loaded_param == 'true'
@@ -3396,7 +3950,11 @@ def update_visuals_session():
     try:
         data = request.get_json()
         session_id = data.get('sessionId', '')
-        session_data = data.get('data', {})
+        
+        # Delta update: RFC 6902 patch against a known session version
+        if 'patch' in data:
+            return patch_session('visuals', visuals_session, data.get('sessionId'), data)
+        session_data = store_session_images(data.get('data', {}))
         
         if not session_id:
             return jsonify({
@@ -3405,7 +3963,7 @@ def update_visuals_session():
             }), 400
         
         logger.info(f"📝 Updating visuals session: {session_id}")
-        logger.info(f"📝 Session data: {session_data}")
+        log_payload(logger, "📝 Session data", session_data)
         
         # Initialize session if it doesn't exist
         if session_id not in visuals_session:
@@ -3447,12 +4005,15 @@ def update_visuals_session():
         for key, value in session_data.items():
             if key not in ['badge', 'basic']:
                 current_session[key] = value
-                logger.info(f"📝 Updated {key}: {value}")
+                log_payload(logger, f"📝 Updated {key}", value)
         
         logger.info(f"✅ Visuals session {session_id} updated successfully")
         
+        version = record_session_edit('visuals', session_id, current_session)
+        
         return jsonify({
             'success': True,
+            'version': version,
             'message': 'Visuals session updated successfully',
             'session_id': session_id,
             'data': current_session
@@ -3496,91 +4057,18 @@ def save_visuals_session():
         
         session_data = visuals_session[session_id]
         logger.info(f"💾 Saving visuals session {session_id} to database")
-        logger.info(f"📊 Complete Visuals Session Object Structure:")
-        logger.info(f"Visuals Session Data: {json.dumps(session_data, indent=2)}")
+        log_payload(logger, "Visuals Session Data", session_data)
         
-        # Get database connection
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({
-                'success': False,
-                'message': 'Database connection failed'
-            }), 500
+        # Written by the write-behind session writer; a new session gets its row id now
+        row_id = session_writer.save('visuals', session_id, session_data)
         
-        try:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
-            # Get the current row value from badge
-            badge = session_data.get('badge', {})
-            current_row = badge.get('row', 0)
-            
-            # Check if row exists in database
-            cursor.execute("SELECT id FROM ai_architecture_sessions WHERE id = %s", (current_row,))
-            existing_row = cursor.fetchone()
-            
-            if existing_row and current_row > 0:
-                # Row exists - update visual_assets_json
-                logger.info(f"🔄 Updating existing row {current_row} with visuals session data")
-                cursor.execute(
-                    "UPDATE ai_architecture_sessions SET visual_assets_json = %s WHERE id = %s",
-                    (json.dumps(session_data), current_row)
-                )
-                row_id = current_row
-                
-            else:
-                # Row doesn't exist - create new row
-                logger.info("🆕 Creating new row for visuals session data")
-                
-                # Extract title and client from session data
-                basic_info = session_data.get('basic', {})
-                title = basic_info.get('title', '')
-                client = basic_info.get('client', '')
-                
-                logger.info(f"📝 Extracted visuals metadata - Title: '{title}', Client: '{client}'")
-                
-                # Insert new row and get the generated ID
-                cursor.execute(
-                    """INSERT INTO ai_architecture_sessions (visual_assets_json, title, client) 
-                       VALUES (%s, %s, %s) RETURNING id""",
-                    (json.dumps(session_data), title, client)
-                )
-                
-                new_row = cursor.fetchone()
-                row_id = new_row['id']
-                
-                # Update the badge row value in the session with the new row ID
-                visuals_session[session_id]['badge']['row'] = row_id
-                
-                # Update the database with the corrected session data (with updated badge)
-                cursor.execute(
-                    "UPDATE ai_architecture_sessions SET visual_assets_json = %s WHERE id = %s",
-                    (json.dumps(visuals_session[session_id]), row_id)
-                )
-                
-                logger.info(f"✅ Created new row {row_id} and updated visuals badge row value")
-            
-            # Commit the transaction
-            conn.commit()
-            
-            logger.info(f"🎉 Successfully saved visuals session {session_id} to database row {row_id}")
-            
-            return jsonify({
-                'success': True,
-                'message': f'Visuals session saved successfully to row {row_id}',
-                'row_id': row_id
-            })
-            
-        except Exception as db_error:
-            conn.rollback()
-            logger.error(f"💥 Database operation error: {str(db_error)}")
-            return jsonify({
-                'success': False,
-                'message': f'Database error: {str(db_error)}'
-            }), 500
-            
-        finally:
-            cursor.close()
-            conn.close()
+        logger.info(f"🎉 Queued visuals session {session_id} for database row {row_id}")
+        
+        return jsonify({
+            'success': True,
+            'message': f'Visuals session saved successfully to row {row_id}',
+            'row_id': row_id
+        })
             
     except Exception as e:
         logger.error(f"💥 Error saving visuals session: {str(e)}")
@@ -3614,6 +4102,9 @@ def delete_visuals_session():
         badge = session_data.get('badge', {})
         row_id = badge.get('row', 0)
         
+        # A queued write would otherwise recreate the deleted row
+        session_writer.discard('visuals', session_id)
+        
         # Delete from database if row ID exists
         if row_id and row_id > 0:
             logger.info(f"🗑️ Deleting visuals session {session_id} from database row {row_id}")
@@ -3673,6 +4164,9 @@ def load_visuals_session(session_id):
     try:
         logger.info(f"🔄 Loading visuals session {session_id} from database")
         
+        # Rows must include edits still waiting in the write-behind queue
+        session_writer.flush(rows=[session_id])
+        
         # Get database connection
         conn = get_db_connection()
         if not conn:
@@ -3710,7 +4204,7 @@ def load_visuals_session(session_id):
             visuals_session[new_session_id] = loaded_visuals_session_data.copy()
             
             logger.info(f"✅ Successfully loaded visuals session {session_id} as new session {new_session_id}")
-            logger.info(f"📊 Loaded visuals session structure: {json.dumps(loaded_visuals_session_data, indent=2)}")
+            log_payload(logger, "📊 Loaded visuals session structure", loaded_visuals_session_data)
             
             # Redirect to visuals page with the new session ID and a flag indicating it's loaded
             return redirect(f'/visuals?session_id={new_session_id}&loaded=true')
@@ -3736,6 +4230,10 @@ def load_visuals_session(session_id):
 @app.route('/generate-diagram-description', methods=['POST'])
 def generate_diagram_description():
     """Generate diagram description based on ideation content using OpenAI."""
+    data = request.get_json(silent=True) or {}
+    if wants_event_stream(data):
+        return stream_diagram_description(data)
+    
     # Start a LangFuse trace for this request
     if langfuse:
         try:
@@ -3802,18 +4300,7 @@ def generate_diagram_description():
                     diagram_description = generate_diagram_description_with_openai(ideation_content)
                     
                     # Update the visuals session with the generated description
-                    if session_id in visuals_session:
-                        # Find the diagram with the matching ID and update the planning field
-                        diagrams = visuals_session[session_id].get('diagrams', [])
-                        for diagram in diagrams:
-                            if str(diagram.get('id')) == str(diagram_id):
-                                diagram['planning'] = diagram_description
-                                logger.info(f"Updated planning field for diagram {diagram_id}")
-                                break
-                        else:
-                            logger.warning(f"Diagram with ID {diagram_id} not found in session {session_id}")
-                    else:
-                        logger.warning(f"Session {session_id} not found in visuals_session")
+                    store_diagram_planning(session_id, diagram_id, diagram_description)
                     
                     span.update(
                         output={
@@ -3877,18 +4364,7 @@ def generate_diagram_description():
         diagram_description = generate_diagram_description_with_openai(ideation_content)
         
         # Update the visuals session with the generated description
-        if session_id in visuals_session:
-            # Find the diagram with the matching ID and update the planning field
-            diagrams = visuals_session[session_id].get('diagrams', [])
-            for diagram in diagrams:
-                if str(diagram.get('id')) == str(diagram_id):
-                    diagram['planning'] = diagram_description
-                    logger.info(f"Updated planning field for diagram {diagram_id}")
-                    break
-            else:
-                logger.warning(f"Diagram with ID {diagram_id} not found in session {session_id}")
-        else:
-            logger.warning(f"Session {session_id} not found in visuals_session")
+        store_diagram_planning(session_id, diagram_id, diagram_description)
         
         return jsonify({
             'success': True,
@@ -3903,6 +4379,66 @@ def generate_diagram_description():
             'message': f'Error generating diagram description: {str(e)}'
         }), 500
 
+def store_diagram_planning(session_id, diagram_id, diagram_description):
+    """Set the planning field of a diagram in the visuals session to a generated description."""
+    if session_id in visuals_session:
+        # Find the diagram with the matching ID and update the planning field
+        diagrams = visuals_session[session_id].get('diagrams', [])
+        for diagram in diagrams:
+            if str(diagram.get('id')) == str(diagram_id):
+                diagram['planning'] = diagram_description
+                logger.info(f"Updated planning field for diagram {diagram_id}")
+                record_session_edit('visuals', session_id, visuals_session[session_id])
+                break
+        else:
+            logger.warning(f"Diagram with ID {diagram_id} not found in session {session_id}")
+    else:
+        logger.warning(f"Session {session_id} not found in visuals_session")
+
+def stream_diagram_description(data):
+    """/generate-diagram-description streamed as server-sent events (see stream_generation)."""
+    session_id = data.get('sessionId', '')
+    diagram_id = data.get('diagramId', '')
+    ideation_content = data.get('ideationContent', '').strip()
+    
+    # Validate inputs
+    if not ideation_content:
+        return jsonify({
+            'success': False,
+            'message': 'Ideation content is required'
+        }), 400
+        
+    if not session_id:
+        return jsonify({
+            'success': False,
+            'message': 'Session ID is required'
+        }), 400
+    
+    # Import the utility function
+    from utils.vision_api import stream_diagram_description_with_openai
+    
+    def finish(diagram_description):
+        diagram_description = diagram_description.strip()
+        store_diagram_planning(session_id, diagram_id, diagram_description)
+        return {
+            'success': True,
+            'diagram_description': diagram_description,
+            'message': 'Diagram description generated successfully'
+        }, 200
+    
+    logger.info(f"Streaming diagram description for session {session_id}, diagram {diagram_id}")
+    return stream_generation(
+        'generate-diagram-description',
+        lambda: stream_diagram_description_with_openai(ideation_content),
+        finish,
+        "Error generating diagram description",
+        trace_input={
+            "session_id": session_id,
+            "diagram_id": diagram_id,
+            "ideation_content": ideation_content[:200] + "..." if len(ideation_content) > 200 else ideation_content
+        },
+        session_id=session_id)
+
 @app.route('/generate-sketch-content', methods=['POST'])
 def generate_sketch_content():
     """Generate sketch content based on planning content using OpenAI's assistant API."""
@@ -3963,69 +4499,30 @@ def generate_sketch_content():
                         }
                     )
                     
-                    logger.info(f"Generating sketch content for session {session_id}, diagram {diagram_id}")
+                    if wants_background_job(data):
+                        span.update(output={"success": True, "background_job": True})
+                        return respond_with_sketch_job(data, session_id, diagram_id, planning_content)
                     
-                    # Import the utility function
-                    from utils.vision_api import generate_sketch_with_openai_assistant
-                    
-                    # Generate sketch content using OpenAI assistant
-                    logger.info("Generating sketch content with OpenAI assistant")
-                    sketch_content = generate_sketch_with_openai_assistant(planning_content)
+                    body, status = generate_sketch_job(session_id, diagram_id, planning_content)
                     
-                    # Check if the response indicates an error
-                    if isinstance(sketch_content, str) and sketch_content.startswith("Error:"):
-                        logger.warning(f"Assistant returned error: {sketch_content}")
+                    if body['success']:
+                        sketch_content = body['sketch_content']
                         span.update(
-                            output={"success": False, "message": sketch_content},
-                            level="ERROR"
+                            output={
+                                "success": True,
+                                "sketch_content": sketch_content[:200] + "..." if len(sketch_content) > 200 else sketch_content
+                            },
+                            metadata={
+                                "sketch_content_length": len(sketch_content)
+                            }
                         )
-                        return jsonify({
-                            'success': False,
-                            'message': sketch_content
-                        }), 400
-                    
-                    # Validate the response
-                    if not sketch_content or not sketch_content.strip():
-                        error_msg = "Assistant returned empty response. Please try again."
-                        logger.error(error_msg)
+                    else:
                         span.update(
-                            output={"success": False, "message": error_msg},
+                            output={"success": False, "message": body['message']},
                             level="ERROR"
                         )
-                        return jsonify({
-                            'success': False,
-                            'message': error_msg
-                        }), 500
-                    
-                    # Update the visuals session with the generated sketch content
-                    if session_id in visuals_session:
-                        # Find the diagram with the matching ID and update the sketch field
-                        diagrams = visuals_session[session_id].get('diagrams', [])
-                        for diagram in diagrams:
-                            if str(diagram.get('id')) == str(diagram_id):
-                                diagram['sketch'] = sketch_content
-                                logger.info(f"Updated sketch field for diagram {diagram_id}")
-                                break
-                        else:
-                            logger.warning(f"Diagram with ID {diagram_id} not found in session {session_id}")
-                    else:
-                        logger.warning(f"Session {session_id} not found in visuals_session")
-                    
-                    span.update(
-                        output={
-                            "success": True,
-                            "sketch_content": sketch_content[:200] + "..." if len(sketch_content) > 200 else sketch_content
-                        },
-                        metadata={
-                            "sketch_content_length": len(sketch_content)
-                        }
-                    )
                     
-                    return jsonify({
-                        'success': True,
-                        'sketch_content': sketch_content,
-                        'message': 'Sketch content generated successfully'
-                    })
+                    return jsonify(body), status
                     
                 except Exception as e:
                     logger.error(f"Error generating sketch content: {str(e)}")
@@ -4063,51 +4560,7 @@ def generate_sketch_content():
                 'message': 'Session ID is required'
             }), 400
         
-        logger.info(f"Generating sketch content for session {session_id}, diagram {diagram_id}")
-        
-        # Import the utility function
-        from utils.vision_api import generate_sketch_with_openai_assistant
-        
-        # Generate sketch content using OpenAI assistant
-        logger.info("Generating sketch content with OpenAI assistant")
-        sketch_content = generate_sketch_with_openai_assistant(planning_content)
-        
-        # Check if the response indicates an error
-        if isinstance(sketch_content, str) and sketch_content.startswith("Error:"):
-            logger.warning(f"Assistant returned error: {sketch_content}")
-            return jsonify({
-                'success': False,
-                'message': sketch_content
-            }), 400
-        
-        # Validate the response
-        if not sketch_content or not sketch_content.strip():
-            error_msg = "Assistant returned empty response. Please try again."
-            logger.error(error_msg)
-            return jsonify({
-                'success': False,
-                'message': error_msg
-            }), 500
-        
-        # Update the visuals session with the generated sketch content
-        if session_id in visuals_session:
-            # Find the diagram with the matching ID and update the sketch field
-            diagrams = visuals_session[session_id].get('diagrams', [])
-            for diagram in diagrams:
-                if str(diagram.get('id')) == str(diagram_id):
-                    diagram['sketch'] = sketch_content
-                    logger.info(f"Updated sketch field for diagram {diagram_id}")
-                    break
-            else:
-                logger.warning(f"Diagram with ID {diagram_id} not found in session {session_id}")
-        else:
-            logger.warning(f"Session {session_id} not found in visuals_session")
-        
-        return jsonify({
-            'success': True,
-            'sketch_content': sketch_content,
-            'message': 'Sketch content generated successfully'
-        })
+        return respond_with_sketch_job(data, session_id, diagram_id, planning_content)
         
     except Exception as e:
         logger.error(f"Error handling request /generate-sketch-content: {str(e)}")
@@ -4116,6 +4569,68 @@ def generate_sketch_content():
             'message': f'Error generating sketch content: {str(e)}'
         }), 500
 
+
+def respond_with_sketch_job(data, session_id, diagram_id, planning_content):
+    """respond_with_job() for a sketch; the same planning content for the same diagram is the same job."""
+    content_hash = hashlib.sha256(planning_content.encode('utf-8')).hexdigest()[:16]
+    return respond_with_job('sketch', f"{session_id}:{diagram_id}:{content_hash}", data,
+                            generate_sketch_job, session_id, diagram_id, planning_content)
+
+
+def generate_sketch_job(session_id, diagram_id, planning_content):
+    """
+    Sketch generation for /generate-sketch-content, run inline or as a
+    background job: runs the sketch assistant and stores the result on the
+    diagram. Returns (response body, HTTP status).
+    """
+    logger.info(f"Generating sketch content for session {session_id}, diagram {diagram_id}")
+    
+    # Import the utility function
+    from utils.vision_api import generate_sketch_with_openai_assistant
+    
+    # Generate sketch content using OpenAI assistant
+    logger.info("Generating sketch content with OpenAI assistant")
+    job_progress("Generating sketch with OpenAI assistant", 10)
+    sketch_content = generate_sketch_with_openai_assistant(planning_content)
+    
+    # Check if the response indicates an error
+    if isinstance(sketch_content, str) and sketch_content.startswith("Error:"):
+        logger.warning(f"Assistant returned error: {sketch_content}")
+        return {
+            'success': False,
+            'message': sketch_content
+        }, 400
+    
+    # Validate the response
+    if not sketch_content or not sketch_content.strip():
+        error_msg = "Assistant returned empty response. Please try again."
+        logger.error(error_msg)
+        return {
+            'success': False,
+            'message': error_msg
+        }, 500
+    
+    # Update the visuals session with the generated sketch content
+    if session_id in visuals_session:
+        # Find the diagram with the matching ID and update the sketch field
+        diagrams = visuals_session[session_id].get('diagrams', [])
+        for diagram in diagrams:
+            if str(diagram.get('id')) == str(diagram_id):
+                diagram['sketch'] = sketch_content
+                logger.info(f"Updated sketch field for diagram {diagram_id}")
+                record_session_edit('visuals', session_id, visuals_session[session_id])
+                break
+        else:
+            logger.warning(f"Diagram with ID {diagram_id} not found in session {session_id}")
+    else:
+        logger.warning(f"Session {session_id} not found in visuals_session")
+    
+    return {
+        'success': True,
+        'sketch_content': sketch_content,
+        'message': 'Sketch content generated successfully'
+    }, 200
+
 @app.route('/visuals/sketch-<glyph>-<int:diagram_id>.XML')
 def serve_sketch_xml(glyph, diagram_id):
     """Serve sketch XML file for Draw.io integration."""
@@ -4218,6 +4733,9 @@ def convert_text_to_visual():
         
         logger.info(f"🔄 Converting Text → Visual for session: {session_id}")
         
+        # Rows must include edits still waiting in the write-behind queue
+        session_writer.flush(rows=[session_id])
+        
         # Get database connection
         conn = get_db_connection()
         if not conn:
@@ -4244,7 +4762,7 @@ def convert_text_to_visual():
                 }), 404
             
             source_data = result['diagram_texts_json']
-            logger.info(f"📊 Source diagram_texts_json structure: {json.dumps(source_data, indent=2)}")
+            log_payload(logger, "📊 Source diagram_texts_json structure", source_data)
             
             # Transform the data according to specifications
             visual_data = {}
@@ -4311,7 +4829,7 @@ def convert_text_to_visual():
                     'sketch': ''
                 }]
             
-            logger.info(f"📊 Transformed visual_assets_json structure: {json.dumps(visual_data, indent=2)}")
+            log_payload(logger, "📊 Transformed visual_assets_json structure", visual_data)
             
             # Update the database with the new visual_assets_json
             cursor.execute(
@@ -4364,47 +4882,80 @@ def convert_solution_to_sow():
                 'message': 'Session ID is required'
             }), 400
         
-        logger.info(f"🔄 Converting Solution → SoW for session {session_id}")
+        return respond_with_job('solution-to-sow', session_id, data, solution_to_sow_job, session_id)
         
-        # Get session data from database
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({
-                'success': False,
-                'message': 'Database connection failed'
-            }), 500
-        
-        try:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
+    except Exception as e:
+        logger.error(f"💥 Error converting Solution → SoW: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        }), 500
+
+
+# The conversion jobs spend minutes in assistant calls; they hold a pooled
+# connection only for the read before and the write after, not in between
+def read_session_column(session_id, column):
+    """
+    Read one JSON column of a session row on a short-lived connection.
+
+    Returns:
+        The column's value, or None if there is no such row
+    """
+    with db_pool.connection() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
             cursor.execute(
-                "SELECT session_objects FROM ai_architecture_sessions WHERE id = %s",
+                sql.SQL("SELECT {col} FROM ai_architecture_sessions WHERE id = %s").format(col=sql.Identifier(column)),
                 (session_id,)
             )
-            
             result = cursor.fetchone()
-            if not result or not result['session_objects']:
-                return jsonify({
+    return result[column] if result else None
+
+def write_session_column(session_id, column, value):
+    """Store a JSON value in one column of a session row, in its own short transaction."""
+    with db_pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                sql.SQL("UPDATE ai_architecture_sessions SET {col} = %s WHERE id = %s").format(col=sql.Identifier(column)),
+                (json.dumps(value), session_id)
+            )
+
+
+def solution_to_sow_job(session_id):
+    """
+    Solution → SoW conversion for /convert-solution-to-sow, run inline or as a
+    background job. Returns (response body, HTTP status).
+    """
+    try:
+        logger.info(f"🔄 Converting Solution → SoW for session {session_id}")
+        
+        # Rows must include edits still waiting in the write-behind queue
+        session_writer.flush(rows=[session_id])
+        
+        try:
+            # Get session data from database
+            session_objects = read_session_column(session_id, 'session_objects')
+            if not session_objects:
+                return {
                     'success': False,
                     'message': f'Session {session_id} not found or has no data'
-                }), 404
+                }, 404
             
-            session_objects = result['session_objects']
             logger.info(f"📊 Retrieved session objects for conversion")
             
             # Extract solution data
             solution_variables = extract_solution_variables(session_objects)
             
             if not solution_variables:
-                return jsonify({
+                return {
                     'success': False,
                     'message': 'No solution data found with ai_analysis or solution_explanation'
-                }), 400
+                }, 400
             
             logger.info(f"📝 Extracted {len(solution_variables)} solution variables")
             
             # Generate SoW using OpenAI assistant
             logger.info("🤖 Generating SoW with OpenAI assistant...")
+            job_progress(f"Generating SoW from {len(solution_variables)} solutions", 10)
             sow_content = generate_sow_with_openai_assistant(solution_variables)
             
             # Create SoW JSON structure
@@ -4412,37 +4963,30 @@ def convert_solution_to_sow():
             
             # Save to database
             logger.info(f"💾 Saving SoW objects to database for session {session_id}")
-            cursor.execute(
-                "UPDATE ai_architecture_sessions SET sow_objects = %s WHERE id = %s",
-                (json.dumps(sow_objects), session_id)
-            )
-            conn.commit()
+            job_progress("Saving SoW", 90)
+            write_session_column(session_id, 'sow_objects', sow_objects)
             
             logger.info(f"✅ Successfully converted Solution → SoW for session {session_id}")
             
-            return jsonify({
+            return {
                 'success': True,
                 'message': 'Successfully converted Solution → SoW',
                 'sow_data': sow_objects
-            })
+            }, 200
             
         except Exception as db_error:
             logger.error(f"💥 Database error during Solution → SoW conversion: {str(db_error)}")
-            return jsonify({
+            return {
                 'success': False,
                 'message': f'Database error: {str(db_error)}'
-            }), 500
-            
-        finally:
-            cursor.close()
-            conn.close()
+            }, 500
         
     except Exception as e:
         logger.error(f"💥 Error converting Solution → SoW: {str(e)}")
-        return jsonify({
+        return {
             'success': False,
             'message': f'Error: {str(e)}'
-        }), 500
+        }, 500
 
 
 def extract_solution_variables(session_objects):
@@ -4496,8 +5040,8 @@ def generate_sow_with_openai_assistant(solution_variables):
             logger.error("OPENAI_API_KEY environment variable not found")
             raise Exception("OpenAI API key not configured")
         
-        # Initialize OpenAI client
-        client = OpenAI(api_key=api_key)
+        # Shared keep-alive client; run events are streamed, see utils.assistant_runner
+        client = get_openai_client(timeout=TIMEOUT_ASSISTANT_STEP)
         
         # Compile all solution data into prompt
         compiled_content = compile_solution_content(solution_variables)
@@ -4509,9 +5053,6 @@ def generate_sow_with_openai_assistant(solution_variables):
         
         logger.info(f"🤖 Creating thread and running assistant {assistant_id} for SoW generation")
         
-        # Create thread
-        thread = client.beta.threads.create()
-        
         # Create comprehensive prompt for SoW generation
         sow_prompt = f"""Generate a comprehensive Statement of Work based on these solution analyses:
 
@@ -4562,105 +5103,23 @@ Requirements:
 1. Generate comprehensive, professional content based on the solution analyses
 2. Include at least 3-5 objectives
 3. Include 3-5 in-scope deliverables with detailed descriptions
-4. Include 5-8 functional requirements
-5. Include 3-5 non-functional requirements
-6. Create a realistic 3-phase timeline
-7. Make the content detailed and specific to the solutions provided
-8. Return ONLY the JSON object, no additional text"""
-        
-        # Add message to thread
-        client.beta.threads.messages.create(
-            thread_id=thread.id,
-            role="user",
-            content=sow_prompt
-        )
-        
-        # Run assistant
-        run = client.beta.threads.runs.create(
-            thread_id=thread.id,
-            assistant_id=assistant_id
-        )
-        
-        # Wait for completion with extended timeout
-        logger.info(f"⏳ Assistant run started with ID: {run.id}, waiting for completion...")
-        sow_content = wait_for_sow_completion(client, thread.id, run.id, max_wait_time=300)
-        
-        logger.info("✅ Successfully generated SoW content with OpenAI assistant")
-        return sow_content
-        
-    except Exception as e:
-        logger.error(f"💥 Error generating SoW with assistant: {str(e)}")
-        raise Exception(f"SoW generation failed: {str(e)}")
-
-
-def wait_for_sow_completion(client, thread_id, run_id, max_wait_time=300):
-    """Wait for assistant run completion and extract SoW content."""
-    import time
-    
-    start_time = time.time()
-    poll_interval = 3  # Start with 3 second intervals
-    
-    while True:
-        elapsed_time = time.time() - start_time
-        
-        if elapsed_time > max_wait_time:
-            logger.error(f"Assistant run timed out after {max_wait_time} seconds")
-            try:
-                client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
-                logger.info("Cancelled the timed-out assistant run")
-            except Exception as cancel_error:
-                logger.warning(f"Could not cancel run: {cancel_error}")
-            raise Exception(f"Assistant run timed out after {max_wait_time} seconds. Please try again.")
-        
-        # Increase polling interval after 60 seconds
-        if elapsed_time > 60:
-            poll_interval = 5
-        
-        try:
-            run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
-            logger.debug(f"Assistant status: {run.status}, elapsed: {elapsed_time:.1f}s")
-            
-            if run.status == 'completed':
-                logger.info(f"🎉 Assistant run completed successfully after {elapsed_time:.1f}s")
-                break
-            elif run.status in ['failed', 'cancelled', 'expired']:
-                error_msg = f"Assistant run ended with status: {run.status}"
-                if hasattr(run, 'last_error') and run.last_error:
-                    error_msg += f". Error: {run.last_error}"
-                logger.error(error_msg)
-                raise Exception(error_msg)
-            elif run.status in ['queued', 'in_progress', 'cancelling']:
-                time.sleep(poll_interval)
-                continue
-            else:
-                logger.warning(f"Unknown run status: {run.status}, continuing to wait...")
-                time.sleep(poll_interval)
-                continue
-                
-        except Exception as retrieve_error:
-            logger.error(f"Error retrieving run status: {retrieve_error}")
-            raise Exception(f"Could not check assistant status: {str(retrieve_error)}")
-    
-    # Retrieve and extract the response
-    try:
-        messages = client.beta.threads.messages.list(thread_id=thread_id)
-        
-        for message in messages.data:
-            if message.role == 'assistant':
-                content = ""
-                for content_block in message.content:
-                    if content_block.type == 'text':
-                        content += content_block.text.value
-                
-                if content.strip():
-                    logger.info("📄 Successfully extracted SoW content from assistant response")
-                    return parse_sow_json(content.strip())
+4. Include 5-8 functional requirements
+5. Include 3-5 non-functional requirements
+6. Create a realistic 3-phase timeline
+7. Make the content detailed and specific to the solutions provided
+8. Return ONLY the JSON object, no additional text"""
+        
+        # Stream the run on a new thread; returns as soon as the run completes
+        sow_reply = run_assistant(client, assistant_id, sow_prompt, timeout=300, name="SoW")
+        logger.info("📄 Successfully extracted SoW content from assistant response")
+        sow_content = parse_sow_json(sow_reply)
         
-        raise Exception("No assistant response found in thread")
+        logger.info("✅ Successfully generated SoW content with OpenAI assistant")
+        return sow_content
         
-    except Exception as messages_error:
-        logger.error(f"Error retrieving messages: {messages_error}")
-        raise Exception(f"Could not retrieve assistant response: {str(messages_error)}")
+    except Exception as e:
+        logger.error(f"💥 Error generating SoW with assistant: {str(e)}")
+        raise Exception(f"SoW generation failed: {str(e)}")
 
 
 def parse_sow_json(content):
@@ -4793,7 +5252,7 @@ def loe_page():
         }
         
         logger.info(f"New LoE session created: {session_id}")
-        logger.info(f"Initial LoE session structure: {json.dumps(loe_session[session_id], indent=2)}")
+        log_payload(logger, "Initial LoE session structure", loe_session[session_id])
     
     today = datetime.datetime.now().strftime('%Y-%m-%d')
     
@@ -4814,6 +5273,10 @@ def update_loe_session():
         data = request.get_json()
         session_id = data.get('sessionId')
         
+        # Delta update: RFC 6902 patch against a known session version
+        if 'patch' in data:
+            return patch_session('loe', loe_session, data.get('sessionId'), data)
+        
         logger.info(f"🔄 Updating LoE session: {session_id}")
         logger.info(f"📋 Received data keys: {list(data.keys())}")
         
@@ -4897,11 +5360,13 @@ def update_loe_session():
         loe_session[session_id]['badge']['created-at'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
         # Log the complete session structure
-        logger.info(f"✅ Complete LoE session structure:")
-        logger.info(json.dumps(loe_session[session_id], indent=2))
+        log_payload(logger, "✅ Complete LoE session structure", loe_session[session_id])
+        
+        version = record_session_edit('loe', session_id, loe_session[session_id])
         
         return jsonify({
             'success': True,
+            'version': version,
             'message': 'LoE session updated successfully',
             'sessionId': session_id
         })
@@ -4925,7 +5390,7 @@ def generate_loe_pdf():
         
         session_data = loe_session[session_id]
         logger.info(f"Generating LoE PDF for session: {session_id}")
-        logger.info(f"LoE session data: {json.dumps(session_data, indent=2)}")
+        log_payload(logger, "LoE session data", session_data)
         
         # Validate required fields
         basic_info = session_data.get('basic', {})
@@ -5035,6 +5500,9 @@ def delete_loe_session():
         badge = session_data.get('badge', {})
         row_id = badge.get('row', 0)
         
+        # A queued write would otherwise recreate the deleted row
+        session_writer.discard('loe', session_id)
+        
         # Delete from database if row ID exists
         if row_id and row_id > 0:
             logger.info(f"🗑️ Deleting LoE session {session_id} from database row {row_id}")
@@ -5103,91 +5571,18 @@ def save_loe_session():
         
         session_data = loe_session[session_id]
         logger.info(f"💾 Saving LoE session {session_id} to database")
-        logger.info(f"📊 Complete LoE Session Object Structure:")
-        logger.info(f"LoE Session Data: {json.dumps(session_data, indent=2)}")
+        log_payload(logger, "LoE Session Data", session_data)
         
-        # Get database connection
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({
-                'success': False,
-                'message': 'Database connection failed'
-            }), 500
+        # Written by the write-behind session writer; a new session gets its row id now
+        row_id = session_writer.save('loe', session_id, session_data)
         
-        try:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
-            # Get the current row value from badge
-            badge = session_data.get('badge', {})
-            current_row = badge.get('row', 0)
-            
-            # Check if row exists in database
-            cursor.execute("SELECT id FROM ai_architecture_sessions WHERE id = %s", (current_row,))
-            existing_row = cursor.fetchone()
-            
-            if existing_row and current_row > 0:
-                # Row exists - update loe_objects
-                logger.info(f"🔄 Updating existing row {current_row} with LoE session data")
-                cursor.execute(
-                    "UPDATE ai_architecture_sessions SET loe_objects = %s WHERE id = %s",
-                    (json.dumps(session_data), current_row)
-                )
-                row_id = current_row
-                
-            else:
-                # Row doesn't exist - create new row
-                logger.info("🆕 Creating new row for LoE session data")
-                
-                # Extract title and client from session data
-                basic_info = session_data.get('basic', {})
-                project = basic_info.get('project', '')
-                client = basic_info.get('client', '')
-                
-                logger.info(f"📝 Extracted LoE metadata - Project: '{project}', Client: '{client}'")
-                
-                # Insert new row and get the generated ID
-                cursor.execute(
-                    """INSERT INTO ai_architecture_sessions (loe_objects, title, client) 
-                       VALUES (%s, %s, %s) RETURNING id""",
-                    (json.dumps(session_data), project, client)
-                )
-                
-                new_row = cursor.fetchone()
-                row_id = new_row['id']
-                
-                # Update the badge row value in the session with the new row ID
-                loe_session[session_id]['badge']['row'] = row_id
-                
-                # Update the database with the corrected session data (with updated badge)
-                cursor.execute(
-                    "UPDATE ai_architecture_sessions SET loe_objects = %s WHERE id = %s",
-                    (json.dumps(loe_session[session_id]), row_id)
-                )
-                
-                logger.info(f"✅ Created new row {row_id} and updated LoE badge row value")
-            
-            # Commit the transaction
-            conn.commit()
-            
-            logger.info(f"🎉 Successfully saved LoE session {session_id} to database row {row_id}")
-            
-            return jsonify({
-                'success': True,
-                'message': f'LoE session saved successfully to row {row_id}',
-                'row_id': row_id
-            })
-            
-        except Exception as db_error:
-            conn.rollback()
-            logger.error(f"💥 Database operation error: {str(db_error)}")
-            return jsonify({
-                'success': False,
-                'message': f'Database error: {str(db_error)}'
-            }), 500
-            
-        finally:
-            cursor.close()
-            conn.close()
+        logger.info(f"🎉 Queued LoE session {session_id} for database row {row_id}")
+        
+        return jsonify({
+            'success': True,
+            'message': f'LoE session saved successfully to row {row_id}',
+            'row_id': row_id
+        })
             
     except Exception as e:
         logger.error(f"💥 Error saving LoE session: {str(e)}")
@@ -5202,6 +5597,9 @@ def load_loe_session(session_id):
     try:
         logger.info(f"🔄 Loading LoE session {session_id} from database")
         
+        # Rows must include edits still waiting in the write-behind queue
+        session_writer.flush(rows=[session_id])
+        
         # Get database connection
         conn = get_db_connection()
         if not conn:
@@ -5239,7 +5637,7 @@ def load_loe_session(session_id):
             loe_session[new_session_id] = loaded_loe_session_data.copy()
             
             logger.info(f"✅ Successfully loaded LoE session {session_id} as new session {new_session_id}")
-            logger.info(f"📊 Loaded LoE session structure: {json.dumps(loaded_loe_session_data, indent=2)}")
+            log_payload(logger, "📊 Loaded LoE session structure", loaded_loe_session_data)
             
             # Redirect to LoE page with the new session ID and a flag indicating it's loaded
             return redirect(f'/loe?session_id={new_session_id}&loaded=true')
@@ -5292,47 +5690,52 @@ def convert_sow_to_loe():
                 'message': 'Session ID is required'
             }), 400
         
+        return respond_with_job('sow-to-loe', session_id, data, sow_to_loe_job, session_id)
+        
+    except Exception as e:
+        logger.error(f"💥 Error converting SoW → LoE: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        }), 500
+
+
+def sow_to_loe_job(session_id):
+    """
+    SoW → LoE conversion for /convert-sow-to-loe, run inline or as a
+    background job. Returns (response body, HTTP status).
+    """
+    try:
         logger.info(f"🔄 Converting SoW → LoE for session {session_id}")
         
-        # Get session data from database
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({
-                'success': False,
-                'message': 'Database connection failed'
-            }), 500
+        # Rows must include edits still waiting in the write-behind queue
+        session_writer.flush(rows=[session_id])
         
         try:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
-            cursor.execute(
-                "SELECT sow_objects FROM ai_architecture_sessions WHERE id = %s",
-                (session_id,)
-            )
-            
-            result = cursor.fetchone()
-            if not result or not result['sow_objects']:
-                return jsonify({
+            # Get session data from database
+            sow_objects = read_session_column(session_id, 'sow_objects')
+            if not sow_objects:
+                return {
                     'success': False,
                     'message': f'Session {session_id} not found or has no SoW data'
-                }), 404
+                }, 404
             
-            sow_objects = result['sow_objects']
             logger.info(f"📊 Retrieved SoW objects for LoE conversion")
             
             # Extract all SoW data for LoE generation
             sow_content = extract_sow_content(sow_objects)
             
             if not sow_content:
-                return jsonify({
+                return {
                     'success': False,
                     'message': 'No SoW content found for LoE conversion'
-                }), 400
+                }, 400
             
             logger.info(f"📝 Extracted SoW content for LoE generation")
             
             # Generate LoE using OpenAI assistant
             logger.info("🤖 Generating LoE with OpenAI assistant...")
+            job_progress("Generating LoE from the SoW", 10)
             loe_content = generate_loe_with_openai_assistant(sow_content)
             
             # Create LoE JSON structure
@@ -5340,37 +5743,30 @@ def convert_sow_to_loe():
             
             # Save to database
             logger.info(f"💾 Saving LoE objects to database for session {session_id}")
-            cursor.execute(
-                "UPDATE ai_architecture_sessions SET loe_objects = %s WHERE id = %s",
-                (json.dumps(loe_objects), session_id)
-            )
-            conn.commit()
+            job_progress("Saving LoE", 90)
+            write_session_column(session_id, 'loe_objects', loe_objects)
             
             logger.info(f"✅ Successfully converted SoW → LoE for session {session_id}")
             
-            return jsonify({
+            return {
                 'success': True,
                 'message': 'Successfully converted SoW → LoE',
                 'loe_data': loe_objects
-            })
+            }, 200
             
         except Exception as db_error:
             logger.error(f"💥 Database error during SoW → LoE conversion: {str(db_error)}")
-            return jsonify({
+            return {
                 'success': False,
                 'message': f'Database error: {str(db_error)}'
-            }), 500
-            
-        finally:
-            cursor.close()
-            conn.close()
+            }, 500
         
     except Exception as e:
         logger.error(f"💥 Error converting SoW → LoE: {str(e)}")
-        return jsonify({
+        return {
             'success': False,
             'message': f'Error: {str(e)}'
-        }), 500
+        }, 500
 
 
 def extract_sow_content(sow_objects):
@@ -5470,8 +5866,8 @@ def generate_loe_with_openai_assistant(sow_content):
             logger.error("OPENAI_API_KEY environment variable not found")
             raise Exception("OpenAI API key not configured")
         
-        # Initialize OpenAI client
-        client = OpenAI(api_key=api_key)
+        # Shared keep-alive client; run events are streamed, see utils.assistant_runner
+        client = get_openai_client(timeout=TIMEOUT_ASSISTANT_STEP)
         
         # Compile all SoW data into prompt
         compiled_content = compile_sow_content_for_loe(sow_content)
@@ -5483,9 +5879,6 @@ def generate_loe_with_openai_assistant(sow_content):
         
         logger.info(f"🤖 Creating thread and running assistant {assistant_id} for LoE generation")
         
-        # Create thread
-        thread = client.beta.threads.create()
-        
         # Create comprehensive prompt for LoE generation
         loe_prompt = f"""Generate a comprehensive Level of Effort (LoE) based on this Statement of Work:
 
@@ -5544,22 +5937,10 @@ Base the LoE on the SoW timeline of {sow_content.get('project_phases_timeline',
         logger.info(loe_prompt)
         logger.info("="*80)
         
-        # Add message to thread
-        client.beta.threads.messages.create(
-            thread_id=thread.id,
-            role="user",
-            content=loe_prompt
-        )
-        
-        # Run assistant
-        run = client.beta.threads.runs.create(
-            thread_id=thread.id,
-            assistant_id=assistant_id
-        )
-        
-        # Wait for completion with extended timeout
-        logger.info(f"⏳ Assistant run started with ID: {run.id}, waiting for completion...")
-        loe_content = wait_for_loe_completion(client, thread.id, run.id, max_wait_time=300)
+        # Stream the run on a new thread; returns as soon as the run completes
+        loe_reply = run_assistant(client, assistant_id, loe_prompt, timeout=300, name="LoE")
+        logger.info("📄 Successfully extracted LoE content from assistant response")
+        loe_content = parse_loe_json(loe_reply)
         
         logger.info("✅ Successfully generated LoE content with OpenAI assistant")
         return loe_content
@@ -5569,76 +5950,6 @@ Base the LoE on the SoW timeline of {sow_content.get('project_phases_timeline',
         raise Exception(f"LoE generation failed: {str(e)}")
 
 
-def wait_for_loe_completion(client, thread_id, run_id, max_wait_time=300):
-    """Wait for assistant run completion and extract LoE content."""
-    import time
-    
-    start_time = time.time()
-    poll_interval = 3  # Start with 3 second intervals
-    
-    while True:
-        elapsed_time = time.time() - start_time
-        
-        if elapsed_time > max_wait_time:
-            logger.error(f"Assistant run timed out after {max_wait_time} seconds")
-            try:
-                client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
-                logger.info("Cancelled the timed-out assistant run")
-            except Exception as cancel_error:
-                logger.warning(f"Could not cancel run: {cancel_error}")
-            raise Exception(f"Assistant run timed out after {max_wait_time} seconds. Please try again.")
-        
-        # Increase polling interval after 60 seconds
-        if elapsed_time > 60:
-            poll_interval = 5
-        
-        try:
-            run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
-            logger.debug(f"Assistant status: {run.status}, elapsed: {elapsed_time:.1f}s")
-            
-            if run.status == 'completed':
-                logger.info(f"🎉 Assistant run completed successfully after {elapsed_time:.1f}s")
-                break
-            elif run.status in ['failed', 'cancelled', 'expired']:
-                error_msg = f"Assistant run ended with status: {run.status}"
-                if hasattr(run, 'last_error') and run.last_error:
-                    error_msg += f". Error: {run.last_error}"
-                logger.error(error_msg)
-                raise Exception(error_msg)
-            elif run.status in ['queued', 'in_progress', 'cancelling']:
-                time.sleep(poll_interval)
-                continue
-            else:
-                logger.warning(f"Unknown run status: {run.status}, continuing to wait...")
-                time.sleep(poll_interval)
-                continue
-                
-        except Exception as retrieve_error:
-            logger.error(f"Error retrieving run status: {retrieve_error}")
-            raise Exception(f"Could not check assistant status: {str(retrieve_error)}")
-    
-    # Retrieve and extract the response
-    try:
-        messages = client.beta.threads.messages.list(thread_id=thread_id)
-        
-        for message in messages.data:
-            if message.role == 'assistant':
-                content = ""
-                for content_block in message.content:
-                    if content_block.type == 'text':
-                        content += content_block.text.value
-                
-                if content.strip():
-                    logger.info("📄 Successfully extracted LoE content from assistant response")
-                    return parse_loe_json(content.strip())
-        
-        raise Exception("No assistant response found in thread")
-        
-    except Exception as messages_error:
-        logger.error(f"Error retrieving messages: {messages_error}")
-        raise Exception(f"Could not retrieve assistant response: {str(messages_error)}")
-
-
 def parse_loe_json(content):
     """Parse and validate the LoE JSON content from assistant response."""
     try:
@@ -5726,6 +6037,10 @@ def create_loe_structure(sow_objects, loe_content):
         logger.error(f"Error creating LoE structure: {str(e)}")
         raise Exception(f"Failed to create LoE structure: {str(e)}")
 
+# Diagrams converted at once per Visual → Solution request; each one makes
+# several blocking OpenAI calls, so this bounds the requests in flight
+DIAGRAM_CONCURRENCY = int(os.environ.get("DIAGRAM_CONCURRENCY", "4"))
+
 @app.route('/convert-visual-to-solution', methods=['POST'])
 def convert_visual_to_solution():
     """Convert a visual session to solution session format."""
@@ -5739,48 +6054,50 @@ def convert_visual_to_solution():
                 'message': 'Session ID is required'
             }), 400
         
+        return respond_with_job('visual-to-solution', session_id, data, visual_to_solution_job, session_id)
+        
+    except Exception as e:
+        logger.error(f"💥 Error in Visual → Solution conversion: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f"Error in Visual → Solution conversion: {str(e)}"
+        }), 500
+
+
+def visual_to_solution_job(session_id):
+    """
+    Visual → Solution conversion for /convert-visual-to-solution, run inline or as a
+    background job. Returns (response body, HTTP status).
+    """
+    try:
         logger.info(f"🔄 Converting Visual → Solution for session: {session_id}")
         
-        # Get database connection
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({
-                'success': False,
-                'message': 'Database connection failed'
-            }), 500
+        # Rows must include edits still waiting in the write-behind queue
+        session_writer.flush(rows=[session_id])
         
         try:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
             # Fetch the visual_assets_json data
-            cursor.execute(
-                "SELECT visual_assets_json FROM ai_architecture_sessions WHERE id = %s",
-                (session_id,)
-            )
-            
-            result = cursor.fetchone()
-            
-            if not result or not result['visual_assets_json']:
-                return jsonify({
+            visual_data = read_session_column(session_id, 'visual_assets_json')
+            if not visual_data:
+                return {
                     'success': False,
                     'message': f'No visual assets found for session {session_id}'
-                }), 404
+                }, 404
             
-            visual_data = result['visual_assets_json']
-            logger.info(f"📊 Source visual_assets_json structure: {json.dumps(visual_data, indent=2)}")
+            log_payload(logger, "📊 Source visual_assets_json structure", visual_data)
             
             # Validate visual data has required fields
             if not visual_data.get('basic', {}).get('title'):
-                return jsonify({
+                return {
                     'success': False,
                     'message': 'Visual session must have a title'
-                }), 400
+                }, 400
             
             if not visual_data.get('diagrams') or len(visual_data['diagrams']) == 0:
-                return jsonify({
+                return {
                     'success': False,
                     'message': 'Visual session must have at least one diagram'
-                }), 400
+                }, 400
             
             # Start building solution session data
             solution_data = {}
@@ -5803,81 +6120,129 @@ def convert_visual_to_solution():
             solution_data['current_solution'] = 1
             solution_data['solution_count'] = len(diagrams)
             
-            logger.info(f"🔄 Processing {len(diagrams)} diagrams into solutions")
-            
-            # 4. Process each diagram into a solution
-            for i, diagram in enumerate(diagrams, 1):
-                solution_key = f'solution_{i}'
-                logger.info(f"📋 Processing diagram {diagram.get('id', i)} into {solution_key}")
+            workers = max(1, min(DIAGRAM_CONCURRENCY, len(diagrams)))
+            logger.info(f"🔄 Processing {len(diagrams)} diagrams into solutions ({workers} at a time)")
+            
+            # 4. Process the diagrams into solutions concurrently; each diagram
+            # is independent and a failure only affects its own solution
+            # Workers run in a copy of the request's context (cache bypass, trace)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='diagram') as executor:
+                futures = []
+                for i, diagram in enumerate(diagrams, 1):
+                    logger.info(f"📋 Processing diagram {diagram.get('id', i)} into solution_{i}")
+                    futures.append(executor.submit(contextvars.copy_context().run,
+                                                   process_diagram_to_solution, diagram, i))
                 
-                try:
-                    # Process this diagram into a solution
-                    solution_data[solution_key] = process_diagram_to_solution(diagram, i)
-                    logger.info(f"✅ Successfully processed {solution_key}")
-                    
-                except Exception as diagram_error:
-                    logger.error(f"❌ Error processing diagram {i}: {str(diagram_error)}")
-                    # Create a fallback solution structure
-                    solution_data[solution_key] = {
-                        "additional": {},
-                        "variables": {
-                            "ai_analysis": f"Error processing diagram {i}: {str(diagram_error)}",
-                            "solution_explanation": diagram.get('ideation', '')
-                        },
-                        "structure": {
-                            "title": f"Solution {i}",
-                            "steps": "Error occurred during processing",
-                            "approach": "Manual review required",
-                            "difficulty": 50,
-                            "layout": 1,
-                            "stack": ""
+                # Collect in diagram order, whatever order they finish in
+                for i, (diagram, future) in enumerate(zip(diagrams, futures), 1):
+                    solution_key = f'solution_{i}'
+                    try:
+                        solution_data[solution_key] = future.result()
+                        logger.info(f"✅ Successfully processed {solution_key}")
+                        
+                    except Exception as diagram_error:
+                        logger.error(f"❌ Error processing diagram {i}: {str(diagram_error)}")
+                        # Create a fallback solution structure
+                        solution_data[solution_key] = {
+                            "additional": {},
+                            "variables": {
+                                "ai_analysis": f"Error processing diagram {i}: {str(diagram_error)}",
+                                "solution_explanation": diagram.get('ideation', '')
+                            },
+                            "structure": {
+                                "title": f"Solution {i}",
+                                "steps": "Error occurred during processing",
+                                "approach": "Manual review required",
+                                "difficulty": 50,
+                                "layout": 1,
+                                "stack": ""
+                            }
                         }
-                    }
+                    
+                    job_progress(f"Converted diagram {i} of {len(diagrams)}", 5 + 85 * i // len(diagrams))
             
             # Update the database with the new solution session data
-            cursor.execute(
-                "UPDATE ai_architecture_sessions SET session_objects = %s WHERE id = %s",
-                (json.dumps(solution_data), session_id)
-            )
-            
-            # Commit the transaction
-            conn.commit()
+            write_session_column(session_id, 'session_objects', solution_data)
             
             logger.info(f"✅ Successfully converted Visual → Solution for session {session_id}")
             logger.info(f"📊 Created {len(diagrams)} solutions")
             
-            return jsonify({
+            return {
                 'success': True,
                 'message': f'Successfully converted Visual → Solution for session {session_id}',
                 'solution_count': len(diagrams),
                 'solution_data': solution_data
-            })
+            }, 200
             
         except Exception as db_error:
-            conn.rollback()
             logger.error(f"💥 Database error in Visual → Solution conversion: {str(db_error)}")
-            return jsonify({
+            return {
                 'success': False,
                 'message': f'Database error: {str(db_error)}'
-            }), 500
-            
-        finally:
-            cursor.close()
-            conn.close()
+            }, 500
             
     except Exception as e:
         logger.error(f"💥 Error in Visual → Solution conversion: {str(e)}")
-        return jsonify({
+        return {
             'success': False,
             'message': f"Error in Visual → Solution conversion: {str(e)}"
-        }), 500
+        }, 500
 
 
-def process_diagram_to_solution(diagram, solution_number):
-    """Process a single diagram into a solution object."""
+def analyze_diagram_stage(image_link, ideation_content, solution_number):
+    """Vision analysis of a diagram; falls back to the ideation text."""
     from utils.image_analysis import analyze_image_with_openai
-    from utils.vision_api import structure_solution_with_openai, generate_stack_analysis_with_openai
     
+    ai_analysis = ""
+    if image_link:
+        try:
+            logger.info(f"📸 Processing image for solution {solution_number}")
+            
+            # Analyze the image inline, sized for the vision model
+            image = prepare_image(session_image_bytes(image_link))
+            ai_analysis = analyze_image_with_openai(image_url=image.data_url())
+            
+            if ai_analysis and not ai_analysis.startswith("Error"):
+                logger.info(f"✅ Image analyzed successfully for solution {solution_number}")
+            else:
+                logger.warning(f"⚠️ Image analysis failed for solution {solution_number}: {ai_analysis}")
+                ai_analysis = f"Image analysis failed: {ai_analysis}"
+                
+        except Exception as image_error:
+            logger.error(f"❌ Error processing image for solution {solution_number}: {str(image_error)}")
+            ai_analysis = f"Error processing image: {str(image_error)}"
+    
+    # If no image or image processing failed, use ideation as analysis
+    return ai_analysis or ideation_content
+
+
+def structure_diagram_stage(ai_analysis, ideation_content, solution_number):
+    """Structure the solution using OpenAI."""
+    from utils.vision_api import structure_solution_with_openai
+    
+    logger.info(f"🤖 Structuring solution {solution_number} with OpenAI")
+    return structure_solution_with_openai(ai_analysis, ideation_content)
+
+
+def stack_diagram_stage(ai_analysis, ideation_content, image_link):
+    """Generate stack analysis (a local image link is left out of the prompt)."""
+    return generate_stack_analysis_with_openai(ai_analysis, ideation_content, image_link)
+
+
+# Diagram → solution: structuring and stack analysis only depend on the
+# vision analysis, so they run side by side once it is done
+diagram_solution_pipeline = Pipeline('diagram_to_solution',
+                                     inputs=['image_link', 'ideation_content', 'solution_number'])
+diagram_solution_pipeline.stage('ai_analysis', analyze_diagram_stage,
+                                deps=['image_link', 'ideation_content', 'solution_number'])
+diagram_solution_pipeline.stage('structure', structure_diagram_stage,
+                                deps=['ai_analysis', 'ideation_content', 'solution_number'])
+diagram_solution_pipeline.stage('stack', stack_diagram_stage,
+                                deps=['ai_analysis', 'ideation_content', 'image_link'], fallback="")
+
+
+def process_diagram_to_solution(diagram, solution_number):
+    """Process a single diagram into a solution object."""
     logger.info(f"🔄 Processing diagram {diagram.get('id', solution_number)} into solution")
     
     # Initialize solution structure
@@ -5894,45 +6259,28 @@ def process_diagram_to_solution(diagram, solution_number):
     if not ideation_content:
         ideation_content = f"Solution {solution_number} from visual diagram"
     
-    ai_analysis = ""
-    image_data_url = ""
+    image_link = ""
     
     # Process image if available
     image_data = diagram.get('image', '')
     if image_data and image_data.strip():
-        try:
-            logger.info(f"📸 Processing image for solution {solution_number}")
-            
-            # Create base64 data URL (ensure proper format)
-            if image_data.startswith('data:image'):
-                # Already a data URL
-                image_data_url = image_data
-            else:
-                # Raw base64, add data URL prefix
-                image_data_url = f"data:image/png;base64,{image_data}"
-            
-            # Store the base64 data URL in additional.image_link
-            solution["additional"]["image_link"] = image_data_url
-            
-            # Analyze the image using base64 data URL directly
-            ai_analysis = analyze_image_with_openai(image_url=image_data_url)
-            
-            if ai_analysis and not ai_analysis.startswith("Error"):
-                logger.info(f"✅ Image analyzed successfully for solution {solution_number}")
-            else:
-                logger.warning(f"⚠️ Image analysis failed for solution {solution_number}: {ai_analysis}")
-                ai_analysis = f"Image analysis failed: {ai_analysis}"
-                
-        except Exception as image_error:
-            logger.error(f"❌ Error processing image for solution {solution_number}: {str(image_error)}")
-            ai_analysis = f"Error processing image: {str(image_error)}"
+        if key_from_url(image_data) or image_data.startswith('data:image'):
+            # Blob URL, or a data URL from an older session
+            image_link = store_session_images(image_data)
+        else:
+            # Raw base64, add data URL prefix
+            image_link = store_session_images(f"data:image/png;base64,{image_data}")
+        
+        # Store the image reference in additional.image_link
+        solution["additional"]["image_link"] = image_link
     
     # Store ideation in additional.explanation (following the normal pattern)
     solution["additional"]["explanation"] = ideation_content
     
-    # If no image or image processing failed, use ideation as analysis
-    if not ai_analysis:
-        ai_analysis = ideation_content
+    result = diagram_solution_pipeline.run(image_link=image_link,
+                                           ideation_content=ideation_content,
+                                           solution_number=solution_number)
+    ai_analysis = result['ai_analysis']
     
     # Store variables (solution_explanation uses ideation, ai_analysis from image)
     solution["variables"] = {
@@ -5940,19 +6288,8 @@ def process_diagram_to_solution(diagram, solution_number):
         "solution_explanation": ideation_content
     }
     
-    # Structure the solution using OpenAI
-    try:
-        logger.info(f"🤖 Structuring solution {solution_number} with OpenAI")
-        structured_response = structure_solution_with_openai(ai_analysis, ideation_content)
-        
-        # Generate stack analysis
-        stack_analysis = ""
-        try:
-            # Pass the base64 data URL for stack analysis if available
-            stack_analysis = generate_stack_analysis_with_openai(ai_analysis, ideation_content, image_data_url)
-        except Exception as stack_error:
-            logger.error(f"Error generating stack analysis for solution {solution_number}: {str(stack_error)}")
-            stack_analysis = ""
+    if 'structure' in result.results:
+        structured_response = result['structure']
         
         # Build structure
         solution["structure"] = {
@@ -5961,13 +6298,13 @@ def process_diagram_to_solution(diagram, solution_number):
             "approach": structured_response.get('approach', ''),
             "difficulty": structured_response.get('difficulty', 50),
             "layout": 1,  # Default layout
-            "stack": stack_analysis
+            "stack": result['stack']
         }
         
         logger.info(f"✅ Successfully structured solution {solution_number}")
         
-    except Exception as structure_error:
-        logger.error(f"❌ Error structuring solution {solution_number}: {str(structure_error)}")
+    else:
+        logger.error(f"❌ Error structuring solution {solution_number}: {str(result.errors['structure'])}")
         
         # Fallback structure
         solution["structure"] = {
@@ -5982,31 +6319,5 @@ def process_diagram_to_solution(diagram, solution_number):
     return solution
 
 
-def convert_base64_to_file(base64_data):
-    """Convert base64 image data to file-like object."""
-    try:
-        # Remove data URL prefix if present
-        if ',' in base64_data:
-            base64_data = base64_data.split(',')[1]
-        
-        # Decode base64
-        image_bytes = base64.b64decode(base64_data)
-        
-        # Create file-like object
-        image_file = io.BytesIO(image_bytes)
-        
-        # Set required attributes for upload_to_imgbb
-        image_file.filename = 'diagram_image.png'
-        image_file.content_type = 'image/png'
-        
-        # Reset file pointer to beginning
-        image_file.seek(0)
-        
-        return image_file
-        
-    except Exception as e:
-        logger.error(f"Error converting base64 to file: {str(e)}")
-        return None
-
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,96 @@
+"""
+Measure the per-request cost of logging a session payload: the old
+f-string json.dumps(indent=2) at INFO against utils.log_payload.
+
+Usage: python benchmark_logging.py [--images N] [--image-kb KB] [--requests N]
+"""
+import os
+import json
+import time
+import base64
+import logging
+import argparse
+import tempfile
+
+from utils.log_payload import log_payload
+
+
+def build_session(images, image_kb):
+    """A solution session shaped like the real ones, with base64 diagrams."""
+    session = {
+        'badge': {'row': 42, 'version': 7, 'glyph': 'abcDEF1750204485'},
+        'basic': {'date': '2025-06-18', 'title': 'Data platform modernisation',
+                  'prepared_for': 'Client', 'engineer': 'Engineer'},
+        'current_solution': 1,
+        'solution_count': images,
+    }
+    for number in range(1, images + 1):
+        session[f'solution_{number}'] = {
+            'additional': {
+                'image_link': 'data:image/png;base64,' + base64.b64encode(os.urandom(image_kb * 1024)).decode(),
+                'explanation': 'Ingest, transform and serve. ' * 20,
+            },
+            'variables': {'ai_analysis': 'Analysis text. ' * 80, 'solution_explanation': 'Explanation. ' * 40},
+            'structure': {'title': f'Solution {number}', 'steps': 'Step. ' * 60, 'approach': 'Approach. ' * 60,
+                          'difficulty': 55, 'layout': 1, 'stack': ''},
+        }
+    return session
+
+
+def measure(name, log_call, requests, path):
+    size_before = os.path.getsize(path)
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for _ in range(requests):
+        log_call()
+    cpu_ms = (time.process_time() - cpu_start) * 1000 / requests
+    wall_ms = (time.perf_counter() - wall_start) * 1000 / requests
+    written = (os.path.getsize(path) - size_before) / requests
+    print(f"{name:<28} cpu {cpu_ms:9.3f} ms   wall {wall_ms:9.3f} ms   log I/O {written / 1024:10.1f} KB per request")
+    return cpu_ms, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--images', type=int, default=3)
+    parser.add_argument('--image-kb', type=int, default=750)
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+
+    session = build_session(args.images, args.image_kb)
+    fd, path = tempfile.mkstemp(suffix='.log')
+    os.close(fd)
+
+    logger = logging.getLogger('benchmark_logging')
+    logger.propagate = False
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+    logger.addHandler(handler)
+
+    try:
+        print(f"Session: {args.images} images of {args.image_kb} KB, "
+              f"{len(json.dumps(session)) / (1024 * 1024):.1f} MB serialized\n")
+
+        logger.setLevel(logging.INFO)
+        old_cpu, old_io = measure('INFO  json.dumps(indent=2)',
+                                  lambda: logger.info(f"Session Data: {json.dumps(session, indent=2)}"),
+                                  args.requests, path)
+        new_cpu, new_io = measure('INFO  log_payload',
+                                  lambda: log_payload(logger, "Session Data", session),
+                                  args.requests, path)
+        logger.setLevel(logging.WARNING)
+        measure('WARN  log_payload (off)', lambda: log_payload(logger, "Session Data", session),
+                args.requests, path)
+        logger.setLevel(logging.DEBUG)
+        measure('DEBUG log_payload (full)', lambda: log_payload(logger, "Session Data", session),
+                args.requests, path)
+
+        print(f"\nSaved at INFO: {old_cpu - new_cpu:.3f} ms CPU and "
+              f"{(old_io - new_io) / 1024:.1f} KB of log output per logged payload")
+    finally:
+        handler.close()
+        os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
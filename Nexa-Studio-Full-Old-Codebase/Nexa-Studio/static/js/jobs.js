@@ -0,0 +1,79 @@
+// Background jobs for the long-running generation routes.
+//
+// runBackgroundJob posts the route's usual body with "async": true, gets a
+// job back (202) and follows its progress over the job's event stream,
+// falling back to polling the status URL if the stream is unavailable. It
+// resolves with the same JSON body the route returns when run inline.
+
+function runBackgroundJob(url, body, { onProgress = null, pollInterval = 2000 } = {}) {
+    return fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ ...body, async: true })
+    })
+    .then(response => response.json())
+    .then(job => {
+        // Not accepted as a job (validation error, server busy): the body is the answer
+        if (!job.job_id) {
+            return job;
+        }
+        return followBackgroundJob(job, { onProgress, pollInterval });
+    });
+}
+
+function followBackgroundJob(job, { onProgress = null, pollInterval = 2000 } = {}) {
+    return new Promise(resolve => {
+        let finished = false;
+
+        function finish(snapshot) {
+            if (!finished) {
+                finished = true;
+                resolve(snapshot.result || { success: false, message: snapshot.error || 'Job failed' });
+            }
+        }
+
+        function poll() {
+            fetch(job.status_url)
+                .then(response => response.json())
+                .then(snapshot => {
+                    if (!snapshot.success) {
+                        finish({ result: snapshot });
+                    } else if (['succeeded', 'failed', 'cancelled'].includes(snapshot.status)) {
+                        finish(snapshot);
+                    } else {
+                        if (onProgress) onProgress(snapshot.progress);
+                        setTimeout(poll, pollInterval);
+                    }
+                })
+                .catch(() => setTimeout(poll, pollInterval));
+        }
+
+        if (typeof EventSource === 'undefined') {
+            poll();
+            return;
+        }
+
+        const events = new EventSource(job.events_url);
+        events.addEventListener('progress', event => {
+            if (onProgress) onProgress(JSON.parse(event.data));
+        });
+        ['succeeded', 'failed', 'cancelled'].forEach(name => {
+            events.addEventListener(name, event => {
+                events.close();
+                finish(JSON.parse(event.data));
+            });
+        });
+        events.onerror = () => {
+            // EventSource reconnects by itself unless the stream is gone for good
+            if (events.readyState === EventSource.CLOSED && !finished) {
+                poll();
+            }
+        };
+    });
+}
+
+function cancelBackgroundJob(jobId) {
+    return fetch(`/jobs/${jobId}/cancel`, { method: 'POST' }).then(response => response.json());
+}
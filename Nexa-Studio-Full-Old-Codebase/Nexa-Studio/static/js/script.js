@@ -178,17 +178,14 @@ document.addEventListener('DOMContentLoaded', function() {
                 document.querySelector('.loader').classList.add('rotating');
             }
             
-            // Send to server for enhancement
-            fetch('/enhance-explanation', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    explanation: explanationText
-                })
+            // Send to server for enhancement; the enhanced text replaces the original as it streams in
+            streamGeneration('/enhance-explanation', {
+                explanation: explanationText
+            }, {
+                onToken: (piece, text) => {
+                    solutionExplanation.value = text;
+                }
             })
-            .then(response => response.json())
             .then(data => {
                 // Reset button state
                 enhanceBtn.disabled = false;
@@ -202,6 +199,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     solutionExplanation.value = data.enhanced_explanation;
                     showAlert('Explanation enhanced successfully', 'success', 2);
                 } else {
+                    solutionExplanation.value = explanationText;
                     showAlert('Error: ' + data.message, 'danger', 2);
                 }
             })
@@ -213,6 +211,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     feather.replace();
                 }
                 
+                solutionExplanation.value = explanationText;
                 console.error('Error enhancing explanation:', error);
                 showAlert('Error enhancing explanation', 'danger', 2);
             });
@@ -391,6 +390,13 @@ document.addEventListener('DOMContentLoaded', function() {
                     aiAnalysisInput.value = analysisText;
                 }
                 
+                // Show the stored copy, so the session saves its /blobs/
+                // reference rather than the base64 data
+                if (data.image_url) {
+                    if (imagePreview) imagePreview.src = data.image_url;
+                    if (modalImagePreview) modalImagePreview.src = data.image_url;
+                }
+                
                 // Update file input to show analyzed state
                 setFileInputState('analyzed', 'Analysis complete');
                 
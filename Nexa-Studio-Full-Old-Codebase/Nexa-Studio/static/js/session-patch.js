@@ -0,0 +1,114 @@
+// Delta updates for the update-*-session routes.
+//
+// A patcher remembers the session state the server last acknowledged and its
+// version. The first update (and any update after a conflict or error) posts
+// the route's usual full body; later ones post only an RFC 6902 JSON Patch of
+// what changed since, e.g. {"sessionId", "baseVersion": 7, "patch": [...]}.
+
+function escapePointerToken(token) {
+    return String(token).replace(/~/g, '~0').replace(/\//g, '~1');
+}
+
+function isPlainObject(value) {
+    return value !== null && typeof value === 'object' && !Array.isArray(value);
+}
+
+// Append the operations turning `before` into `after` at `path` to `ops`
+function diffSessionData(before, after, path, ops) {
+    if (JSON.stringify(before) === JSON.stringify(after)) {
+        return ops;
+    }
+
+    if (isPlainObject(before) && isPlainObject(after)) {
+        Object.keys(before).forEach(key => {
+            if (!(key in after)) {
+                ops.push({ op: 'remove', path: `${path}/${escapePointerToken(key)}` });
+            }
+        });
+        Object.keys(after).forEach(key => {
+            const childPath = `${path}/${escapePointerToken(key)}`;
+            if (key in before) {
+                diffSessionData(before[key], after[key], childPath, ops);
+            } else {
+                ops.push({ op: 'add', path: childPath, value: after[key] });
+            }
+        });
+    } else if (Array.isArray(before) && Array.isArray(after) && before.length === after.length) {
+        after.forEach((item, index) => diffSessionData(before[index], item, `${path}/${index}`, ops));
+    } else {
+        // Arrays that grew or shrank are replaced whole; element edits shift indexes
+        ops.push({ op: 'replace', path: path, value: after });
+    }
+    return ops;
+}
+
+// url: update route; sections (the part of the session this page edits) map
+// one-to-one onto top-level keys of the server-side session.
+function createSessionPatcher(url) {
+    let acknowledged = null;
+    let version = null;
+    let queue = Promise.resolve();
+
+    async function post(body) {
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(body)
+        });
+        return { status: response.status, result: await response.json() };
+    }
+
+    async function sendFull(fullBody, sections) {
+        const { result } = await post(fullBody);
+        if (result.success && result.version !== undefined) {
+            acknowledged = JSON.parse(JSON.stringify(sections));
+            version = result.version;
+        } else {
+            acknowledged = null;
+            version = null;
+        }
+        return result;
+    }
+
+    async function send(sessionId, fullBody, sections) {
+        if (acknowledged === null || version === null) {
+            return sendFull(fullBody, sections);
+        }
+
+        const patch = diffSessionData(acknowledged, sections, '', []);
+        if (patch.length === 0) {
+            return { success: true, sessionId: sessionId, version: version };
+        }
+
+        const { status, result } = await post({ sessionId: sessionId, baseVersion: version, patch: patch });
+        if (result.success) {
+            acknowledged = JSON.parse(JSON.stringify(sections));
+            version = result.version;
+            return result;
+        }
+
+        // Someone else edited the session (409) or the patch did not apply:
+        // resynchronise with a full update
+        console.warn(`Session patch rejected (${status}), sending full update:`, result.message);
+        return sendFull(fullBody, sections);
+    }
+
+    return {
+        // Updates are sent one at a time, in order
+        send(sessionId, fullBody, sections) {
+            const next = queue.then(() => send(sessionId, fullBody, sections));
+            queue = next.catch(() => {
+                acknowledged = null;
+                version = null;
+            });
+            return next;
+        },
+
+        reset() {
+            acknowledged = null;
+            version = null;
+        }
+    };
+}
@@ -0,0 +1,74 @@
+// Token streaming for the text-generation routes.
+//
+// streamGeneration posts the route's usual body asking for server-sent
+// events and calls onToken(piece, textSoFar) as the model produces text.
+// It resolves with the same JSON body the route returns without streaming,
+// carried by the final "done" (or "error") event. Answers the server gives
+// as plain JSON, such as validation errors, resolve with that body.
+// (EventSource only supports GET, so the stream is read from fetch.)
+
+function streamGeneration(url, body, { onToken = null } = {}) {
+    return fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+        },
+        body: JSON.stringify(body)
+    })
+    .then(response => {
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.includes('text/event-stream') || !response.body) {
+            return response.json();
+        }
+        return readGenerationEvents(response.body.getReader(), onToken);
+    });
+}
+
+function readGenerationEvents(reader, onToken) {
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let text = '';
+    let result = null;
+
+    function handle(block) {
+        let event = 'message';
+        const data = [];
+        block.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                event = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                data.push(line.slice(5).replace(/^ /, ''));
+            }
+        });
+        // Comments (": stream open") carry no data
+        if (!data.length) {
+            return;
+        }
+        const payload = JSON.parse(data.join('\n'));
+        if (event === 'token') {
+            text += payload.text;
+            if (onToken) onToken(payload.text, text);
+        } else if (event === 'done' || event === 'error') {
+            result = payload;
+        }
+    }
+
+    function pump() {
+        return reader.read().then(({ done, value }) => {
+            if (value) {
+                buffer += decoder.decode(value, { stream: true });
+                const blocks = buffer.split('\n\n');
+                buffer = blocks.pop();
+                blocks.forEach(handle);
+            }
+            if (done) {
+                if (buffer.trim()) handle(buffer);
+                return result || { success: false, message: 'The response stream ended early. Please try again.' };
+            }
+            return pump();
+        });
+    }
+
+    return pump();
+}
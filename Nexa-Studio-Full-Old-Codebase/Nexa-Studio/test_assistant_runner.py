@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Test script for the streaming assistant runner (utils/assistant_runner.py).
+Runs a local mock OpenAI server that streams assistant run events and
+checks completion latency, deadlines, cancellation and failed runs.
+Needs no API key and makes no external requests.
+
+Usage: python test_assistant_runner.py
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds the mock takes to produce a reply, and the old polling intervals
+MODEL_SECONDS = 1.0
+POLL_INTERVALS = (3, 2)
+
+
+class MockAssistantHandler(BaseHTTPRequestHandler):
+    """Streams run events for POST /v1/threads/runs; the prompt picks the scenario."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self.path.endswith('/cancel'):
+            self.server.cancelled.append(self.path)
+            return self.send_json({'id': self.path.split('/')[-2], 'object': 'thread.run',
+                                   'status': 'cancelling'})
+        if self.path != '/v1/threads/runs':
+            return self.send_json({'error': {'message': f'unexpected {self.path}'}}, 404)
+
+        scenario = body['thread']['messages'][0]['content']
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        run = {'id': 'run_mock', 'object': 'thread.run', 'thread_id': 'thread_mock',
+               'assistant_id': body['assistant_id'], 'status': 'queued'}
+        self.send_event('thread.run.created', run)
+        self.send_event('thread.run.in_progress', {**run, 'status': 'in_progress'})
+
+        if scenario == 'stall':
+            # Never finishes; the client has to give up
+            time.sleep(30)
+            return
+        if scenario == 'fail':
+            self.send_event('thread.run.failed', {**run, 'status': 'failed',
+                                                  'last_error': {'code': 'server_error', 'message': 'boom'}})
+            return self.end_stream()
+
+        reply = '{"project": "Mock", "objectives": ["One", "Two"]}'
+        for piece in (reply[:20], reply[20:]):
+            time.sleep(MODEL_SECONDS / 2)
+            self.send_event('thread.message.delta', {
+                'id': 'msg_mock', 'object': 'thread.message.delta',
+                'delta': {'content': [{'index': 0, 'type': 'text', 'text': {'value': piece}}]}})
+        self.send_event('thread.message.completed', {
+            'id': 'msg_mock', 'object': 'thread.message', 'thread_id': 'thread_mock', 'role': 'assistant',
+            'status': 'completed',
+            'content': [{'type': 'text', 'text': {'value': reply, 'annotations': []}}]})
+        self.server.completed_at = time.time()
+        self.send_event('thread.run.completed', {**run, 'status': 'completed'})
+        self.end_stream()
+
+    def send_json(self, payload, status=200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def send_event(self, event, data):
+        try:
+            self.send_chunk(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def end_stream(self):
+        try:
+            self.send_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockAssistantHandler)
+    server.daemon_threads = True
+    server.cancelled = []
+    server.completed_at = None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def polled_finish(seconds):
+    """When the old loop (3 s polls, the sketch loop's 2 s) would have noticed a run done after seconds."""
+    return {interval: (int(seconds // interval) + 1) * interval for interval in POLL_INTERVALS}
+
+
+def main():
+    server = start_mock_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    print(f"🧪 Mock OpenAI server at {base_url}")
+
+    # Configure the factory before it is imported
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ['OPENAI_TRACING'] = '0'
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-mock')
+
+    from utils.openai_client import get_openai_client, TIMEOUT_ASSISTANT_STEP
+    from utils.assistant_runner import (AssistantRun, run_assistant, AssistantRunError,
+                                        AssistantRunTimeout, AssistantRunCancelled)
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    client = get_openai_client(timeout=TIMEOUT_ASSISTANT_STEP)
+    ok = True
+
+    # 1. Completed run: returns as soon as thread.run.completed is streamed
+    deltas = []
+    started = time.time()
+    reply = run_assistant(client, 'asst_mock', 'complete', timeout=10, name='Mock', on_delta=deltas.append)
+    finished = time.time()
+    lag_ms = (finished - server.completed_at) * 1000
+    old = polled_finish(server.completed_at - started)
+    if json.loads(reply)['project'] != 'Mock' or ''.join(deltas) != reply:
+        print(f"❌ Unexpected reply: {reply!r}")
+        ok = False
+    else:
+        print(f"✅ Completed in {finished - started:.2f}s, {lag_ms:.1f} ms after the run completed "
+              f"(polling every 3 s / 2 s: {old[3]:.0f} s / {old[2]:.0f} s)")
+
+    # 2. Deadline: the run is cancelled and the caller released on time
+    started = time.time()
+    try:
+        run_assistant(client, 'asst_mock', 'stall', timeout=1, name='Mock')
+        print("❌ Stalled run did not time out")
+        ok = False
+    except AssistantRunTimeout as e:
+        waited = time.time() - started
+        if waited < 1.5 and server.cancelled:
+            print(f"✅ Deadline: released after {waited:.2f}s and run cancelled ({e})")
+        else:
+            print(f"❌ Deadline: released after {waited:.2f}s, cancel calls {server.cancelled}")
+            ok = False
+
+    # 3. Cancellation from another thread
+    server.cancelled.clear()
+    run = AssistantRun(client, 'asst_mock', 'stall', timeout=10, name='Mock')
+    threading.Timer(0.5, run.cancel).start()
+    started = time.time()
+    try:
+        run.result()
+        print("❌ Cancelled run returned a result")
+        ok = False
+    except AssistantRunCancelled:
+        waited = time.time() - started
+        if waited < 1.0 and server.cancelled and run.status == 'cancelled':
+            print(f"✅ Cancel: released after {waited:.2f}s and run cancelled")
+        else:
+            print(f"❌ Cancel: released after {waited:.2f}s, cancel calls {server.cancelled}")
+            ok = False
+
+    # 4. Failed run surfaces the run's last_error
+    try:
+        run_assistant(client, 'asst_mock', 'fail', timeout=10, name='Mock')
+        print("❌ Failed run returned a result")
+        ok = False
+    except AssistantRunError as e:
+        if e.status == 'failed' and 'boom' in str(e):
+            print(f"✅ Failure reported: {e}")
+        else:
+            print(f"❌ Unexpected failure: {e!r}")
+            ok = False
+
+    server.shutdown()
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
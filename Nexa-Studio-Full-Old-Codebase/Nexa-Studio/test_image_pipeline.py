@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for image preprocessing (utils/image_pipeline.py) and the
+image blob store (utils/blob_store.py). Generates a large diagram-like PNG
+and a rotated camera JPEG, prepares them for the vision model and reports
+the bytes saved, then checks that small images pass through untouched and
+that the blob store keeps each distinct image once, under its SHA-256.
+Needs no API key and makes no external requests.
+
+Usage: python test_image_pipeline.py
+"""
+
+import io
+import sys
+import time
+import tempfile
+
+from PIL import Image, ImageDraw
+
+from utils.image_pipeline import prepare_image, decode_data_url, image_mime_type, vision_tokens, ImageError
+from utils.blob_store import FileBlobStore, blob_url, key_from_url
+
+
+def diagram_png(width, height):
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    for x in range(0, width, 200):
+        draw.rectangle([x, 100, x + 150, 300], outline='black', width=4)
+        draw.text((x + 10, 150), f"Node {x // 200}", fill='black')
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def camera_jpeg(width, height, orientation):
+    image = Image.effect_noise((width, height), 40).convert('RGB')
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=92, exif=exif)
+    return buffer.getvalue()
+
+
+def main():
+    ok = True
+
+    # 1. Large images are downsized to the size the model works at
+    for name, raw, expected in [('4000x3000 PNG diagram', diagram_png(4000, 3000), (1024, 768)),
+                                ('4032x3024 JPEG, rotated', camera_jpeg(4032, 3024, 6), (768, 1024))]:
+        started = time.time()
+        image = prepare_image(raw)
+        elapsed_ms = (time.time() - started) * 1000
+        if image.size != expected:
+            print(f"❌ {name}: prepared at {image.size}, expected {expected}")
+            ok = False
+            continue
+        # Tokens are the same either way: the model downsizes too, after the transfer
+        print(f"✅ {name}: {len(raw) // 1024} KB → {len(image.data) // 1024} KB "
+              f"({image.mime_type}, {vision_tokens(*image.size)} tokens, {elapsed_ms:.0f} ms)")
+
+    # 2. Images already within the model's size are sent as they are
+    raw = diagram_png(800, 600)
+    image = prepare_image(raw)
+    if image.data is raw and image.mime_type == 'image/png':
+        print("✅ 800x600 PNG passed through unchanged")
+    else:
+        print("❌ 800x600 PNG was re-encoded")
+        ok = False
+
+    # 3. Bad input is rejected
+    for bad in [b'', b'not an image', 'data:image/png;base64,@@@']:
+        try:
+            prepare_image(decode_data_url(bad) if isinstance(bad, str) else bad)
+            print(f"❌ {bad[:20]!r} accepted")
+            ok = False
+        except ImageError as e:
+            print(f"✅ Rejected: {e}")
+
+    # 4. The blob store keeps one copy per distinct image
+    store = FileBlobStore(tempfile.mkdtemp())
+    first = store.put(image.original, image_mime_type(image.original))
+    second = store.put(image.original, 'image/png')
+    info = store.info(first)
+    if (first == second == image.sha256 and store.get(first) == image.original
+            and info.content_type == 'image/png' and info.size == len(image.original)
+            and key_from_url(blob_url(first)) == first and store.stats()['deduplicated'] == 1):
+        print(f"✅ Stored once as {blob_url(first)[:20]}...: {store.stats()}")
+    else:
+        print(f"❌ Blob store: keys {first[:12]}/{second[:12]}, {store.stats()}")
+        ok = False
+
+    # 5. Keys that are not content hashes are not found
+    for key in ['../../etc/passwd', 'abc', first.upper()]:
+        if store.info(key) is not None or store.get(key) is not None:
+            print(f"❌ Blob store answered for key {key!r}")
+            ok = False
+    if key_from_url('data:image/png;base64,AAAA') is None and key_from_url('/blobs/../x') is None:
+        print("✅ Only /blobs/<sha256> links are treated as blob references")
+    else:
+        print("❌ key_from_url accepted a non-blob link")
+        ok = False
+
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script for session delta updates (utils/json_patch.py). Checks that
+patches touching the server-managed badge (the row a session is written to
+and the version edits are checked against) are rejected, whether as the
+target path or as the source of a move/copy, and that ordinary patches
+still apply. Needs no database and makes no external requests.
+
+Usage: python test_json_patch.py
+"""
+
+import sys
+import copy
+
+from utils.json_patch import apply_patch, check_protected, JsonPatchError
+
+PROTECTED = ['/badge']
+
+SESSION = {
+    'badge': {'row': 12, 'version': 3},
+    'title': 'Checkout flow',
+    'nodes': [{'id': 'a'}, {'id': 'b'}],
+}
+
+
+def main():
+    ok = True
+
+    # 1. Anything at or below /badge is refused, as a target or a source
+    for operations in [
+        [{'op': 'replace', 'path': '/badge/row', 'value': 99}],
+        [{'op': 'replace', 'path': '/badge/version', 'value': 1000}],
+        [{'op': 'remove', 'path': '/badge'}],
+        [{'op': 'add', 'path': '/badge', 'value': {}}],
+        [{'op': 'test', 'path': '/badge/version', 'value': 3}],
+        [{'op': 'copy', 'from': '/title', 'path': '/badge/row'}],
+        [{'op': 'move', 'from': '/badge/row', 'path': '/title'}],
+        [{'op': 'copy', 'from': '/badge', 'path': '/nodes/0/badge'}],
+        [{'op': 'replace', 'path': '/title', 'value': 'ok'},
+         {'op': 'replace', 'path': '/badge/row', 'value': 99}],
+    ]:
+        try:
+            check_protected(operations, PROTECTED)
+            print(f"❌ Accepted {operations}")
+            ok = False
+        except JsonPatchError as e:
+            print(f"✅ Rejected: {e}")
+
+    # 2. Members that only share the prefix, and ordinary edits, go through
+    operations = [
+        {'op': 'replace', 'path': '/title', 'value': 'Checkout flow v2'},
+        {'op': 'add', 'path': '/badges', 'value': []},
+        {'op': 'add', 'path': '/nodes/-', 'value': {'id': 'c', 'badge': 'new'}},
+        {'op': 'move', 'from': '/nodes/0', 'path': '/nodes/1'},
+    ]
+    try:
+        check_protected(operations, PROTECTED)
+        patched = apply_patch(copy.deepcopy(SESSION), operations)
+        if (patched['badge'] == SESSION['badge'] and patched['title'] == 'Checkout flow v2'
+                and [node['id'] for node in patched['nodes']] == ['b', 'a', 'c']):
+            print("✅ Ordinary patch applied, badge untouched")
+        else:
+            print(f"❌ Unexpected result: {patched}")
+            ok = False
+    except JsonPatchError as e:
+        print(f"❌ Ordinary patch rejected: {e}")
+        ok = False
+
+    # 3. Malformed patches are still reported as patch errors
+    for bad in [None, {'op': 'replace'}, ['not an operation'], [{'op': 'replace', 'path': 'badge'}]]:
+        try:
+            check_protected(bad, PROTECTED)
+            print(f"❌ Accepted malformed patch {bad!r}")
+            ok = False
+        except JsonPatchError as e:
+            print(f"✅ Rejected: {e}")
+
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
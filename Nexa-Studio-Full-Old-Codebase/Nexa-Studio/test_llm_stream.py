@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test script for streamed chat completions (utils/llm_stream.py and
+cached_completion_stream in utils/llm_cache.py). Runs a local mock OpenAI
+server that streams a reply token by token and compares time to the first
+token with the time a blocking call takes, then checks that streamed
+replies are cached and that closing a stream early stops generation.
+Needs no API key and makes no external requests.
+
+Usage: python test_llm_stream.py
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds the mock takes per token, and the reply it streams
+TOKEN_SECONDS = 0.05
+REPLY_TOKENS = 40
+
+
+class MockChatHandler(BaseHTTPRequestHandler):
+    """POST /v1/chat/completions, streamed when the request asks for it."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        self.server.requests += 1
+        tokens = [f"token{i} " for i in range(REPLY_TOKENS)]
+
+        if not body.get('stream'):
+            time.sleep(TOKEN_SECONDS * len(tokens))
+            data = json.dumps({
+                'id': 'chatcmpl-mock', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': ''.join(tokens)}}]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for token in tokens:
+                time.sleep(TOKEN_SECONDS)
+                chunk = {'id': 'chatcmpl-mock', 'object': 'chat.completion.chunk', 'created': 0,
+                         'model': body['model'],
+                         'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]}
+                self.send_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.server.tokens_sent += 1
+            self.send_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.aborted = True
+
+    def send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockChatHandler)
+    server.daemon_threads = True
+    server.requests = 0
+    server.tokens_sent = 0
+    server.aborted = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    server = start_mock_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    print(f"🧪 Mock OpenAI server at {base_url}")
+
+    # Configure the factory and the cache before they are imported
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ['OPENAI_TRACING'] = '0'
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-mock')
+    os.environ['LLM_CACHE_PATH'] = os.path.join(tempfile.mkdtemp(), 'llm-cache.sqlite3')
+
+    from utils.openai_client import get_openai_client, TIMEOUT_CHAT
+    from utils.llm_stream import stream_completion
+    from utils.llm_cache import cached_completion, cached_completion_stream
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    client = get_openai_client(timeout=TIMEOUT_CHAT)
+    params = {'model': 'gpt-4o', 'messages': [{'role': 'user', 'content': 'Describe the diagram'}]}
+    ok = True
+
+    # 1. Time to first token vs. a blocking call
+    started = time.time()
+    blocking = client.chat.completions.create(**params).choices[0].message.content
+    blocking_ms = (time.time() - started) * 1000
+
+    started = time.time()
+    first_ms = None
+    pieces = []
+    for text in stream_completion(client, **params):
+        if first_ms is None:
+            first_ms = (time.time() - started) * 1000
+        pieces.append(text)
+    streamed_ms = (time.time() - started) * 1000
+    if ''.join(pieces) != blocking:
+        print("❌ Streamed reply differs from the blocking reply")
+        ok = False
+    else:
+        print(f"✅ First token after {first_ms:.0f} ms (blocking call: {blocking_ms:.0f} ms, "
+              f"whole stream: {streamed_ms:.0f} ms, {len(pieces)} pieces)")
+
+    # 2. A streamed reply is cached and shared with the blocking helper
+    requests = server.requests
+    streamed = ''.join(cached_completion_stream(client, 'stream_test', 1, **params))
+    cached_stream = list(cached_completion_stream(client, 'stream_test', 1, **params))
+    cached_blocking = cached_completion(client, 'stream_test', 1, **params)
+    if server.requests - requests != 1 or cached_stream != [streamed] or cached_blocking != streamed:
+        print(f"❌ Cache: {server.requests - requests} requests for 3 calls")
+        ok = False
+    else:
+        print("✅ Streamed reply cached: repeat stream and blocking call made no request")
+
+    # 3. Closing the stream early stops generation
+    server.tokens_sent = 0
+    stream = stream_completion(client, **{**params, 'temperature': 0.5})
+    for i, _ in enumerate(stream):
+        if i == 2:
+            break
+    stream.close()
+    time.sleep(TOKEN_SECONDS * 4)
+    if server.aborted and server.tokens_sent < REPLY_TOKENS:
+        print(f"✅ Closed early: the server stopped after {server.tokens_sent} of {REPLY_TOKENS} tokens")
+    else:
+        print(f"❌ Closed early: the server sent {server.tokens_sent} of {REPLY_TOKENS} tokens")
+        ok = False
+
+    server.shutdown()
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
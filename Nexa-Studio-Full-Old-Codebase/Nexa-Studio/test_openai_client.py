@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared OpenAI client (utils/openai_client.py).
+Runs a local mock OpenAI server and compares a new client per call (the
+old pattern) with the shared keep-alive client: connections opened and
+time per call. Needs no API key and makes no external requests.
+
+Usage: python test_openai_client.py [--calls N] [--threads N]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers POST /v1/chat/completions with a canned completion, keeping connections alive."""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as two writes; avoid delayed-ACK stalls on reused sockets
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        request = json.loads(body or b'{}')
+        with self.server.stats_lock:
+            self.server.requests += 1
+        payload = json.dumps({
+            'id': 'chatcmpl-mock',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'gpt-4o'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': 'mock response'},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': 1, 'completion_tokens': 2, 'total_tokens': 3},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockOpenAIHandler)
+    server.daemon_threads = True
+    server.stats_lock = threading.Lock()
+    server.connections = 0
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def chat(client):
+    response = client.chat.completions.create(
+        model='gpt-4o', messages=[{'role': 'user', 'content': 'ping'}], max_tokens=5)
+    return response.choices[0].message.content
+
+
+def run(name, make_client, calls, threads, server):
+    connections_before = server.connections
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda _: chat(make_client()), range(calls)))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    opened = server.connections - connections_before
+    assert all(result == 'mock response' for result in results)
+    print(f"{name:<26} {calls} calls  {opened:4d} connections  "
+          f"{elapsed_ms / calls:7.2f} ms per call")
+    return opened, elapsed_ms / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    server = start_mock_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    print(f"🧪 Mock OpenAI server at {base_url}")
+
+    # Configure the factory before it is imported
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ['OPENAI_TRACING'] = '0'
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-mock')
+
+    from openai import OpenAI
+    from utils.openai_client import get_openai_client, TIMEOUT_CHAT
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    def per_call_client():
+        return OpenAI(api_key='sk-mock', base_url=base_url)
+
+    old_connections, old_ms = run('new client per call', per_call_client, args.calls, args.threads, server)
+    new_connections, new_ms = run('shared client', lambda: get_openai_client(timeout=TIMEOUT_CHAT),
+                                  args.calls, args.threads, server)
+
+    if new_connections > args.threads:
+        print(f"❌ Shared client opened {new_connections} connections for {args.threads} threads")
+        return False
+    if get_openai_client() is not get_openai_client():
+        print("❌ get_openai_client() did not return the shared client")
+        return False
+
+    print(f"✅ Shared client reused connections: {old_connections - new_connections} fewer "
+          f"connections, {old_ms - new_ms:.2f} ms saved per call (plain HTTP on localhost; "
+          f"TLS handshakes to the real API make the difference larger)")
+    server.shutdown()
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
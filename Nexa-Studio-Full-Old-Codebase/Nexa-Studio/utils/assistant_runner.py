@@ -0,0 +1,253 @@
+import os
+import time
+import socket
+import logging
+import threading
+
+from utils.jobs import on_cancel
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default deadline for a whole assistant run (seconds)
+ASSISTANT_RUN_TIMEOUT = float(os.environ.get("ASSISTANT_RUN_TIMEOUT", "300"))
+# Longest silence between two streamed run events before the stream is considered dead
+ASSISTANT_STREAM_IDLE_TIMEOUT = float(os.environ.get("ASSISTANT_STREAM_IDLE_TIMEOUT", "90"))
+
+# Run events that end a run without a result
+_FAILED_EVENTS = {
+    'thread.run.failed': 'failed',
+    'thread.run.cancelled': 'cancelled',
+    'thread.run.expired': 'expired',
+    'thread.run.incomplete': 'incomplete',
+}
+
+
+class AssistantRunError(Exception):
+    """An assistant run ended without a response."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class AssistantRunTimeout(AssistantRunError):
+    """The run did not finish before its deadline (and was cancelled)."""
+
+
+class AssistantRunCancelled(AssistantRunError):
+    """AssistantRun.cancel() was called while the run was in progress."""
+
+
+def _interrupt(stream):
+    """
+    Close a response stream another thread may be blocked reading. Closing
+    alone does not wake a blocked recv(), so the socket is shut down first.
+    """
+    try:
+        network_stream = stream.response.extensions.get('network_stream')
+        sock = network_stream.get_extra_info('socket') if network_stream is not None else None
+        if sock is not None:
+            sock.shutdown(socket.SHUT_RDWR)
+    except Exception as e:
+        logger.debug(f"Could not shut down run stream socket: {str(e)}")
+    try:
+        stream.close()
+    except Exception as e:
+        logger.debug(f"Error closing run stream: {str(e)}")
+
+
+def _message_text(message):
+    """Concatenated text blocks of a thread message."""
+    return ''.join(block.text.value for block in message.content if block.type == 'text')
+
+
+class AssistantRun:
+    """
+    One assistant run on a new thread, driven by its streamed run events.
+
+    result() creates the thread and the run in a single streaming request
+    and returns the assistant's reply as soon as thread.run.completed
+    arrives, instead of polling runs.retrieve. A deadline timer or
+    cancel() from another thread closes the stream and cancels the run
+    server-side, so the caller is released immediately.
+
+        run = AssistantRun(client, assistant_id, prompt, timeout=300)
+        text = run.result()          # in the worker
+        run.cancel()                 # from anywhere else
+    """
+
+    def __init__(self, client, assistant_id, prompt, timeout=ASSISTANT_RUN_TIMEOUT,
+                 name='assistant', on_delta=None):
+        """
+        Args:
+            client (OpenAI): Client to run on
+            assistant_id (str): Assistant to run
+            prompt (str): User message starting the thread
+            timeout (float): Deadline for the whole run, in seconds
+            name (str): Label for log messages, e.g. "SoW"
+            on_delta (callable, optional): Called with each streamed text fragment
+        """
+        self.client = client
+        self.assistant_id = assistant_id
+        self.prompt = prompt
+        self.timeout = timeout
+        self.name = name
+        self.on_delta = on_delta
+
+        self.thread_id = None
+        self.run_id = None
+        self.status = 'pending'
+        self.elapsed = None
+        self._lock = threading.Lock()
+        self._stream = None
+        self._stop_reason = None
+
+    def cancel(self, reason='cancelled'):
+        """Stop waiting for the run and cancel it. Safe to call from any thread."""
+        with self._lock:
+            if self._stop_reason is not None or self.status in ('completed', 'failed'):
+                return
+            self._stop_reason = reason
+            stream = self._stream
+        logger.info(f"🛑 Stopping {self.name} assistant run ({reason})")
+        if stream is not None:
+            _interrupt(stream)
+
+    def _cancel_remote(self):
+        if self.thread_id and self.run_id:
+            try:
+                self.client.beta.threads.runs.cancel(thread_id=self.thread_id, run_id=self.run_id)
+                logger.info(f"Cancelled the {self.name} assistant run")
+            except Exception as cancel_error:
+                logger.warning(f"Could not cancel run: {cancel_error}")
+
+    def _stopped(self, error=None):
+        """Exception for a run stopped by cancel() or its deadline."""
+        self._cancel_remote()
+        if self._stop_reason == 'deadline':
+            self.status = 'timed_out'
+            return AssistantRunTimeout(f"Assistant run timed out after {self.timeout:.0f} seconds. "
+                                       f"Please try again.", status='timed_out')
+        self.status = 'cancelled'
+        return AssistantRunCancelled("Assistant run was cancelled", status='cancelled')
+
+    def result(self):
+        """
+        Run the assistant and wait for its reply.
+
+        Returns:
+            str: The assistant's reply text
+
+        Raises:
+            AssistantRunTimeout: The deadline passed; the run was cancelled
+            AssistantRunCancelled: cancel() was called
+            AssistantRunError: The run failed, expired or produced no reply
+        """
+        started = time.time()
+        timer = threading.Timer(self.timeout, self.cancel, args=('deadline',))
+        timer.daemon = True
+        timer.start()
+        # Cancelling the background job this run belongs to cancels the run
+        unregister = on_cancel(self.cancel)
+
+        reply = ''
+        deltas = []
+        try:
+            self.status = 'queued'
+            stream = self.client.beta.threads.create_and_run(
+                assistant_id=self.assistant_id,
+                thread={'messages': [{'role': 'user', 'content': self.prompt}]},
+                stream=True,
+                timeout=min(self.timeout, ASSISTANT_STREAM_IDLE_TIMEOUT))
+            with self._lock:
+                self._stream = stream
+                stopped = self._stop_reason is not None
+            if stopped:
+                stream.close()
+                raise self._stopped()
+
+            for event in stream:
+                kind = event.event
+                if kind == 'thread.run.created':
+                    self.thread_id = event.data.thread_id
+                    self.run_id = event.data.id
+                    logger.info(f"⏳ {self.name} assistant run {self.run_id} started")
+                elif kind == 'thread.run.in_progress':
+                    self.status = 'in_progress'
+                elif kind == 'thread.message.delta':
+                    for block in event.data.delta.content or []:
+                        if block.type == 'text' and block.text and block.text.value:
+                            deltas.append(block.text.value)
+                            if self.on_delta is not None:
+                                self.on_delta(block.text.value)
+                elif kind == 'thread.message.completed':
+                    if event.data.role == 'assistant':
+                        reply += _message_text(event.data)
+                elif kind == 'thread.run.completed':
+                    self.status = 'completed'
+                    break
+                elif kind == 'thread.run.requires_action':
+                    # These assistants have no tools to call back into
+                    self._cancel_remote()
+                    self.status = 'failed'
+                    raise AssistantRunError("Assistant run requested a tool call, which is not supported",
+                                            status='requires_action')
+                elif kind in _FAILED_EVENTS:
+                    self.status = 'failed'
+                    error_msg = f"Assistant run ended with status: {_FAILED_EVENTS[kind]}"
+                    if getattr(event.data, 'last_error', None):
+                        error_msg += f". Error: {event.data.last_error}"
+                    raise AssistantRunError(error_msg, status=_FAILED_EVENTS[kind])
+
+        except AssistantRunError:
+            raise
+        except Exception as e:
+            if self._stop_reason is not None:
+                raise self._stopped(e) from None
+            self.status = 'failed'
+            self._cancel_remote()
+            raise AssistantRunError(f"Assistant run stream failed: {str(e)}") from e
+        finally:
+            timer.cancel()
+            unregister()
+            self.elapsed = time.time() - started
+            if self._stream is not None:
+                try:
+                    self._stream.close()
+                except Exception:
+                    pass
+
+        if self.status != 'completed':
+            if self._stop_reason is not None:
+                raise self._stopped()
+            self.status = 'failed'
+            raise AssistantRunError("Assistant run stream ended before the run completed")
+
+        reply = reply or ''.join(deltas)
+        if not reply.strip():
+            raise AssistantRunError("No assistant response found in thread", status='completed')
+
+        logger.info(f"🎉 {self.name} assistant run completed after {self.elapsed:.1f}s")
+        return reply.strip()
+
+
+def run_assistant(client, assistant_id, prompt, timeout=ASSISTANT_RUN_TIMEOUT, name='assistant',
+                  on_delta=None):
+    """
+    Run an assistant on a new thread and return its reply (see AssistantRun).
+
+    Args:
+        client (OpenAI): Client to run on
+        assistant_id (str): Assistant to run
+        prompt (str): User message starting the thread
+        timeout (float): Deadline for the whole run, in seconds
+        name (str): Label for log messages
+        on_delta (callable, optional): Called with each streamed text fragment
+
+    Returns:
+        str: The assistant's reply text
+    """
+    return AssistantRun(client, assistant_id, prompt, timeout=timeout, name=name,
+                        on_delta=on_delta).result()
@@ -0,0 +1,152 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Where uploaded images are kept:
+#   file - a local directory (shared by the workers on one host)
+BLOB_STORE_BACKEND = os.environ.get("BLOB_STORE_BACKEND", "file")
+# Sessions reference blobs for as long as they are kept, so this should be
+# a persistent directory rather than a temporary one
+BLOB_STORE_PATH = os.environ.get(
+    "BLOB_STORE_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "blob_store"))
+
+# Blobs are served under this path; a session stores BLOB_URL_PREFIX + key
+BLOB_URL_PREFIX = "/blobs/"
+
+_KEY = re.compile(r"[0-9a-f]{64}")
+
+
+def blob_key(data):
+    """Content address of some bytes: their SHA-256 in hex."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def blob_url(key):
+    """URL a stored blob is served at."""
+    return BLOB_URL_PREFIX + key
+
+
+def key_from_url(url):
+    """Key of a blob URL, or None if it is not one (e.g. a data: URL)."""
+    if not isinstance(url, str) or not url.startswith(BLOB_URL_PREFIX):
+        return None
+    key = url[len(BLOB_URL_PREFIX):]
+    return key if _KEY.fullmatch(key) else None
+
+
+class BlobInfo:
+    """Size and content type of a stored blob."""
+
+    def __init__(self, key, size, content_type):
+        self.key = key
+        self.size = size
+        self.content_type = content_type
+
+
+class FileBlobStore:
+    """
+    Content-addressed store in a local directory. A blob is written once
+    under its SHA-256 (root/ab/abcdef...) with its content type beside it
+    (abcdef....json); storing the same bytes again is a no-op. Writes go
+    through a temporary file and a rename, so readers never see a partial
+    blob, and blobs never change once written, so they can be cached forever.
+    """
+
+    def __init__(self, root=BLOB_STORE_PATH):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self.metrics = {'stored': 0, 'deduplicated': 0, 'bytes_stored': 0, 'reads': 0, 'misses': 0}
+
+    def path(self, key):
+        """File holding a blob (it may not exist)."""
+        if not _KEY.fullmatch(key or ''):
+            raise KeyError(key)
+        return os.path.join(self.root, key[:2], key)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.metrics[name] += amount
+
+    def put(self, data, content_type='application/octet-stream'):
+        """
+        Store bytes under their content address.
+
+        Args:
+            data (bytes): The blob
+            content_type (str): MIME type to serve it with
+
+        Returns:
+            str: The blob's key
+        """
+        key = blob_key(data)
+        path = self.path(key)
+        if os.path.exists(path):
+            self._count('deduplicated')
+            return key
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Metadata first: a blob file present means its metadata is too
+        self._write(path + '.json', json.dumps({'content_type': content_type, 'size': len(data)}).encode())
+        self._write(path, data)
+        self._count('stored')
+        self._count('bytes_stored', len(data))
+        logger.info(f"📦 Stored blob {key[:12]} ({len(data) // 1024} KB, {content_type})")
+        return key
+
+    def _write(self, path, data):
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def info(self, key):
+        """BlobInfo of a stored blob, or None if there is none under that key."""
+        try:
+            path = self.path(key)
+            with open(path + '.json', 'rb') as f:
+                meta = json.loads(f.read())
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+        except (KeyError, OSError, ValueError):
+            self._count('misses')
+            return None
+        return BlobInfo(key, meta.get('size', 0), meta.get('content_type', 'application/octet-stream'))
+
+    def get(self, key):
+        """Bytes of a stored blob, or None."""
+        try:
+            with open(self.path(key), 'rb') as f:
+                data = f.read()
+        except (KeyError, OSError):
+            self._count('misses')
+            return None
+        self._count('reads')
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'file', 'root': self.root, **self.metrics}
+
+
+def create_blob_store(kind=BLOB_STORE_BACKEND):
+    """Build the blob store selected by BLOB_STORE_BACKEND."""
+    if kind != "file":
+        logger.warning(f"Unknown BLOB_STORE_BACKEND '{kind}', using the local directory")
+    logger.info(f"Blob store: local directory {BLOB_STORE_PATH}")
+    return FileBlobStore()
@@ -0,0 +1,251 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "10"))
+# Longest a request waits for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+# Connections idle longer than this are pinged before being handed out
+DB_POOL_HEALTH_CHECK_IDLE = float(os.environ.get("DB_POOL_HEALTH_CHECK_IDLE", "30"))
+# Connections older than this are closed and replaced on return
+DB_POOL_MAX_LIFETIME = float(os.environ.get("DB_POOL_MAX_LIFETIME", "1800"))
+
+
+def connect_kwargs_from_env():
+    """psycopg2.connect() arguments from DATABASE_URL or the PG* variables."""
+    database_url = os.environ.get("DATABASE_URL")
+    if database_url:
+        return {'dsn': database_url}
+    # Default Replit PostgreSQL connection
+    return {
+        'host': os.environ.get("PGHOST", "localhost"),
+        'database': os.environ.get("PGDATABASE", "postgres"),
+        'user': os.environ.get("PGUSER", "postgres"),
+        'password': os.environ.get("PGPASSWORD", ""),
+        'port': os.environ.get("PGPORT", "5432"),
+    }
+
+
+class PoolTimeoutError(Exception):
+    """No connection became free within the pool timeout."""
+
+
+class PooledConnection:
+    """
+    A checked-out connection. Behaves like the psycopg2 connection it wraps,
+    except that close() hands it back to the pool instead of disconnecting,
+    so existing `conn.close()` call sites need no changes.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._return(raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._raw is not None and not self._raw.closed:
+            if exc_type is None:
+                self._raw.commit()
+            else:
+                self._raw.rollback()
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections.
+
+    Keeps between min_size and max_size connections; callers beyond max_size
+    wait (up to timeout) for one to be returned. Idle connections are pinged
+    before reuse, connections past their max lifetime or left broken are
+    replaced, and open transactions are rolled back on return.
+    """
+
+    def __init__(self, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE, timeout=DB_POOL_TIMEOUT,
+                 health_check_idle=DB_POOL_HEALTH_CHECK_IDLE, max_lifetime=DB_POOL_MAX_LIFETIME,
+                 **connect_kwargs):
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.health_check_idle = health_check_idle
+        self.max_lifetime = max_lifetime
+        self.connect_kwargs = connect_kwargs or connect_kwargs_from_env()
+
+        self._cond = threading.Condition()
+        self._idle = []          # [(raw connection, returned_at)], most recent last
+        self._created_at = {}    # id(raw) -> creation time
+        self._size = 0           # open connections, idle + in use
+        self._in_use = 0
+
+        self.metrics = {
+            'checkouts': 0,
+            'connections_created': 0,
+            'connections_recycled': 0,
+            'health_check_failures': 0,
+            'timeouts': 0,
+            'wait_time_total_ms': 0.0,
+            'wait_time_max_ms': 0.0,
+            'peak_in_use': 0,
+        }
+
+    def _connect(self):
+        raw = psycopg2.connect(**self.connect_kwargs)
+        self._created_at[id(raw)] = time.time()
+        self.metrics['connections_created'] += 1
+        return raw
+
+    def _discard(self, raw):
+        """Close a connection and forget it (caller holds the condition)."""
+        self._created_at.pop(id(raw), None)
+        self._size -= 1
+        try:
+            raw.close()
+        except Exception:
+            pass
+        self._cond.notify()
+
+    def _healthy(self, raw, idle_since):
+        if raw.closed:
+            return False
+        if time.time() - idle_since < self.health_check_idle:
+            return True
+        try:
+            with raw.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            raw.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled database connection failed health check: {str(e)}")
+            return False
+
+    def warm(self):
+        """Open connections up to min_size (e.g. at startup)."""
+        with self._cond:
+            while self._size < self.min_size:
+                try:
+                    raw = self._connect()
+                except Exception as e:
+                    logger.error(f"Database pool warm-up failed: {str(e)}")
+                    return
+                self._size += 1
+                self._idle.append((raw, time.time()))
+
+    def acquire(self, timeout=None):
+        """
+        Check out a connection, waiting up to timeout seconds if the pool is
+        exhausted. Returns a PooledConnection; raises PoolTimeoutError or the
+        psycopg2 connect error.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._cond:
+            while True:
+                while self._idle:
+                    raw, idle_since = self._idle.pop()
+                    if self._healthy(raw, idle_since):
+                        return self._checked_out(raw, started)
+                    self.metrics['health_check_failures'] += 1
+                    self._discard(raw)
+
+                if self._size < self.max_size:
+                    # Reserve the slot, connect outside the lock
+                    self._size += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.metrics['timeouts'] += 1
+                    raise PoolTimeoutError(f"No database connection free after {timeout}s "
+                                           f"({self._in_use}/{self.max_size} in use)")
+                self._cond.wait(remaining)
+
+        try:
+            raw = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            return self._checked_out(raw, started)
+
+    def _checked_out(self, raw, started):
+        waited_ms = (time.monotonic() - started) * 1000
+        self._in_use += 1
+        self.metrics['checkouts'] += 1
+        self.metrics['wait_time_total_ms'] += waited_ms
+        self.metrics['wait_time_max_ms'] = max(self.metrics['wait_time_max_ms'], waited_ms)
+        self.metrics['peak_in_use'] = max(self.metrics['peak_in_use'], self._in_use)
+        return PooledConnection(self, raw)
+
+    def _return(self, raw):
+        with self._cond:
+            self._in_use -= 1
+            try:
+                if not raw.closed and raw.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    # Uncommitted work is never carried into the next checkout
+                    raw.rollback()
+            except Exception:
+                pass
+
+            too_old = time.time() - self._created_at.get(id(raw), 0) > self.max_lifetime
+            if raw.closed or too_old:
+                self.metrics['connections_recycled'] += 1
+                self._discard(raw)
+            else:
+                self._idle.append((raw, time.time()))
+                self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        with pool.connection() as conn: ... - commits on success, rolls back
+        on error, and always returns the connection to the pool.
+        """
+        conn = self.acquire(timeout)
+        with conn:
+            yield conn
+
+    def stats(self):
+        with self._cond:
+            checkouts = self.metrics['checkouts']
+            return {
+                **self.metrics,
+                'wait_time_total_ms': round(self.metrics['wait_time_total_ms'], 2),
+                'wait_time_max_ms': round(self.metrics['wait_time_max_ms'], 2),
+                'wait_time_avg_ms': round(self.metrics['wait_time_total_ms'] / checkouts, 3) if checkouts else 0.0,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'utilization': round(self._in_use / self.max_size, 3),
+            }
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                raw, _ = self._idle.pop()
+                self._discard(raw)
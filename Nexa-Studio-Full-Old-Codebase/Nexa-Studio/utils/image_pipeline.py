@@ -0,0 +1,181 @@
+import io
+import os
+import math
+import base64
+import hashlib
+import logging
+
+from PIL import Image, ImageOps
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# gpt-4o ("high" detail) scales images to fit a square of this side...
+VISION_MAX_SIDE = int(os.environ.get("VISION_MAX_SIDE", "2048"))
+# ...and then to this shortest side; lower it to spend fewer image tokens
+VISION_MAX_SHORT_SIDE = int(os.environ.get("VISION_MAX_SHORT_SIDE", "768"))
+# Quality of re-encoded JPEG photos (diagrams are re-encoded as PNG)
+VISION_JPEG_QUALITY = int(os.environ.get("VISION_JPEG_QUALITY", "85"))
+# Largest image accepted for analysis
+IMAGE_MAX_BYTES = int(os.environ.get("IMAGE_MAX_BYTES", str(20 * 1024 * 1024)))
+
+# Formats the vision model accepts as they are
+_MODEL_FORMATS = {'PNG': 'image/png', 'JPEG': 'image/jpeg', 'WEBP': 'image/webp', 'GIF': 'image/gif'}
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+class ImageError(ValueError):
+    """The data is not an image that can be sent for analysis."""
+
+
+def vision_size(width, height, max_side=VISION_MAX_SIDE, max_short_side=VISION_MAX_SHORT_SIDE):
+    """Size the vision model works at for an image of width x height (never larger)."""
+    scale = min(1.0, max_side / max(width, height), max_short_side / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def vision_tokens(width, height):
+    """Image tokens gpt-4o charges at "high" detail: 85 plus 170 per 512 px tile of its working size."""
+    width, height = vision_size(width, height, 2048, 768)
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+class PreparedImage:
+    """An image decoded once and sized for the vision model, plus the original bytes for storing."""
+
+    def __init__(self, data, mime_type, size, original, original_mime_type, original_size):
+        self.data = data
+        self.mime_type = mime_type
+        self.size = size
+        self.original = original
+        self.original_mime_type = original_mime_type
+        self.original_size = original_size
+        self.sha256 = hashlib.sha256(original).hexdigest()
+
+    def data_url(self):
+        """The prepared image inline, for an image_url content part."""
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+    def summary(self):
+        """Sizes before and after, for logs and trace metadata."""
+        return {
+            'original_size': f"{self.original_size[0]}x{self.original_size[1]}",
+            'original_bytes': len(self.original),
+            'sent_size': f"{self.size[0]}x{self.size[1]}",
+            'sent_bytes': len(self.data),
+            'image_tokens': vision_tokens(*self.size),
+        }
+
+
+def _check_size(raw):
+    if not raw:
+        raise ImageError("Image is empty")
+    if len(raw) > IMAGE_MAX_BYTES:
+        raise ImageError(f"Image is too large ({len(raw) // (1024 * 1024)} MB, "
+                         f"limit {IMAGE_MAX_BYTES // (1024 * 1024)} MB)")
+
+
+def image_mime_type(raw):
+    """
+    MIME type of an image, read from its content rather than a file name or
+    the type a client claims.
+
+    Raises:
+        ImageError: Empty, too large or not a readable image
+    """
+    _check_size(raw)
+    try:
+        with Image.open(io.BytesIO(raw)) as image:
+            image_format = image.format
+    except Exception as e:
+        raise ImageError(f"Could not read image: {str(e)}") from e
+    mime_type = Image.MIME.get(image_format, '')
+    if not mime_type.startswith('image/'):
+        raise ImageError(f"Unsupported image format: {image_format}")
+    return mime_type
+
+
+def prepare_image(raw):
+    """
+    Decode an image once and downsize it to the resolution the vision model
+    uses, so it can be sent inline instead of by URL.
+
+    Images already within that size are passed through unchanged. Larger
+    ones are scaled down (JPEGs are decoded at reduced scale to start with)
+    and re-encoded: photos as JPEG, everything else as PNG to keep diagram
+    lines and text sharp. EXIF rotation is applied.
+
+    Args:
+        raw (bytes): The image file as uploaded
+
+    Returns:
+        PreparedImage: The image to send, and the original
+
+    Raises:
+        ImageError: Empty, too large or not a readable image
+    """
+    _check_size(raw)
+
+    try:
+        image = Image.open(io.BytesIO(raw))
+        source_format = image.format
+        original_size = image.size
+        orientation = image.getexif().get(0x0112, 1)
+    except Exception as e:
+        raise ImageError(f"Could not read image: {str(e)}") from e
+
+    width, height = original_size
+    if orientation in _TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    target = vision_size(width, height)
+
+    if (target == (width, height) and orientation == 1 and source_format in _MODEL_FORMATS
+            and not getattr(image, 'is_animated', False)):
+        return PreparedImage(raw, _MODEL_FORMATS[source_format], original_size,
+                             raw, _MODEL_FORMATS[source_format], original_size)
+
+    try:
+        if source_format == 'JPEG' and target != (width, height):
+            # Let the decoder skip detail that would be scaled away anyway
+            image.draft('RGB', target if orientation not in _TRANSPOSED_ORIENTATIONS else target[::-1])
+        image.load()
+        if orientation != 1:
+            image = ImageOps.exif_transpose(image)
+        if image.size != target:
+            image = image.resize(target, Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        if source_format == 'JPEG':
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            image.save(buffer, 'JPEG', quality=VISION_JPEG_QUALITY)
+            mime_type = 'image/jpeg'
+        else:
+            if image.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+                image = image.convert('RGBA')
+            image.save(buffer, 'PNG')
+            mime_type = 'image/png'
+    except Exception as e:
+        raise ImageError(f"Could not process image: {str(e)}") from e
+
+    prepared = PreparedImage(buffer.getvalue(), mime_type, image.size,
+                             raw, Image.MIME.get(source_format, 'application/octet-stream'), original_size)
+    logger.info(f"🖼️ Prepared image for vision: {original_size[0]}x{original_size[1]} "
+                f"({len(raw) // 1024} KB) → {image.size[0]}x{image.size[1]} ({len(prepared.data) // 1024} KB)")
+    return prepared
+
+
+def decode_data_url(data_url):
+    """
+    Bytes of a base64 image, given as a data: URL or bare base64.
+
+    Raises:
+        ImageError: Not valid base64
+    """
+    header, separator, data = data_url.partition(',')
+    try:
+        return base64.b64decode(data if separator else header)
+    except (ValueError, TypeError) as e:
+        raise ImageError(f"Invalid base64 image data: {str(e)}") from e
@@ -0,0 +1,320 @@
+import os
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Jobs running at once; the rest wait in the queue
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+# Most jobs queued or running before new submissions are refused
+JOB_MAX_PENDING = int(os.environ.get("JOB_MAX_PENDING", "50"))
+# Finished jobs (and their results) are kept this long
+JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", str(60 * 60)))
+# Most finished jobs kept; oldest go first
+JOB_MAX_RETAINED = int(os.environ.get("JOB_MAX_RETAINED", "500"))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# The job whose work is running in this context (see job_progress/on_cancel)
+_current_job = contextvars.ContextVar('current_job', default=None)
+
+
+class JobQueueFull(Exception):
+    """JOB_MAX_PENDING jobs are already queued or running."""
+
+
+class Job:
+    """
+    One unit of background work: its status, progress events and result.
+
+    Events are numbered so an SSE client can resume with Last-Event-ID;
+    wait_for_events() blocks until there is something newer to send.
+    """
+
+    def __init__(self, kind, key, func, args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+        self.status = QUEUED
+        self.progress = {'message': 'Queued', 'percent': 0}
+        self.result = None
+        self.http_status = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        self._condition = threading.Condition()
+        self._events = []
+        self._cancel_callbacks = []
+        self.cancel_requested = False
+
+    def emit(self, event, data):
+        with self._condition:
+            self._events.append((len(self._events) + 1, event, data))
+            self._condition.notify_all()
+
+    def update(self, message, percent=None):
+        """Record progress and publish it to event subscribers."""
+        self.progress = {'message': message,
+                         'percent': self.progress['percent'] if percent is None else percent}
+        self.emit('progress', self.progress)
+
+    def wait_for_events(self, after, timeout):
+        """Events numbered above after, waiting up to timeout for one if there are none yet."""
+        with self._condition:
+            if len(self._events) <= after:
+                self._condition.wait(timeout)
+            return self._events[after:]
+
+    def add_cancel_callback(self, callback):
+        with self._condition:
+            if not self.cancel_requested:
+                self._cancel_callbacks.append(callback)
+                return lambda: self._remove_cancel_callback(callback)
+        callback()
+        return lambda: None
+
+    def _remove_cancel_callback(self, callback):
+        with self._condition:
+            if callback in self._cancel_callbacks:
+                self._cancel_callbacks.remove(callback)
+
+    def snapshot(self, include_result=True):
+        """JSON-ready view of the job for the status endpoint."""
+        view = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if self.status in FINISHED:
+            view['http_status'] = self.http_status
+            view['error'] = self.error
+            if include_result:
+                view['result'] = self.result
+        return view
+
+
+class JobQueue:
+    """
+    In-process background jobs on a bounded worker pool.
+
+    submit() queues func(*args, **kwargs) and returns at once; func returns
+    (response body, HTTP status) like the route it came from. Submissions
+    with the key of a job that is still queued or running get that job back
+    instead of a second one, and so do submissions with a client-supplied
+    idempotency key of a job finished within the retention period. Finished
+    jobs are dropped after JOB_RESULT_TTL or beyond JOB_MAX_RETAINED.
+    setup/teardown run around every job in its worker thread.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, ttl=JOB_RESULT_TTL,
+                 max_retained=JOB_MAX_RETAINED, setup=None, teardown=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.max_retained = max_retained
+        self.setup = setup
+        self.teardown = teardown
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # job_id -> Job, in submission order
+        self._keys = {}             # idempotency key -> job_id
+        self.metrics = {'submitted': 0, 'deduplicated': 0, 'rejected': 0,
+                        'succeeded': 0, 'failed': 0, 'cancelled': 0, 'expired': 0}
+
+    def submit(self, kind, func, *args, key=None, reuse_finished=False, **kwargs):
+        """
+        Queue a job, or return the existing job for key.
+
+        Args:
+            kind (str): What the job does, e.g. "solution-to-sow"
+            func (callable): func(*args, **kwargs) -> (body dict, HTTP status)
+            key (str, optional): Idempotency key
+            reuse_finished (bool): Also return a finished job with this key
+                (for keys supplied by the client)
+
+        Returns:
+            tuple: (Job, True if it was created by this call)
+
+        Raises:
+            JobQueueFull: Too many jobs queued or running
+        """
+        with self._lock:
+            self._expire()
+            if key is not None:
+                existing = self._jobs.get(self._keys.get(key))
+                if existing is not None and (existing.status not in FINISHED or
+                                             (reuse_finished and existing.status == SUCCEEDED)):
+                    self.metrics['deduplicated'] += 1
+                    return existing, False
+
+            pending = sum(1 for job in self._jobs.values() if job.status not in FINISHED)
+            if pending >= self.max_pending:
+                self.metrics['rejected'] += 1
+                raise JobQueueFull(f"{pending} jobs are already queued or running")
+
+            job = Job(kind, key, func, args, kwargs)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._keys[key] = job.id
+            self.metrics['submitted'] += 1
+
+        logger.info(f"📥 Queued {kind} job {job.id}")
+        job.emit('progress', job.progress)
+        # The job sees the submitting request's context variables (trace, cache bypass)
+        self._executor.submit(contextvars.copy_context().run, self._run, job)
+        return job, True
+
+    def _run(self, job):
+        # Claimed under the job's condition, so a cancel either sees it
+        # still queued and cancels it here, or sees it running
+        with job._condition:
+            if job.cancel_requested:
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+        job.update('Started', 0)
+        token = _current_job.set(job)
+        if self.setup is not None:
+            self.setup()
+        # The outcome is published only after teardown has written the
+        # session back, so pollers never see a finished job before that
+        error = None
+        try:
+            body, http_status = job.func(*job.args, **job.kwargs)
+            succeeded = http_status < 400 and (not isinstance(body, dict) or body.get('success', True))
+            outcome = SUCCEEDED if succeeded else FAILED
+            if not succeeded and isinstance(body, dict):
+                error = body.get('message')
+        except Exception as e:
+            logger.error(f"💥 {job.kind} job {job.id} failed: {str(e)}")
+            outcome = FAILED
+            http_status = 500
+            error = str(e)
+            body = {'success': False, 'message': str(e)}
+        finally:
+            if self.teardown is not None:
+                try:
+                    self.teardown()
+                except Exception as e:
+                    logger.error(f"Job teardown failed: {str(e)}")
+            _current_job.reset(token)
+
+        with job._condition:
+            job.result = body
+            job.http_status = http_status
+            job.error = error
+            job.progress = {'message': error or 'Done', 'percent': 100}
+            job.finished_at = time.time()
+            job.status = CANCELLED if job.cancel_requested else outcome
+
+        with self._lock:
+            self.metrics[job.status] += 1
+        logger.info(f"📤 {job.kind} job {job.id} {job.status} after {job.finished_at - job.started_at:.1f}s")
+        job.emit(job.status, job.snapshot())
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Ask a job to stop: queued jobs never start, running ones get their cancel callbacks called."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        with job._condition:
+            if job.status in FINISHED:
+                return job
+            job.cancel_requested = True
+            callbacks, job._cancel_callbacks = job._cancel_callbacks, []
+            was_queued = job.status == QUEUED
+            if was_queued:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+                job.http_status = 409
+                job.error = 'Cancelled before it started'
+                job.result = {'success': False, 'message': job.error}
+        logger.info(f"🛑 Cancelling {job.kind} job {job.id}")
+        if was_queued:
+            with self._lock:
+                self.metrics['cancelled'] += 1
+            job.emit(CANCELLED, job.snapshot())
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Job cancel callback failed: {str(e)}")
+        return job
+
+    def _expire(self):
+        """Drop finished jobs past the TTL or the retention limit (lock held)."""
+        now = time.time()
+        # Never expire a job whose finish has not been stamped
+        finished = [job for job in self._jobs.values()
+                    if job.status in FINISHED and job.finished_at is not None]
+        overflow = len(finished) - self.max_retained
+        for job in finished:
+            if now - job.finished_at > self.ttl or overflow > 0:
+                overflow -= 1
+                del self._jobs[job.id]
+                if job.key is not None and self._keys.get(job.key) == job.id:
+                    del self._keys[job.key]
+                self.metrics['expired'] += 1
+
+    def stats(self):
+        with self._lock:
+            self._expire()
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'result_ttl_seconds': self.ttl,
+                'jobs': statuses,
+                **self.metrics,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def job_progress(message, percent=None):
+    """Report progress of the job running in this context; does nothing outside a job."""
+    job = _current_job.get()
+    if job is not None:
+        job.update(message, percent)
+
+
+def on_cancel(callback):
+    """
+    Call callback if the job running in this context is cancelled. Returns a
+    function that unregisters it; does nothing outside a job.
+    """
+    job = _current_job.get()
+    if job is None:
+        return lambda: None
+    return job.add_cancel_callback(callback)
@@ -0,0 +1,270 @@
+import copy
+
+# Partial database writes replace values at most this many keys deep
+PATCH_WRITE_DEPTH = 2
+
+
+class JsonPatchError(ValueError):
+    """A patch is malformed or cannot be applied (including a failed 'test')."""
+
+
+def parse_pointer(pointer):
+    """
+    Split an RFC 6901 JSON pointer into unescaped reference tokens.
+
+    Args:
+        pointer (str): e.g. '/solution_1/structure/title'
+
+    Returns:
+        list: Reference tokens ([] for the whole document)
+    """
+    if not isinstance(pointer, str):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    if pointer == '':
+        return []
+    if not pointer.startswith('/'):
+        raise JsonPatchError(f"JSON pointer must start with '/': {pointer!r}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def _index(container, token, allow_end=False):
+    if token == '-' and allow_end:
+        return len(container)
+    if not token.isdigit() or (token != '0' and token.startswith('0')):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"Array index out of range: {index}")
+    return index
+
+
+def _resolve(document, tokens):
+    node = document
+    for token in tokens:
+        if isinstance(node, dict):
+            if token not in node:
+                raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+            node = node[token]
+        elif isinstance(node, list):
+            node = node[_index(node, token)]
+        else:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+    return node
+
+
+class _Transaction:
+    """Applies primitive edits in place and can undo them, so a patch is all-or-nothing."""
+
+    def __init__(self):
+        self.undo = []
+
+    def add(self, container, token, value):
+        if isinstance(container, dict):
+            if token in container:
+                self.undo.append(('set', container, token, container[token]))
+            else:
+                self.undo.append(('del', container, token, None))
+            container[token] = value
+        elif isinstance(container, list):
+            index = _index(container, token, allow_end=True)
+            container.insert(index, value)
+            self.undo.append(('pop', container, index, None))
+        else:
+            raise JsonPatchError("Cannot add to a scalar value")
+
+    def remove(self, container, token):
+        if isinstance(container, dict):
+            if token not in container:
+                raise JsonPatchError(f"Cannot remove missing member {token!r}")
+            value = container.pop(token)
+            self.undo.append(('set', container, token, value))
+        elif isinstance(container, list):
+            index = _index(container, token)
+            value = container.pop(index)
+            self.undo.append(('insert', container, index, value))
+        else:
+            raise JsonPatchError("Cannot remove from a scalar value")
+        return value
+
+    def replace(self, container, token, value):
+        if isinstance(container, dict):
+            if token not in container:
+                raise JsonPatchError(f"Cannot replace missing member {token!r}")
+            self.undo.append(('set', container, token, container[token]))
+            container[token] = value
+        elif isinstance(container, list):
+            index = _index(container, token)
+            self.undo.append(('set', container, index, container[index]))
+            container[index] = value
+        else:
+            raise JsonPatchError("Cannot replace in a scalar value")
+
+    def rollback(self):
+        for action, container, key, value in reversed(self.undo):
+            if action == 'set':
+                container[key] = value
+            elif action == 'del':
+                del container[key]
+            elif action == 'pop':
+                container.pop(key)
+            else:
+                container.insert(key, value)
+        self.undo = []
+
+
+def check_protected(operations, protected):
+    """
+    Reject a patch that reads or writes inside server-managed members.
+
+    Args:
+        operations (list): Patch operations
+        protected (iterable): JSON pointers clients may not patch, e.g. ['/badge']
+
+    Raises:
+        JsonPatchError: An operation's path or from is one of them or below one
+    """
+    if not isinstance(operations, list):
+        raise JsonPatchError("Patch must be a list of operations")
+    protected = [parse_pointer(pointer) for pointer in protected]
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise JsonPatchError(f"Invalid patch operation: {operation!r}")
+        for member in ('path', 'from'):
+            if member not in operation:
+                continue
+            tokens = parse_pointer(operation[member])
+            for pointer in protected:
+                if tokens[:len(pointer)] == pointer:
+                    raise JsonPatchError(f"{operation[member]} is managed by the server and cannot be patched")
+
+
+def apply_patch(document, operations):
+    """
+    Apply an RFC 6902 JSON Patch atomically, editing document in place.
+
+    Either every operation is applied or, on the first failing one, the
+    earlier ones are undone and JsonPatchError is raised. Only changed
+    members are touched, so large untouched values (e.g. base64 images) are
+    never copied.
+
+    Args:
+        document (dict): Target document
+        operations (list): Patch operations ({'op', 'path', 'value'/'from'})
+
+    Returns:
+        The patched document (a new object only if the root was replaced)
+    """
+    if not isinstance(operations, list):
+        raise JsonPatchError("Patch must be a list of operations")
+
+    transaction = _Transaction()
+    try:
+        for operation in operations:
+            if not isinstance(operation, dict) or 'op' not in operation or 'path' not in operation:
+                raise JsonPatchError(f"Invalid patch operation: {operation!r}")
+            op = operation['op']
+            tokens = parse_pointer(operation['path'])
+
+            if op in ('add', 'replace', 'test') and 'value' not in operation:
+                raise JsonPatchError(f"'{op}' operation requires a value")
+
+            if op == 'test':
+                if _resolve(document, tokens) != operation['value']:
+                    raise JsonPatchError(f"Test failed at {operation['path']}")
+                continue
+
+            if op in ('move', 'copy'):
+                from_tokens = parse_pointer(operation.get('from'))
+                if op == 'move' and tokens[:len(from_tokens)] == from_tokens and tokens != from_tokens:
+                    raise JsonPatchError("Cannot move a value into one of its children")
+                if not from_tokens:
+                    raise JsonPatchError(f"Cannot {op} the whole document")
+                if op == 'move':
+                    if tokens == from_tokens:
+                        continue
+                    value = transaction.remove(_resolve(document, from_tokens[:-1]), from_tokens[-1])
+                else:
+                    value = copy.deepcopy(_resolve(document, from_tokens))
+                op = 'add'
+            elif op in ('add', 'replace'):
+                value = operation['value']
+            elif op != 'remove':
+                raise JsonPatchError(f"Unknown patch operation: {op!r}")
+
+            if not tokens:
+                if op == 'remove':
+                    raise JsonPatchError("Cannot remove the whole document")
+                if not isinstance(value, dict):
+                    raise JsonPatchError("Session document must stay an object")
+                # Root replacement: nothing to undo in place, the caller swaps documents
+                document = value
+                continue
+
+            parent = _resolve(document, tokens[:-1])
+            if op == 'add':
+                transaction.add(parent, tokens[-1], value)
+            elif op == 'replace':
+                transaction.replace(parent, tokens[-1], value)
+            else:
+                transaction.remove(parent, tokens[-1])
+    except JsonPatchError:
+        transaction.rollback()
+        raise
+    except (TypeError, AttributeError) as e:
+        transaction.rollback()
+        raise JsonPatchError(f"Patch could not be applied: {str(e)}")
+
+    return document
+
+
+def changed_paths(document, operations, max_depth=PATCH_WRITE_DEPTH):
+    """
+    Paths of the patched document to rewrite when persisting a patch.
+
+    Each operation's target is cut back to at most max_depth object keys and
+    to the enclosing array (array elements shift, so whole arrays are
+    rewritten). Paths under another listed path are dropped.
+
+    Args:
+        document (dict): The document after the patch was applied
+        operations (list): The applied patch operations
+
+    Returns:
+        set: Tuples of keys, or None if the whole document must be written
+    """
+    paths = set()
+    for operation in operations:
+        if operation.get('op') == 'test':
+            continue
+        pointers = [operation['path']]
+        if operation.get('op') == 'move':
+            pointers.append(operation['from'])
+        for pointer in pointers:
+            tokens = parse_pointer(pointer)
+            if not tokens:
+                return None
+            node = document
+            path = []
+            for token in tokens[:max_depth]:
+                if not isinstance(node, dict):
+                    break
+                path.append(token)
+                if token not in node:
+                    break
+                node = node[token]
+            if not path:
+                return None
+            paths.add(tuple(path))
+
+    return {path for path in paths
+            if not any(other != path and path[:len(other)] == other for other in paths)}
+
+
+def value_at(document, path):
+    """Value at a key path of changed_paths(), or (False, None) if it is absent."""
+    node = document
+    for token in path:
+        if not isinstance(node, dict) or token not in node:
+            return False, None
+        node = node[token]
+    return True, node
@@ -0,0 +1,358 @@
+import os
+import json
+import time
+import base64
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from utils.llm_stream import stream_completion
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 0 sends every request to OpenAI, as before
+LLM_CACHE = os.environ.get("LLM_CACHE", "1") != "0"
+# Most responses kept in process memory; least recently used go first
+LLM_CACHE_MEMORY_ITEMS = int(os.environ.get("LLM_CACHE_MEMORY_ITEMS", "256"))
+# Disk tier shared by every worker on the host; empty keeps the cache in memory only
+LLM_CACHE_PATH = os.environ.get(
+    "LLM_CACHE_PATH", os.path.join(tempfile.gettempdir(), "nexa-llm-cache.sqlite3"))
+# Responses older than this are not reused
+LLM_CACHE_TTL_SECONDS = int(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+# Size budget of the disk tier; least recently used go first
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Set per request (e.g. ?nocache=1) to skip cache reads; fresh responses are still stored
+_bypass = contextvars.ContextVar('llm_cache_bypass', default=False)
+
+
+def _image_digest(url):
+    """sha256 of the bytes behind a data: URL, so the key does not depend on the encoding."""
+    header, _, data = url.partition(',')
+    try:
+        raw = base64.b64decode(data) if header.endswith(';base64') else data.encode('utf-8')
+    except (ValueError, TypeError):
+        raw = url.encode('utf-8')
+    return 'sha256:' + hashlib.sha256(raw).hexdigest()
+
+
+def _normalize(value):
+    """Request parameters with inline images replaced by the digest of their bytes."""
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, str) and value.startswith('data:'):
+        return _image_digest(value)
+    return value
+
+
+def cache_key(kind, template_version, params):
+    """
+    Content hash identifying one model request.
+
+    Args:
+        kind (str): Helper making the request, e.g. "vision_analysis"
+        template_version (int): Version of the helper's prompt and post-processing
+        params (dict): chat.completions.create() arguments (model, messages, ...)
+
+    Returns:
+        str: Hex sha256 of the kind, version, model, parameters and input bytes
+    """
+    payload = json.dumps({'kind': kind, 'version': template_version, 'params': _normalize(params)},
+                         sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class DiskTier:
+    """
+    Cached responses in a local SQLite file (WAL mode), shared by the worker
+    processes on the host. Entries expire after the TTL; past the size budget
+    the least recently used are dropped.
+    """
+
+    def __init__(self, path, ttl, max_bytes):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self.evictions = 0
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS llm_responses_last_access "
+                     "ON llm_responses (last_access)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """(value, created_at) or None."""
+        conn = self._conn()
+        row = conn.execute("SELECT value, created_at FROM llm_responses WHERE key = ?",
+                           (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > self.ttl:
+            conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+            self.evictions += 1
+            return None
+        conn.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+        return row[0], row[1]
+
+    def put(self, key, kind, value, created_at):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_responses (key, kind, value, size, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, kind, value, len(value.encode('utf-8')), created_at, time.time()))
+        self._evict(key)
+
+    def _evict(self, keep):
+        conn = self._conn()
+        evicted = conn.execute("DELETE FROM llm_responses WHERE created_at < ?",
+                               (time.time() - self.ttl,)).rowcount
+
+        total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+        if total_size > self.max_bytes:
+            rows = conn.execute("SELECT key, size FROM llm_responses ORDER BY last_access").fetchall()
+            for key, size in rows:
+                if total_size <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                total_size -= size
+                evicted += 1
+
+        if evicted:
+            self.evictions += evicted
+            logger.info(f"Evicted {evicted} responses from LLM cache")
+
+    def clear(self):
+        self._conn().execute("DELETE FROM llm_responses")
+
+    def stats(self):
+        count, size = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses").fetchone()
+        return {'path': self.path, 'entries': count, 'bytes': size,
+                'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+
+class LLMCache:
+    """
+    Two-tier cache of model responses keyed by cache_key(): an in-process
+    LRU in front of the shared DiskTier. Disk hits are promoted to memory.
+    Only successful responses are stored.
+    """
+
+    def __init__(self, enabled=LLM_CACHE, memory_items=LLM_CACHE_MEMORY_ITEMS,
+                 path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL_SECONDS, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.enabled = enabled
+        self.memory_items = memory_items
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (value, created_at)
+        self.disk = None
+        if enabled and path:
+            try:
+                self.disk = DiskTier(path, ttl, max_bytes)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache disk tier unavailable ({str(e)}), using memory only")
+
+        # kind -> {'memory_hits', 'disk_hits', 'misses', 'bypassed', 'stores'}
+        self.metrics = {}
+
+    def _count(self, kind, metric):
+        with self._lock:
+            counts = self.metrics.setdefault(
+                kind, {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'bypassed': 0, 'stores': 0})
+            counts[metric] += 1
+
+    def get(self, key, kind):
+        """Cached response for key, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.ttl:
+                    self._memory.move_to_end(key)
+                else:
+                    del self._memory[key]
+                    entry = None
+        if entry is not None:
+            self._count(kind, 'memory_hits')
+            return entry[0]
+
+        if self.disk is not None:
+            try:
+                entry = self.disk.get(key)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache read failed: {str(e)}")
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+                self._count(kind, 'disk_hits')
+                return entry[0]
+
+        self._count(kind, 'misses')
+        return None
+
+    def put(self, key, kind, value):
+        entry = (value, time.time())
+        self._remember(key, entry)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, kind, value, entry[1])
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache write failed: {str(e)}")
+        self._count(kind, 'stores')
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        with self._lock:
+            kinds = {kind: dict(counts) for kind, counts in self.metrics.items()}
+            memory_entries = len(self._memory)
+        for counts in kinds.values():
+            lookups = counts['memory_hits'] + counts['disk_hits'] + counts['misses']
+            counts['hit_rate'] = round((counts['memory_hits'] + counts['disk_hits']) / lookups, 3) if lookups else None
+        hits = sum(counts['memory_hits'] + counts['disk_hits'] for counts in kinds.values())
+        lookups = hits + sum(counts['misses'] for counts in kinds.values())
+        return {
+            'enabled': self.enabled,
+            'hit_rate': round(hits / lookups, 3) if lookups else None,
+            'memory': {'entries': memory_entries, 'max_entries': self.memory_items},
+            'disk': self.disk.stats() if self.disk is not None else None,
+            'ttl_seconds': self.ttl,
+            'kinds': kinds,
+        }
+
+
+llm_cache = LLMCache()
+
+
+@contextmanager
+def bypass_cache(bypass=True):
+    """Within the block, cached_completion() skips cache reads (responses are still stored)."""
+    token = _bypass.set(bypass)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def set_cache_bypass(bypass):
+    """Set the bypass flag for the current request; returns a token for reset_cache_bypass()."""
+    return _bypass.set(bypass)
+
+
+def reset_cache_bypass(token):
+    _bypass.reset(token)
+
+
+def cached_completion(client, kind, template_version, refresh=False, **params):
+    """
+    chat.completions.create(**params) through the response cache.
+
+    Args:
+        client (OpenAI): Client to call on a miss
+        kind (str): Name of the calling helper, for the key and metrics
+        template_version (int): Bump when the helper's prompt or the way it
+            reads the response changes, so older responses are not reused
+        refresh (bool): Skip the cache read (the new response is stored)
+        **params: chat.completions.create() arguments
+
+    Returns:
+        str: The response message content
+    """
+    if not llm_cache.enabled:
+        return client.chat.completions.create(**params).choices[0].message.content
+
+    key = cache_key(kind, template_version, params)
+    if refresh or _bypass.get():
+        llm_cache._count(kind, 'bypassed')
+    else:
+        content = llm_cache.get(key, kind)
+        if content is not None:
+            logger.info(f"♻️ LLM cache hit for {kind} ({key[:12]})")
+            return content
+
+    content = client.chat.completions.create(**params).choices[0].message.content
+    if content:
+        llm_cache.put(key, kind, content)
+    return content
+
+
+def cached_completion_stream(client, kind, template_version, refresh=False, **params):
+    """
+    Streaming cached_completion(): yields the response text as it is
+    generated (see stream_completion). A cached response is yielded whole.
+    Only a response streamed to the end is stored, under the same key as
+    cached_completion(), so streamed and blocking calls share entries.
+
+    Args:
+        client (OpenAI): Client to call on a miss
+        kind (str): Name of the calling helper, for the key and metrics
+        template_version (int): As for cached_completion()
+        refresh (bool): Skip the cache read (the new response is stored)
+        **params: chat.completions.create() arguments (without stream)
+
+    Yields:
+        str: Pieces of the response message content
+    """
+    if not llm_cache.enabled:
+        yield from stream_completion(client, **params)
+        return
+
+    key = cache_key(kind, template_version, params)
+    if refresh or _bypass.get():
+        llm_cache._count(kind, 'bypassed')
+    else:
+        content = llm_cache.get(key, kind)
+        if content is not None:
+            logger.info(f"♻️ LLM cache hit for {kind} ({key[:12]})")
+            yield content
+            return
+
+    parts = []
+    for text in stream_completion(client, **params):
+        parts.append(text)
+        yield text
+    content = ''.join(parts)
+    if content:
+        llm_cache.put(key, kind, content)
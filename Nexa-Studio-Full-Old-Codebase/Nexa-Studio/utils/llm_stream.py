@@ -0,0 +1,53 @@
+import json
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def stream_completion(client, **params):
+    """
+    chat.completions.create(**params) with stream=True, as text fragments.
+
+    Fragments are yielded as the model produces them, so the first one
+    arrives after the model's first-token latency rather than after the
+    whole response. Closing the generator early (e.g. the browser went away)
+    closes the HTTP stream, which stops generation.
+
+    Args:
+        client (OpenAI): Client to call
+        **params: chat.completions.create() arguments (without stream)
+
+    Yields:
+        str: Consecutive pieces of the response message content
+    """
+    stream = client.chat.completions.create(stream=True, **params)
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                yield text
+    finally:
+        # The LangFuse wrapper's stream may not expose close(); it then ends with the response
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()
+
+
+def sse_event(event, data, event_id=None):
+    """
+    One server-sent event with a JSON payload.
+
+    Args:
+        event (str): Event name, e.g. "token"
+        data: JSON-serializable payload
+        event_id (int, optional): Event id, for clients resuming with Last-Event-ID
+
+    Returns:
+        str: The event, terminated by a blank line
+    """
+    event_line = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{event_line}event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
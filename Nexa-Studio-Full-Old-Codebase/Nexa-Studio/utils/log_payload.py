@@ -0,0 +1,126 @@
+import json
+import zlib
+import logging
+
+# Characters of a string shown in its summary
+PREVIEW_CHARS = 80
+# Keys of a dict listed in its summary
+SUMMARY_KEYS = 8
+
+
+class _Fingerprint:
+    """Running CRC-32 of a payload's text; a log fingerprint, not a secure hash."""
+
+    def __init__(self):
+        self.crc = 0
+
+    def update(self, text):
+        self.crc = zlib.crc32(text.encode('utf-8', 'replace'), self.crc)
+
+    def hexdigest(self):
+        return f"{self.crc:08x}"
+
+
+def _walk(value, fingerprint):
+    """Feed value into fingerprint and return its approximate JSON size in bytes."""
+    if isinstance(value, dict):
+        size = 2
+        for key, item in value.items():
+            key = str(key)
+            fingerprint.update(key)
+            size += len(key) + 4 + _walk(item, fingerprint)
+        return size
+    if isinstance(value, (list, tuple)):
+        size = 2
+        for item in value:
+            size += 1 + _walk(item, fingerprint)
+        return size
+    text = value if isinstance(value, str) else str(value)
+    fingerprint.update(text)
+    return len(text) + 2 if isinstance(value, str) else len(text)
+
+
+def preview(text, limit=PREVIEW_CHARS):
+    """First limit characters of text on one line, with the total length if cut."""
+    text = str(text)
+    if len(text) <= limit:
+        return text.replace('\n', ' ')
+    return f"{text[:limit].replace(chr(10), ' ')}… ({len(text)} chars)"
+
+
+def summarize(value):
+    """
+    One-line description of a payload: shape, approximate serialized size and
+    a CRC-32 content fingerprint (differing fingerprints mean differing
+    payloads). Costs one pass over the value and no JSON serialization.
+
+    Args:
+        value: Any JSON-like value (session dicts, model responses, ...)
+
+    Returns:
+        str: e.g. "dict 6 keys [badge, basic, ...] ~2.4 MB #3f9a1c0e"
+    """
+    fingerprint = _Fingerprint()
+    size = _walk(value, fingerprint)
+    if size >= 1024 * 1024:
+        size_text = f"~{size / (1024 * 1024):.1f} MB"
+    elif size >= 1024:
+        size_text = f"~{size / 1024:.1f} KB"
+    else:
+        size_text = f"~{size} B"
+
+    if isinstance(value, dict):
+        keys = [str(key) for key in list(value)[:SUMMARY_KEYS]]
+        if len(value) > SUMMARY_KEYS:
+            keys.append('...')
+        shape = f"dict {len(value)} keys [{', '.join(keys)}]"
+    elif isinstance(value, (list, tuple)):
+        shape = f"list {len(value)} items"
+    elif isinstance(value, str):
+        shape = f"'{preview(value, 40)}'"
+    else:
+        shape = type(value).__name__
+    return f"{shape} {size_text} #{fingerprint.hexdigest()}"
+
+
+class _Summary:
+    """Deferred summarize(), only computed if the record is emitted."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return summarize(self.value)
+
+
+class _Dump:
+    """Deferred pretty-printed JSON dump, only computed if the record is emitted."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        if isinstance(self.value, str):
+            return self.value
+        return json.dumps(self.value, indent=2, default=str)
+
+
+def log_payload(logger, label, value, level=logging.INFO):
+    """
+    Log a possibly large payload (a session, a model response) without
+    paying for it on every request.
+
+    At level the record carries summarize(value); the full pretty-printed dump
+    is only built, and logged at DEBUG, when DEBUG is enabled for this logger
+    (e.g. logging.getLogger('app').setLevel(logging.DEBUG)).
+
+    Args:
+        logger (logging.Logger): Logger of the calling module
+        label (str): What the payload is, e.g. "📊 Session data"
+        value: The payload
+        level (int): Level of the summary record
+    """
+    if level > logging.DEBUG and logger.isEnabledFor(level):
+        logger.log(level, "%s: %s", label, _Summary(value))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s (full): %s", label, _Dump(value))
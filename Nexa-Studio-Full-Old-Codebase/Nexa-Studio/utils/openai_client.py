@@ -0,0 +1,110 @@
+import os
+import atexit
+import logging
+import threading
+
+import httpx
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 1 routes every call through the LangFuse-wrapped client (automatic tracing)
+OPENAI_TRACING = os.environ.get("OPENAI_TRACING", "1") != "0"
+# Optional API endpoint override, e.g. a proxy or a local mock server
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL") or None
+# Default per-request timeouts (seconds); calls can pass their own
+OPENAI_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", "120"))
+OPENAI_CONNECT_TIMEOUT = float(os.environ.get("OPENAI_CONNECT_TIMEOUT", "10"))
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "2"))
+# Keep-alive pool shared by every call in the process
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE = int(os.environ.get("OPENAI_MAX_KEEPALIVE", "10"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", "60"))
+
+# Per-call timeouts by kind of request
+TIMEOUT_CHAT = float(os.environ.get("OPENAI_TIMEOUT_CHAT", "90"))
+TIMEOUT_VISION = float(os.environ.get("OPENAI_TIMEOUT_VISION", "120"))
+TIMEOUT_ASSISTANT_STEP = float(os.environ.get("OPENAI_TIMEOUT_ASSISTANT_STEP", "30"))
+
+_client = None
+_client_key = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+def _client_class():
+    if OPENAI_TRACING:
+        try:
+            from langfuse.openai import OpenAI
+            return OpenAI
+        except ImportError:
+            logger.warning("LangFuse not installed, OpenAI calls will not be traced")
+    from openai import OpenAI
+    return OpenAI
+
+
+def _build_client(api_key):
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS,
+                            max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY),
+        timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+    )
+    client_class = _client_class()
+    logger.info(f"Creating shared OpenAI client ({client_class.__module__}, "
+                f"{OPENAI_MAX_KEEPALIVE} keep-alive connections)")
+    return client_class(api_key=api_key,
+                        base_url=OPENAI_BASE_URL,
+                        max_retries=OPENAI_MAX_RETRIES,
+                        timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+                        http_client=http_client)
+
+
+def get_openai_client(timeout=None, api_key=None):
+    """
+    Process-wide OpenAI client over one keep-alive HTTP connection pool.
+
+    Every caller shares the client, so repeated calls reuse warm TLS
+    connections instead of opening a new pool per call. The client is
+    created on first use (after any worker fork) and recreated if the API key
+    changes. Tracing is configured here once via OPENAI_TRACING.
+
+    Args:
+        timeout (float, optional): Request timeout in seconds for the returned
+            handle; the shared pool is unaffected
+        api_key (str, optional): Defaults to OPENAI_API_KEY
+
+    Returns:
+        OpenAI: The shared client (or a with_options() view of it)
+    """
+    global _client, _client_key, _client_pid
+    api_key = api_key or os.environ.get("OPENAI_API_KEY")
+    with _lock:
+        # A pool inherited across fork() shares sockets with the parent
+        if _client is None or _client_key != api_key or _client_pid != os.getpid():
+            if _client is not None and _client_pid == os.getpid():
+                _client.close()
+            _client = _build_client(api_key)
+            _client_key = api_key
+            _client_pid = os.getpid()
+        client = _client
+
+    if timeout is not None:
+        return client.with_options(timeout=httpx.Timeout(timeout, connect=OPENAI_CONNECT_TIMEOUT))
+    return client
+
+
+def close_openai_client():
+    """Close the shared client's connection pool (at exit)."""
+    global _client
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            try:
+                _client.close()
+            except Exception as e:
+                logger.warning(f"Error closing OpenAI client: {str(e)}")
+        _client = None
+
+
+atexit.register(close_openai_client)
@@ -0,0 +1,179 @@
+import os
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Most stages of one pipeline run in flight at once
+PIPELINE_MAX_WORKERS = int(os.environ.get("PIPELINE_MAX_WORKERS", "4"))
+
+# Marks a stage that has no fallback value
+_REQUIRED = object()
+
+
+class PipelineError(Exception):
+    """A stage without a fallback failed, or was skipped because a dependency failed."""
+
+    def __init__(self, stage, error):
+        super().__init__(f"Stage '{stage}' failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class Stage:
+    """One step of a Pipeline: a function of the results it depends on."""
+
+    def __init__(self, name, func, deps, fallback):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.fallback = fallback
+
+
+class PipelineResult:
+    """Outcome of Pipeline.run(): stage results, errors and timings."""
+
+    def __init__(self, name):
+        self.name = name
+        # stage name -> return value (or its fallback)
+        self.results = {}
+        # stage name -> exception raised by the stage, or PipelineError if skipped
+        self.errors = {}
+        # stage name -> {'start_ms': offset from run start, 'duration_ms': ...}
+        self.timings = {}
+        self.total_ms = 0.0
+
+    def __getitem__(self, stage):
+        return self.results[stage]
+
+    def get(self, stage, default=None):
+        return self.results.get(stage, default)
+
+    def raise_for_error(self, stage):
+        """Raise PipelineError if stage (or one it depends on) failed without a fallback."""
+        if stage not in self.results:
+            error = self.errors.get(stage)
+            if isinstance(error, PipelineError):
+                raise error
+            raise PipelineError(stage, error)
+
+    def summary(self):
+        """e.g. "diagram_to_solution 8.1s [analysis 3.2s, structure 4.6s, stack 4.9s]" """
+        stages = ', '.join(
+            f"{name} {timing['duration_ms'] / 1000:.1f}s{'' if name in self.results else ' ✗'}"
+            for name, timing in self.timings.items())
+        return f"{self.name} {self.total_ms / 1000:.1f}s [{stages}]"
+
+
+class Pipeline:
+    """
+    A small DAG of blocking steps (typically LLM calls) run concurrently
+    wherever their dependencies allow.
+
+    Stages are declared in order and may only depend on run inputs or on
+    earlier stages, so the graph cannot contain cycles. Each stage is called
+    with its dependencies' results as keyword arguments and starts as soon
+    as they are all available. A stage that raises uses its fallback value
+    if it has one; otherwise it and everything downstream is recorded as
+    failed. Pipelines are declared once and run many times.
+
+        pipeline = Pipeline('diagram_to_solution', inputs=['image_url', 'ideation'])
+        pipeline.stage('analysis', analyze, deps=['image_url'])
+        pipeline.stage('structure', structure, deps=['analysis', 'ideation'])
+        pipeline.stage('stack', stack, deps=['analysis', 'ideation'], fallback='')
+        result = pipeline.run(image_url=url, ideation=text)
+    """
+
+    def __init__(self, name, inputs=(), max_workers=PIPELINE_MAX_WORKERS):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.max_workers = max_workers
+        self.stages = {}
+
+    def stage(self, name, func, deps=(), fallback=_REQUIRED):
+        """
+        Add a stage.
+
+        Args:
+            name (str): Stage name, also the keyword its result is passed as
+            func (callable): Called as func(**{dep: result for dep in deps})
+            deps (iterable): Names of inputs or earlier stages
+            fallback: Result to use if func raises; dependents then still run
+
+        Returns:
+            Pipeline: self, so stages can be chained
+        """
+        if name in self.stages or name in self.inputs:
+            raise ValueError(f"Duplicate pipeline stage '{name}'")
+        for dep in deps:
+            if dep not in self.stages and dep not in self.inputs:
+                raise ValueError(f"Stage '{name}' depends on unknown stage or input '{dep}'")
+        self.stages[name] = Stage(name, func, deps, fallback)
+        return self
+
+    def run(self, **inputs):
+        """
+        Run every stage, independent ones concurrently.
+
+        Args:
+            **inputs: A value for each name in inputs
+
+        Returns:
+            PipelineResult: Results, errors and per-stage timings
+        """
+        missing = [name for name in self.inputs if name not in inputs]
+        if missing:
+            raise ValueError(f"Pipeline '{self.name}' missing inputs: {', '.join(missing)}")
+
+        result = PipelineResult(self.name)
+        values = dict(inputs)
+        pending = dict(self.stages)
+        running = {}
+        started = time.perf_counter()
+
+        def call(stage):
+            stage_start = time.perf_counter()
+            try:
+                return stage.func(**{dep: values[dep] for dep in stage.deps})
+            finally:
+                result.timings[stage.name] = {
+                    'start_ms': (stage_start - started) * 1000,
+                    'duration_ms': (time.perf_counter() - stage_start) * 1000,
+                }
+
+        workers = max(1, min(self.max_workers, len(self.stages)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=self.name) as executor:
+            while pending or running:
+                # Skip stages downstream of a failure, start those now ready
+                for name, stage in list(pending.items()):
+                    failed = next((dep for dep in stage.deps if dep not in values and dep in result.errors), None)
+                    if failed is not None:
+                        error = result.errors[failed]
+                        result.errors[name] = error if isinstance(error, PipelineError) else PipelineError(failed, error)
+                        del pending[name]
+                    elif all(dep in values for dep in stage.deps):
+                        # Stages see the caller's context variables (cache bypass, trace)
+                        running[executor.submit(contextvars.copy_context().run, call, stage)] = stage
+                        del pending[name]
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        values[stage.name] = result.results[stage.name] = future.result()
+                    except Exception as e:
+                        logger.error(f"❌ {self.name}: stage '{stage.name}' failed: {str(e)}")
+                        result.errors[stage.name] = e
+                        if stage.fallback is not _REQUIRED:
+                            values[stage.name] = result.results[stage.name] = stage.fallback
+
+        result.total_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"⏱️ {result.summary()}")
+        return result
@@ -0,0 +1,550 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Which backend holds the editing sessions:
+#   memory - per-process dict (single worker)
+#   sqlite - shared file, so several gunicorn workers can serve one port
+SESSION_STORE_BACKEND = os.environ.get("SESSION_STORE_BACKEND", "memory")
+SESSION_STORE_PATH = os.environ.get(
+    "SESSION_STORE_PATH", os.path.join(tempfile.gettempdir(), "nexa-sessions.sqlite3"))
+
+# Sessions untouched for this long are dropped
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", str(6 * 60 * 60)))
+# Most sessions kept per kind (solution, sow, ...); least recently used go first
+SESSION_MAX_ENTRIES = int(os.environ.get("SESSION_MAX_ENTRIES", "500"))
+# Serialized size budget across all kinds; least recently used go first
+SESSION_MEMORY_BUDGET_BYTES = int(os.environ.get("SESSION_MEMORY_BUDGET_BYTES", str(256 * 1024 * 1024)))
+# How long a request waits for another request editing the same session
+SESSION_LOCK_TIMEOUT = float(os.environ.get("SESSION_LOCK_TIMEOUT", "30"))
+# A lock held longer than this (e.g. by a killed worker) is considered stale
+SESSION_LOCK_LEASE = float(os.environ.get("SESSION_LOCK_LEASE", "300"))
+
+
+class SessionLocked(TimeoutError):
+    """Another request kept a session locked for longer than SESSION_LOCK_TIMEOUT."""
+
+
+def estimate_size(value):
+    """Approximate memory footprint of a session as its serialized length."""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class MemoryBackend:
+    """
+    In-process backend: one LRU across all session kinds, bounded by TTL,
+    entries per kind and total serialized size. Values are stored by
+    reference, so in-place edits are visible immediately.
+    """
+
+    def __init__(self, ttl=SESSION_TTL_SECONDS, max_entries=SESSION_MAX_ENTRIES,
+                 budget_bytes=SESSION_MEMORY_BUDGET_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (namespace, session_id) -> [value, size, last_access]
+        self._counts = {}
+        self._total_size = 0
+        # (namespace, session_id) -> [lock, requests holding or waiting for it];
+        # an entry is removed only when that count drops to zero
+        self._session_locks = {}
+        self._lock_owners = {}  # (namespace, session_id) -> thread holding its lock
+        self.evictions = 0
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._total_size -= size
+        self._counts[key[0]] -= 1
+
+    def _evict(self, keep):
+        now = time.time()
+        while self._entries:
+            key, (_, _, last_access) = next(iter(self._entries.items()))
+            # The session just written stays even if it alone exceeds the budget
+            if key == keep or (now - last_access <= self.ttl and self._total_size <= self.budget_bytes):
+                break
+            self._drop(key)
+            self.evictions += 1
+            logger.info(f"Evicted {key[0]} session {key[1]} from session store")
+
+    def _evict_namespace(self, namespace):
+        if self._counts.get(namespace, 0) <= self.max_entries:
+            return
+        for key in list(self._entries):
+            if key[0] == namespace:
+                self._drop(key)
+                self.evictions += 1
+                logger.info(f"Evicted {namespace} session {key[1]} from session store (entry limit)")
+                if self._counts[namespace] <= self.max_entries:
+                    break
+
+    def load(self, namespace, session_id):
+        key = (namespace, session_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[2] > self.ttl:
+                self._drop(key)
+                self.evictions += 1
+                return None
+            entry[2] = time.time()
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def load_for_edit(self, namespace, session_id):
+        """load(), plus a token for save_if_changed() (unused: values are shared by reference)."""
+        return self.load(namespace, session_id), None
+
+    def save_if_changed(self, namespace, session_id, value, token):
+        """Nothing to do: in-place edits of a stored value are already visible."""
+
+    def save(self, namespace, session_id, value):
+        key = (namespace, session_id)
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = [value, size, time.time()]
+            self._counts[namespace] = self._counts.get(namespace, 0) + 1
+            self._total_size += size
+            self._evict_namespace(namespace)
+            self._evict(keep=key)
+
+    def delete(self, namespace, session_id):
+        with self._lock:
+            if (namespace, session_id) in self._entries:
+                self._drop((namespace, session_id))
+
+    def keys(self, namespace):
+        now = time.time()
+        with self._lock:
+            return [key[1] for key, entry in self._entries.items()
+                    if key[0] == namespace and now - entry[2] <= self.ttl]
+
+    def acquire(self, namespace, session_id, timeout):
+        key = (namespace, session_id)
+        with self._lock:
+            entry = self._session_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        if not entry[0].acquire(timeout=timeout):
+            with self._lock:
+                self._unref_lock(key)
+            return False
+        with self._lock:
+            self._lock_owners[key] = threading.get_ident()
+        return True
+
+    def _unref_lock(self, key):
+        """Drop one holder/waiter of a session lock, removing the lock with the last (lock held)."""
+        entry = self._session_locks[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._session_locks[key]
+
+    def release(self, namespace, session_id):
+        key = (namespace, session_id)
+        with self._lock:
+            # Only the thread holding the lock may release it
+            if self._lock_owners.get(key) != threading.get_ident():
+                return
+            del self._lock_owners[key]
+            self._session_locks[key][0].release()
+            self._unref_lock(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'sessions': dict(self._counts),
+                'bytes': self._total_size,
+                'budget_bytes': self.budget_bytes,
+                'evictions': self.evictions,
+            }
+
+
+class SQLiteBackend:
+    """
+    Shared backend in a local SQLite file (WAL mode), so every worker process
+    on the host sees the same sessions. Per-session locks are leases in a
+    table, so they also hold across processes. Values are JSON round-tripped:
+    edits become visible to other workers when the request scope commits.
+    """
+
+    def __init__(self, path=SESSION_STORE_PATH, ttl=SESSION_TTL_SECONDS,
+                 max_entries=SESSION_MAX_ENTRIES, budget_bytes=SESSION_MEMORY_BUDGET_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.budget_bytes = budget_bytes
+        self._local = threading.local()
+        self.evictions = 0
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS editing_sessions (
+                namespace TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, session_id)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS editing_sessions_last_access "
+                     "ON editing_sessions (last_access)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS editing_session_locks (
+                namespace TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (namespace, session_id)
+            )
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=SESSION_LOCK_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _owner(self):
+        return f"{os.getpid()}:{threading.get_ident()}"
+
+    def load(self, namespace, session_id):
+        data = self._load_data(namespace, session_id)
+        return json.loads(data) if data is not None else None
+
+    def _load_data(self, namespace, session_id):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT data, last_access FROM editing_sessions WHERE namespace = ? AND session_id = ?",
+            (namespace, session_id)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > self.ttl:
+            self.delete(namespace, session_id)
+            self.evictions += 1
+            return None
+        conn.execute(
+            "UPDATE editing_sessions SET last_access = ? WHERE namespace = ? AND session_id = ?",
+            (now, namespace, session_id))
+        return row[0]
+
+    def load_for_edit(self, namespace, session_id):
+        """load(), plus the stored JSON as the token save_if_changed() compares against."""
+        data = self._load_data(namespace, session_id)
+        return (json.loads(data), data) if data is not None else (None, None)
+
+    def save_if_changed(self, namespace, session_id, value, token):
+        """Write back a value from load_for_edit() unless it still serializes to what was read."""
+        data = json.dumps(value, default=str)
+        if data != token:
+            self.save(namespace, session_id, value, data)
+
+    def save(self, namespace, session_id, value, data=None):
+        if data is None:
+            data = json.dumps(value, default=str)
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO editing_sessions (namespace, session_id, data, size, last_access) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (namespace, session_id, data, len(data), time.time()))
+        self._evict(namespace, session_id)
+
+    def _evict(self, namespace, session_id):
+        conn = self._conn()
+        evicted = conn.execute("DELETE FROM editing_sessions WHERE last_access < ?",
+                               (time.time() - self.ttl,)).rowcount
+
+        evicted += conn.execute("""
+            DELETE FROM editing_sessions WHERE namespace = ? AND session_id IN (
+                SELECT session_id FROM editing_sessions WHERE namespace = ?
+                ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        """, (namespace, namespace, self.max_entries)).rowcount
+
+        total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM editing_sessions").fetchone()[0]
+        if total_size > self.budget_bytes:
+            rows = conn.execute("SELECT namespace, session_id, size FROM editing_sessions "
+                                "ORDER BY last_access").fetchall()
+            for row_namespace, row_session_id, size in rows:
+                if total_size <= self.budget_bytes:
+                    break
+                # The session just written stays even if it alone exceeds the budget
+                if (row_namespace, row_session_id) == (namespace, session_id):
+                    continue
+                conn.execute("DELETE FROM editing_sessions WHERE namespace = ? AND session_id = ?",
+                             (row_namespace, row_session_id))
+                total_size -= size
+                evicted += 1
+
+        if evicted:
+            self.evictions += evicted
+            logger.info(f"Evicted {evicted} sessions from session store")
+
+    def delete(self, namespace, session_id):
+        self._conn().execute("DELETE FROM editing_sessions WHERE namespace = ? AND session_id = ?",
+                             (namespace, session_id))
+
+    def keys(self, namespace):
+        rows = self._conn().execute(
+            "SELECT session_id FROM editing_sessions WHERE namespace = ? AND last_access >= ? "
+            "ORDER BY last_access",
+            (namespace, time.time() - self.ttl)).fetchall()
+        return [row[0] for row in rows]
+
+    def acquire(self, namespace, session_id, timeout):
+        conn = self._conn()
+        owner = self._owner()
+        deadline = time.time() + timeout
+        while True:
+            now = time.time()
+            claimed = conn.execute("""
+                INSERT INTO editing_session_locks (namespace, session_id, owner, expires_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (namespace, session_id) DO UPDATE
+                SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE editing_session_locks.expires_at < ?
+            """, (namespace, session_id, owner, now + SESSION_LOCK_LEASE, now)).rowcount
+            if claimed:
+                return True
+            if now >= deadline:
+                return False
+            time.sleep(0.02)
+
+    def release(self, namespace, session_id):
+        self._conn().execute(
+            "DELETE FROM editing_session_locks WHERE namespace = ? AND session_id = ? AND owner = ?",
+            (namespace, session_id, self._owner()))
+
+    def stats(self):
+        rows = self._conn().execute(
+            "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM editing_sessions GROUP BY namespace"
+        ).fetchall()
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'sessions': {row[0]: row[1] for row in rows},
+            'bytes': sum(row[2] for row in rows),
+            'budget_bytes': self.budget_bytes,
+            'evictions': self.evictions,
+        }
+
+
+def create_backend(kind=SESSION_STORE_BACKEND):
+    """Build the session backend selected by SESSION_STORE_BACKEND."""
+    if kind == "sqlite":
+        logger.info(f"Session store: SQLite at {SESSION_STORE_PATH}")
+        return SQLiteBackend()
+    if kind != "memory":
+        logger.warning(f"Unknown SESSION_STORE_BACKEND '{kind}', using in-process memory")
+    logger.info("Session store: in-process memory")
+    return MemoryBackend()
+
+
+# Sessions checked out by the current request (see begin_request/end_request)
+_scope = threading.local()
+
+
+class _CheckedOut:
+    """A session locked by the current request scope, and how to write it back."""
+
+    __slots__ = ('store', 'session_id', 'value', 'token', 'dirty')
+
+    def __init__(self, store, session_id, value, token):
+        self.store = store
+        self.session_id = session_id
+        self.value = value
+        self.token = token    # backend's change-detection token from load_for_edit()
+        self.dirty = False    # replaced or marked edited: always written back
+
+
+def begin_request():
+    """Open a request scope: sessions touched from here on stay locked and cached until end_request()."""
+    _scope.checked_out = {}
+    _scope.lock_timeout = None
+
+
+def end_request():
+    """
+    Write back the sessions edited in this request scope and release the
+    locks it holds. A session marked dirty (assigned, or passed to
+    mark_dirty()) is saved; one that was only read is saved only if the
+    backend sees it changed in place (never for the memory backend).
+    """
+    checked_out = getattr(_scope, 'checked_out', None)
+    _scope.checked_out = None
+    if not checked_out:
+        return
+    for entry in checked_out.values():
+        store = entry.store
+        try:
+            if entry.value is None:
+                pass
+            elif entry.dirty:
+                store.backend.save(store.namespace, entry.session_id, entry.value)
+            else:
+                store.backend.save_if_changed(store.namespace, entry.session_id, entry.value, entry.token)
+        except Exception as e:
+            logger.error(f"Failed to write back {store.namespace} session {entry.session_id}: {str(e)}")
+        finally:
+            store.backend.release(store.namespace, entry.session_id)
+
+
+def mark_dirty(namespace, session_id):
+    """Make the current request scope write back a session it edited in place."""
+    checked_out = getattr(_scope, 'checked_out', None)
+    entry = checked_out.get((namespace, session_id)) if checked_out else None
+    if entry is not None:
+        entry.dirty = True
+
+
+def lock_timed_out():
+    """The SessionLocked raised in the current request scope, if any (so the app can answer 503)."""
+    return getattr(_scope, 'lock_timeout', None)
+
+
+@contextmanager
+def request_scope():
+    """
+    begin_request()/end_request() around a block, for work done outside the
+    request's own scope (e.g. after a streamed response has started). Joins
+    the scope already open on this thread, if any.
+    """
+    if getattr(_scope, 'checked_out', None) is not None:
+        yield
+        return
+    begin_request()
+    try:
+        yield
+    finally:
+        end_request()
+
+
+class SessionStore(MutableMapping):
+    """
+    Dict-like view of one kind of editing session (solution, sow, ...).
+
+    Inside a request scope the first access to a session takes its lock
+    (raising SessionLocked if another request keeps it past
+    SESSION_LOCK_TIMEOUT) and loads it; later accesses in the same request
+    reuse that object, and edits are written back and the lock released
+    when the scope ends (see end_request). Outside a scope every operation
+    goes straight to the backend.
+    """
+
+    def __init__(self, namespace, backend):
+        self.namespace = namespace
+        self.backend = backend
+
+    def _checked_out(self):
+        return getattr(_scope, 'checked_out', None)
+
+    def _checkout(self, session_id):
+        """Lock and load session_id into the request scope; returns the value or None."""
+        checked_out = self._checked_out()
+        key = (self.namespace, session_id)
+        if key in checked_out:
+            return checked_out[key].value
+
+        if not self.backend.acquire(self.namespace, session_id, SESSION_LOCK_TIMEOUT):
+            logger.warning(f"Timed out waiting for {self.namespace} session {session_id} lock")
+            error = SessionLocked(f"{self.namespace} session {session_id} is being edited by another request")
+            _scope.lock_timeout = error
+            raise error
+        try:
+            value, token = self.backend.load_for_edit(self.namespace, session_id)
+        except BaseException:
+            self.backend.release(self.namespace, session_id)
+            raise
+        checked_out[key] = _CheckedOut(self, session_id, value, token)
+        return value
+
+    def __getitem__(self, session_id):
+        if self._checked_out() is None:
+            value = self.backend.load(self.namespace, session_id)
+        else:
+            value = self._checkout(session_id)
+        if value is None:
+            raise KeyError(session_id)
+        return value
+
+    def __contains__(self, session_id):
+        try:
+            self[session_id]
+        except KeyError:
+            return False
+        return True
+
+    def __setitem__(self, session_id, value):
+        checked_out = self._checked_out()
+        if checked_out is None:
+            self.backend.save(self.namespace, session_id, value)
+            return
+        self._checkout(session_id)
+        entry = checked_out[(self.namespace, session_id)]
+        entry.value = value
+        entry.dirty = True
+
+    def __delitem__(self, session_id):
+        if session_id not in self:
+            raise KeyError(session_id)
+        self.backend.delete(self.namespace, session_id)
+        checked_out = self._checked_out()
+        if checked_out is not None:
+            # Keep the lock until the scope ends, but do not write the value back
+            checked_out[(self.namespace, session_id)].value = None
+
+    def __iter__(self):
+        return iter(self.backend.keys(self.namespace))
+
+    def __len__(self):
+        return len(self.backend.keys(self.namespace))
+
+    def snapshot(self, session_id, timeout=SESSION_LOCK_TIMEOUT):
+        """
+        Consistent read of one session for code outside the request editing it
+        (e.g. a background writer). Returns this thread's scope copy if it has
+        the session checked out, otherwise the stored value read under the
+        session lock, so edits of an in-flight request are written back first.
+        Returns None if the session is gone; raises SessionLocked if the lock
+        is not free within timeout.
+        """
+        checked_out = self._checked_out()
+        if checked_out is not None and (self.namespace, session_id) in checked_out:
+            return checked_out[(self.namespace, session_id)].value
+
+        if not self.backend.acquire(self.namespace, session_id, timeout):
+            raise SessionLocked(f"{self.namespace} session {session_id} is locked")
+        try:
+            return self.backend.load(self.namespace, session_id)
+        finally:
+            self.backend.release(self.namespace, session_id)
+
+    def items(self):
+        """Read-only snapshot of every live session, without taking their locks."""
+        for session_id in self.backend.keys(self.namespace):
+            value = self.backend.load(self.namespace, session_id)
+            if value is not None:
+                yield session_id, value
@@ -0,0 +1,485 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extras
+from psycopg2 import sql
+
+from utils.json_patch import value_at
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 0 writes every save straight through, as before
+SESSION_WRITE_BEHIND = os.environ.get("SESSION_WRITE_BEHIND", "1") != "0"
+# How often the background writer looks for sessions to persist
+SESSION_FLUSH_INTERVAL = float(os.environ.get("SESSION_FLUSH_INTERVAL", "2"))
+# A dirty session is written once it has gone this long without another edit...
+SESSION_FLUSH_QUIET = float(os.environ.get("SESSION_FLUSH_QUIET", "3"))
+# ...or once it has been dirty this long, whichever comes first
+SESSION_FLUSH_MAX_DELAY = float(os.environ.get("SESSION_FLUSH_MAX_DELAY", "30"))
+# Most rows written by one upsert statement
+SESSION_FLUSH_BATCH = int(os.environ.get("SESSION_FLUSH_BATCH", "100"))
+# How long the writer waits for a request that is still editing a session
+SESSION_FLUSH_LOCK_TIMEOUT = float(os.environ.get("SESSION_FLUSH_LOCK_TIMEOUT", "2"))
+# A session the database keeps rejecting is dropped after this many attempts
+SESSION_FLUSH_MAX_ATTEMPTS = int(os.environ.get("SESSION_FLUSH_MAX_ATTEMPTS", "5"))
+
+# Errors that reject one row's data (bad JSON, a constraint, a bad jsonb path)
+# rather than the connection; only these are isolated and counted per session
+ROW_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError, psycopg2.ProgrammingError,
+              psycopg2.NotSupportedError)
+
+
+class SessionKind:
+    """How one kind of editing session maps onto ai_architecture_sessions."""
+
+    def __init__(self, namespace, store, column, metadata):
+        self.namespace = namespace
+        self.store = store
+        self.column = column
+        # session data -> (title, client) written when the row is first created
+        self.metadata = metadata
+
+
+class PendingWrite:
+    """A dirty session waiting to be written."""
+
+    __slots__ = ('first_dirty', 'last_touched', 'paths', 'row', 'attempts')
+
+    def __init__(self, first_dirty, last_touched, paths, row, attempts=0):
+        self.first_dirty = first_dirty
+        self.last_touched = last_touched
+        self.paths = paths        # changed key paths, or None to write everything
+        self.row = row            # ai_architecture_sessions id, for flush(rows=...)
+        self.attempts = attempts  # writes the database has rejected so far
+
+
+class SessionWriter:
+    """
+    Write-behind persistence of editing sessions to ai_architecture_sessions.
+
+    Routes mark a session dirty instead of writing it. Repeated edits of a
+    dirty session only push its deadline out, and a background thread writes
+    every session that has gone quiet (or waited too long) with one batched
+    INSERT ... ON CONFLICT upsert per session column. Sessions changed only
+    by JSON patches are written with jsonb_set() on the changed paths
+    instead of rewriting the whole document. Row ids are reserved
+    from the table's sequence up front, so a first save is a single write
+    with badge.row already filled in. Pending sessions are flushed at
+    shutdown, and flush() can be called before reading rows back.
+
+    Every statement runs under its own savepoint, and a failed batch is
+    retried row by row, so one session the database rejects does not hold
+    back the others. That session is retried in full on later passes and
+    dropped (with an error logged) after SESSION_FLUSH_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, pool, enabled=SESSION_WRITE_BEHIND, interval=SESSION_FLUSH_INTERVAL,
+                 quiet=SESSION_FLUSH_QUIET, max_delay=SESSION_FLUSH_MAX_DELAY,
+                 batch_size=SESSION_FLUSH_BATCH, lock_timeout=SESSION_FLUSH_LOCK_TIMEOUT,
+                 max_attempts=SESSION_FLUSH_MAX_ATTEMPTS):
+        self.pool = pool
+        self.enabled = enabled
+        self.interval = interval
+        self.quiet = quiet
+        self.max_delay = max_delay
+        self.batch_size = batch_size
+        self.lock_timeout = lock_timeout
+        self.max_attempts = max_attempts
+
+        self._kinds = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # (namespace, session_id) -> PendingWrite
+        self._dirty = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.metrics = {
+            'marked': 0,
+            'coalesced': 0,
+            'flushes': 0,
+            'statements': 0,
+            'rows_written': 0,
+            'partial_writes': 0,
+            'bytes_written': 0,
+            'rows_reserved': 0,
+            'failures': 0,
+            'rows_failed': 0,
+            'rows_dropped': 0,
+            'last_flush_ms': 0.0,
+        }
+
+    def register(self, namespace, store, column, metadata):
+        """
+        Persist sessions of a SessionStore namespace into a JSON column.
+        Args:
+            namespace (str): SessionStore namespace, e.g. 'sow'
+            store (SessionStore): The store holding those sessions
+            column (str): ai_architecture_sessions column, e.g. 'sow_objects'
+            metadata (callable): session data -> (title, client) for new rows
+        """
+        self._kinds[namespace] = SessionKind(namespace, store, column, metadata)
+
+    def reserve_row(self):
+        """Take the next ai_architecture_sessions id without writing the row yet."""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT nextval(pg_get_serial_sequence('ai_architecture_sessions', 'id'))")
+                row_id = cursor.fetchone()[0]
+        with self._lock:
+            self.metrics['rows_reserved'] += 1
+        return row_id
+
+    def save(self, namespace, session_id, session_data):
+        """
+        Queue a session for persistence, giving it a row first if it has none.
+        Args:
+            namespace (str): Registered namespace
+            session_id (str): Session identifier
+            session_data (dict): The session as edited by the current request
+        Returns:
+            int: Database row id of the session
+        """
+        badge = session_data.setdefault('badge', {})
+        row_id = badge.get('row', 0) or 0
+        if row_id <= 0:
+            row_id = self.reserve_row()
+            badge['row'] = row_id
+            logger.info(f"🆕 Reserved row {row_id} for {namespace} session {session_id}")
+        self.mark_dirty(namespace, session_id, session_data)
+        return row_id
+
+    def mark_dirty(self, namespace, session_id, session_data, paths=None):
+        """
+        Note that a session changed. With write-behind off the session is
+        written immediately from session_data; otherwise its current value is
+        read back from the store when it is flushed.
+        Args:
+            paths (set): Key paths that changed (see json_patch.changed_paths),
+                or None if any part of the session may have changed
+        """
+        if not self.enabled:
+            self._write([((namespace, session_id), self._kinds[namespace], session_id, session_data, paths)])
+            return
+
+        now = time.time()
+        key = (namespace, session_id)
+        row = session_data.get('badge', {}).get('row', 0) or 0
+        with self._lock:
+            self.metrics['marked'] += 1
+            entry = self._dirty.get(key)
+            if entry is None:
+                self._dirty[key] = PendingWrite(now, now, set(paths) if paths is not None else None, row)
+            else:
+                entry.last_touched = now
+                entry.paths = _merge_paths(entry.paths, paths)
+                entry.row = row or entry.row
+                self.metrics['coalesced'] += 1
+
+    def discard(self, namespace, session_id):
+        """Forget pending writes of a session (e.g. when it is deleted)."""
+        with self._lock:
+            self._dirty.pop((namespace, session_id), None)
+
+    def _take(self, due_only, rows):
+        now = time.time()
+        with self._lock:
+            keys = [key for key, entry in self._dirty.items()
+                    if (rows is None or entry.row in rows)
+                    and (not due_only
+                         or now - entry.last_touched >= self.quiet
+                         or now - entry.first_dirty >= self.max_delay)]
+            return {key: self._dirty.pop(key) for key in keys}
+
+    def _requeue(self, taken):
+        with self._lock:
+            for key, pending in taken.items():
+                entry = self._dirty.get(key)
+                if entry is None:
+                    self._dirty[key] = pending
+                else:
+                    entry.first_dirty = min(entry.first_dirty, pending.first_dirty)
+                    entry.paths = _merge_paths(entry.paths, pending.paths)
+                    entry.attempts = max(entry.attempts, pending.attempts)
+
+    def flush(self, due_only=False, rows=None, wait_for_locks=True):
+        """
+        Write pending sessions now.
+        Args:
+            due_only (bool): Only those past their quiet period or max delay
+            rows (iterable): Only sessions saved to these ai_architecture_sessions
+                ids, e.g. the row a request is about to read back
+            wait_for_locks (bool): False skips sessions a request is editing
+                instead of waiting up to lock_timeout for each
+        Returns:
+            int: Number of rows written
+        """
+        if rows is not None:
+            rows = {_row_id(row) for row in rows}
+        with self._flush_lock:
+            taken = self._take(due_only, rows)
+            if not taken:
+                return 0
+
+            started = time.perf_counter()
+            entries = []
+            retry = {}
+            for key, pending in taken.items():
+                namespace, session_id = key
+                kind = self._kinds.get(namespace)
+                if kind is None:
+                    continue
+                try:
+                    value = kind.store.snapshot(session_id,
+                                                timeout=self.lock_timeout if wait_for_locks else 0)
+                except TimeoutError:
+                    # Still being edited; pick it up on the next pass
+                    retry[key] = pending
+                    continue
+                if value is None:
+                    logger.info(f"{namespace} session {session_id} expired before it was written")
+                    continue
+                entries.append((key, kind, session_id, value, pending.paths))
+
+            written = 0
+            try:
+                written, failed = self._write(entries)
+            except Exception as e:
+                # The database could not be reached at all: keep everything for
+                # the next pass, without counting it against the sessions
+                with self._lock:
+                    self.metrics['failures'] += 1
+                logger.error(f"💥 Write-behind flush of {len(entries)} sessions failed: {str(e)}")
+                retry.update(taken)
+                failed = set()
+
+            for key in failed:
+                pending = taken[key]
+                pending.attempts += 1
+                if pending.attempts >= self.max_attempts:
+                    logger.error(f"💥 Dropping {key[0]} session {key[1]} (row {pending.row}): "
+                                 f"the database rejected it {pending.attempts} times")
+                    with self._lock:
+                        self.metrics['rows_dropped'] += 1
+                    continue
+                # Retry as a full write, in case the partial update was what failed
+                pending.paths = None
+                retry[key] = pending
+
+            if retry:
+                self._requeue(retry)
+            with self._lock:
+                self.metrics['flushes'] += 1
+                self.metrics['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            return written
+
+    def _write(self, entries):
+        """
+        Persist (key, kind, session_id, value, paths) entries: partial entries
+        as jsonb_set() updates, the rest as upserts, one statement per column
+        and batch. A partial update that finds no row is upserted in full.
+        Each statement runs under a savepoint; a batch that fails is retried
+        one row at a time to find the rows the database rejects.
+        Returns:
+            tuple: (rows written, set of keys that failed)
+        """
+        failed = set()
+        by_column = {}
+        partial = []
+        for key, kind, session_id, value, paths in entries:
+            row_id = value.get('badge', {}).get('row', 0) or 0
+            if row_id <= 0:
+                logger.warning(f"⚠️ {kind.namespace} session {session_id} has no row, not written")
+                continue
+            if paths is not None:
+                partial.append((key, kind, row_id, value, paths))
+                continue
+            try:
+                row = self._upsert_row(kind, row_id, value)
+            except (TypeError, ValueError) as e:
+                logger.error(f"💥 {kind.namespace} session {session_id} cannot be serialized: {str(e)}")
+                failed.add(key)
+                continue
+            # Two sessions on one row would make the upsert touch it twice;
+            # the later entry is the more recently edited one
+            by_column.setdefault(kind.column, {})[row_id] = (key, row)
+
+        if not by_column and not partial:
+            return 0, failed
+
+        written = 0
+        payload_bytes = 0
+        statements = 0
+        partial_writes = 0
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                for key, kind, row_id, value, paths in partial:
+                    try:
+                        query, params = _partial_update(kind.column, row_id, value, paths)
+                        with _savepoint(cursor):
+                            cursor.execute(query, params)
+                        rowcount = cursor.rowcount
+                    except (TypeError, ValueError) + ROW_ERRORS as e:
+                        self._row_failed(failed, key, row_id, e)
+                        continue
+                    statements += 1
+                    if rowcount:
+                        written += 1
+                        partial_writes += 1
+                        payload_bytes += sum(len(param) for param in params if isinstance(param, str))
+                    else:
+                        try:
+                            row = self._upsert_row(kind, row_id, value)
+                        except (TypeError, ValueError) as e:
+                            logger.error(f"💥 {kind.namespace} session {key[1]} cannot be serialized: {str(e)}")
+                            failed.add(key)
+                            continue
+                        by_column.setdefault(kind.column, {}).setdefault(row_id, (key, row))
+
+                for column, rows in by_column.items():
+                    query = sql.SQL("""
+                        INSERT INTO ai_architecture_sessions (id, title, client, {column})
+                        VALUES %s
+                        ON CONFLICT (id) DO UPDATE SET {column} = EXCLUDED.{column}
+                    """).format(column=sql.Identifier(column)).as_string(cursor)
+                    rows = list(rows.values())
+                    for start in range(0, len(rows), self.batch_size):
+                        batch = rows[start:start + self.batch_size]
+                        try:
+                            self._upsert(cursor, query, batch)
+                            statements += 1
+                            done = batch
+                        except ROW_ERRORS as e:
+                            statements += 1
+                            # Isolate the rows the database rejects; the rest are written
+                            done = []
+                            if len(batch) > 1:
+                                logger.warning(f"⚠️ Upsert of {len(batch)} sessions failed ({str(e).strip()}), "
+                                               f"writing them one by one")
+                                for key, row in batch:
+                                    try:
+                                        self._upsert(cursor, query, [(key, row)])
+                                        done.append((key, row))
+                                    except ROW_ERRORS as row_error:
+                                        self._row_failed(failed, key, row[0], row_error)
+                                    statements += 1
+                            else:
+                                self._row_failed(failed, batch[0][0], batch[0][1][0], e)
+                        written += len(done)
+                        payload_bytes += sum(len(row[3]) for _, row in done)
+
+        with self._lock:
+            self.metrics['statements'] += statements
+            self.metrics['rows_written'] += written
+            self.metrics['rows_failed'] += len(failed)
+            self.metrics['partial_writes'] += partial_writes
+            self.metrics['bytes_written'] += payload_bytes
+        logger.info(f"💾 Wrote {written} sessions to the database in {statements} statements"
+                    + (f", {len(failed)} failed" if failed else ""))
+        return written, failed
+
+    def _row_failed(self, failed, key, row_id, error):
+        logger.error(f"💥 Write of {key[0]} session {key[1]} (row {row_id}) failed: {str(error).strip()}")
+        failed.add(key)
+
+    def _upsert(self, cursor, query, batch):
+        """Upsert (key, row) pairs with one statement, under a savepoint."""
+        with _savepoint(cursor):
+            psycopg2.extras.execute_values(cursor, query, [row for _, row in batch], page_size=len(batch))
+
+    def _upsert_row(self, kind, row_id, value):
+        title, client = kind.metadata(value)
+        return (row_id, title, client, json.dumps(value))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush(due_only=True)
+            except Exception as e:
+                logger.error(f"💥 Write-behind flusher error: {str(e)}")
+
+    def start(self):
+        """Start the background flusher (no-op when write-behind is off)."""
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='session-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and write everything still pending (e.g. at shutdown)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + self.lock_timeout + 5)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"💥 Final write-behind flush failed: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.metrics,
+                'enabled': self.enabled,
+                'pending': len(self._dirty),
+            }
+
+
+def _row_id(row):
+    """Row id as stored in badge.row; ids from a URL or JSON body may be strings."""
+    try:
+        return int(row)
+    except (TypeError, ValueError):
+        return None
+
+
+@contextmanager
+def _savepoint(cursor):
+    """
+    Run the block under a savepoint, so that if it fails only its own
+    changes are rolled back and the transaction can go on.
+    """
+    cursor.execute("SAVEPOINT session_write")
+    try:
+        yield
+    except Exception:
+        cursor.execute("ROLLBACK TO SAVEPOINT session_write")
+        raise
+    cursor.execute("RELEASE SAVEPOINT session_write")
+
+
+def _merge_paths(paths, more):
+    """Union of two changed-path sets, where None (everything changed) wins."""
+    if paths is None or more is None:
+        return None
+    return paths | set(more)
+
+
+def _partial_update(column, row_id, value, paths):
+    """
+    UPDATE rewriting only the given key paths of a session column.
+    Returns:
+        tuple: (query, params)
+    """
+    expression = sql.SQL("COALESCE({}, '{{}}'::jsonb)").format(sql.Identifier(column))
+    params = []
+    # Parents before children, so a path created here exists for the next one
+    for path in sorted(paths, key=len):
+        present, current = value_at(value, path)
+        if present:
+            expression = sql.SQL("jsonb_set({}, %s::text[], %s::jsonb, true)").format(expression)
+            params.extend([list(path), json.dumps(current)])
+        else:
+            expression = sql.SQL("({} #- %s::text[])").format(expression)
+            params.append(list(path))
+    query = sql.SQL("UPDATE ai_architecture_sessions SET {} = {} WHERE id = %s").format(
+        sql.Identifier(column), expression)
+    return query, params + [row_id]
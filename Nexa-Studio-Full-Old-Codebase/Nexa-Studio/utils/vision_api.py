@@ -4,7 +4,12 @@ os.environ["LD_LIBRARY_PATH"] = os.getcwd()
 from weasyprint import HTML
 import logging
 import base64
-from langfuse.openai import OpenAI
+from utils.openai_client import get_openai_client, TIMEOUT_CHAT, TIMEOUT_VISION, TIMEOUT_ASSISTANT_STEP
+
+from utils.log_payload import preview
+from utils.llm_cache import cached_completion, cached_completion_stream
+from utils.llm_stream import stream_completion
+from utils.assistant_runner import run_assistant, AssistantRunError, AssistantRunTimeout, AssistantRunCancelled
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -26,13 +31,13 @@ def analyze_image_with_vision_api(image_url=None, image_data=None):
             logger.error("OPENAI_API_KEY environment variable not found")
             return "Error: OpenAI API key not configured"
 
-        # Initialize LangFuse-wrapped OpenAI client
-        client = OpenAI(api_key=api_key)
+        # Shared keep-alive client (tracing configured in utils.openai_client)
+        client = get_openai_client(timeout=TIMEOUT_VISION)
 
         # Determine content based on what was provided
         if image_url:
             # URL-based content
-            logger.info(f"Analyzing image URL with OpenAI Vision: {image_url}")
+            logger.info(f"Analyzing image URL with OpenAI Vision: {preview(image_url)}")
             content = [{
                 "type":
                 "text",
@@ -65,14 +70,14 @@ def analyze_image_with_vision_api(image_url=None, image_data=None):
 
         # Make the API request using OpenAI SDK with LangFuse tracing
         logger.info("Sending API request to OpenAI for image analysis")
-        response = client.chat.completions.create(model="gpt-4o",
-                                                  messages=[{
-                                                      "role": "user",
-                                                      "content": content
-                                                  }],
-                                                  max_tokens=1000)
-
-        analysis = response.choices[0].message.content
+        analysis = cached_completion(client, 'vision_analysis', 1,
+                                     model="gpt-4o",
+                                     messages=[{
+                                         "role": "user",
+                                         "content": content
+                                     }],
+                                     max_tokens=1000)
+
         logger.info("Successfully received analysis from OpenAI Vision API")
         return analysis
 
@@ -81,19 +86,10 @@ def analyze_image_with_vision_api(image_url=None, image_data=None):
         return f"Error analyzing image: {str(e)}"
 
 
-def enhance_text_with_openai(text):
-    """Enhance text using OpenAI with LangFuse tracing."""
-    try:
-        api_key = os.environ.get("OPENAI_API_KEY")
-        if not api_key:
-            logger.error("OPENAI_API_KEY environment variable not found")
-            return "Error: OpenAI API key not configured"
-
-        # Initialize LangFuse-wrapped OpenAI client
-        client = OpenAI(api_key=api_key)
-
-        # Create prompt for OpenAI
-        prompt = f"""
+def enhance_text_request(text):
+    """chat.completions.create() arguments for enhancing a technical explanation."""
+    # Create prompt for OpenAI
+    prompt = f"""
         Please enhance the following technical explanation to make it more technical, more professional, and well-structured:
 
         {text}
@@ -108,16 +104,31 @@ def enhance_text_with_openai(text):
         7. Do not use filler words, if the word is not adding value, remove it
         """
 
+    return {
+        "model": "gpt-4o",
+        "messages": [{
+            "role": "user",
+            "content": prompt
+        }],
+        "max_tokens": 1500
+    }
+
+
+def enhance_text_with_openai(text):
+    """Enhance text using OpenAI with LangFuse tracing."""
+    try:
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            logger.error("OPENAI_API_KEY environment variable not found")
+            return "Error: OpenAI API key not configured"
+
+        # Shared keep-alive client (tracing configured in utils.openai_client)
+        client = get_openai_client(timeout=TIMEOUT_CHAT)
+
         # Make the API request using OpenAI SDK with LangFuse tracing
         logger.info("Sending API request to OpenAI for text enhancement")
-        response = client.chat.completions.create(model="gpt-4o",
-                                                  messages=[{
-                                                      "role": "user",
-                                                      "content": prompt
-                                                  }],
-                                                  max_tokens=1500)
-
-        enhanced_text = response.choices[0].message.content
+        enhanced_text = cached_completion(client, 'enhance_text', 1, **enhance_text_request(text))
+
         logger.info("Successfully received enhanced text from OpenAI")
         return enhanced_text
 
@@ -126,6 +137,13 @@ def enhance_text_with_openai(text):
         raise
 
 
+def stream_enhance_text_with_openai(text):
+    """enhance_text_with_openai(), streamed: yields the enhanced text as it is generated."""
+    client = get_openai_client(timeout=TIMEOUT_CHAT)
+    logger.info("Streaming API request to OpenAI for text enhancement")
+    return cached_completion_stream(client, 'enhance_text', 1, **enhance_text_request(text))
+
+
 def structure_solution_with_openai(ai_analysis, solution_explanation):
     """Structure a solution using OpenAI based on AI analysis and user explanation with LangFuse tracing."""
     try:
@@ -134,8 +152,8 @@ def structure_solution_with_openai(ai_analysis, solution_explanation):
             logger.error("OPENAI_API_KEY environment variable not found")
             return "Error: OpenAI API key not configured"
 
-        # Initialize LangFuse-wrapped OpenAI client
-        client = OpenAI(api_key=api_key)
+        # Shared keep-alive client (tracing configured in utils.openai_client)
+        client = get_openai_client(timeout=TIMEOUT_CHAT)
 
         # Create prompt for OpenAI
         prompt = f"""
@@ -166,7 +184,8 @@ def structure_solution_with_openai(ai_analysis, solution_explanation):
 
         # Make the API request using OpenAI SDK with LangFuse tracing
         logger.info("Sending API request to OpenAI for solution structuring")
-        response = client.chat.completions.create(
+        structured_solution_text = cached_completion(
+            client, 'structure_solution', 1,
             model="gpt-4o",
             messages=[{
                 "role": "user",
@@ -175,7 +194,6 @@ def structure_solution_with_openai(ai_analysis, solution_explanation):
             response_format={"type": "json_object"},
             max_tokens=1500)
 
-        structured_solution_text = response.choices[0].message.content
         logger.info("Successfully received structured solution from OpenAI")
 
         # Parse JSON response
@@ -202,19 +220,10 @@ def structure_solution_with_openai(ai_analysis, solution_explanation):
         raise Exception(f"OpenAI API request failed: {str(e)}")
 
 
-def enhance_structured_content_with_openai(title, steps, approach):
-    """Enhance structured content (title, steps, approach) using OpenAI with specific HTML formatting and LangFuse tracing."""
-    try:
-        api_key = os.environ.get("OPENAI_API_KEY")
-        if not api_key:
-            logger.error("OPENAI_API_KEY environment variable not found")
-            return {"title": title, "steps": steps, "approach": approach}
-
-        # Initialize LangFuse-wrapped OpenAI client
-        client = OpenAI(api_key=api_key)
-
-        # Create prompt for OpenAI
-        prompt = f"""
+def structured_content_request(title, steps, approach):
+    """chat.completions.create() arguments for adding HTML formatting to structured content."""
+    # Create prompt for OpenAI
+    prompt = f"""
         Please enhance the following structured content by adding appropriate HTML formatting tags to make it more visually appealing and professional. 
 
         IMPORTANT: Only add HTML formatting tags (like <strong>, <em>, <br>, <ul>, <li>, etc.) to enhance the presentation. Do NOT change the actual text content, meaning, or structure.
@@ -235,34 +244,58 @@ def enhance_structured_content_with_openai(title, steps, approach):
         Remember: Only add HTML formatting tags, do not change the actual text content.
         """
 
+    return {
+        "model": "gpt-4o",
+        "messages": [{
+            "role": "user",
+            "content": prompt
+        }],
+        "response_format": {"type": "json_object"},
+        "max_tokens": 2000
+    }
+
+
+def parse_enhanced_structured_content(enhanced_content_text, title, steps, approach):
+    """
+    Read the model's JSON reply to structured_content_request().
+
+    Returns:
+        dict: title, steps and approach, each falling back to the original if missing
+    """
+    # Parse JSON response
+    import json
+    enhanced_content = json.loads(enhanced_content_text)
+
+    # Ensure all expected fields are present, fallback to original if missing
+    return {
+        "title": enhanced_content.get("title", title),
+        "steps": enhanced_content.get("steps", steps),
+        "approach": enhanced_content.get("approach", approach)
+    }
+
+
+def enhance_structured_content_with_openai(title, steps, approach):
+    """Enhance structured content (title, steps, approach) using OpenAI with specific HTML formatting and LangFuse tracing."""
+    try:
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            logger.error("OPENAI_API_KEY environment variable not found")
+            return {"title": title, "steps": steps, "approach": approach}
+
+        # Shared keep-alive client (tracing configured in utils.openai_client)
+        client = get_openai_client(timeout=TIMEOUT_CHAT)
+
         # Make the API request using OpenAI SDK with LangFuse tracing
         logger.info(
             "Sending API request to OpenAI for structured content enhancement")
         response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{
-                "role": "user",
-                "content": prompt
-            }],
-            response_format={"type": "json_object"},
-            max_tokens=2000)
+            **structured_content_request(title, steps, approach))
 
         enhanced_content_text = response.choices[0].message.content
         logger.info(
             "Successfully received enhanced structured content from OpenAI")
 
-        # Parse JSON response
-        import json
-        enhanced_content = json.loads(enhanced_content_text)
-
-        # Ensure all expected fields are present, fallback to original if missing
-        result = {
-            "title": enhanced_content.get("title", title),
-            "steps": enhanced_content.get("steps", steps),
-            "approach": enhanced_content.get("approach", approach)
-        }
-
-        return result
+        return parse_enhanced_structured_content(enhanced_content_text, title, steps, approach)
 
     except Exception as e:
         logger.error(f"Error enhancing structured content: {str(e)}")
@@ -270,6 +303,16 @@ def enhance_structured_content_with_openai(title, steps, approach):
         return {"title": title, "steps": steps, "approach": approach}
 
 
+def stream_structured_content_with_openai(title, steps, approach):
+    """
+    enhance_structured_content_with_openai(), streamed: yields the model's
+    JSON reply as it is generated; read it with parse_enhanced_structured_content().
+    """
+    client = get_openai_client(timeout=TIMEOUT_CHAT)
+    logger.info("Streaming API request to OpenAI for structured content enhancement")
+    return stream_completion(client, **structured_content_request(title, steps, approach))
+
+
 def generate_stack_analysis_with_openai(ai_analysis,
                                         solution_explanation,
                                         image_link=''):
@@ -280,8 +323,8 @@ def generate_stack_analysis_with_openai(ai_analysis,
             logger.error("OPENAI_API_KEY environment variable not found")
             return "Error: OpenAI API key not configured"
 
-        # Initialize LangFuse-wrapped OpenAI client
-        client = OpenAI(api_key=api_key)
+        # Shared keep-alive client (tracing configured in utils.openai_client)
+        client = get_openai_client(timeout=TIMEOUT_CHAT)
 
         # Prepare the context for OpenAI
         context_parts = []
@@ -291,7 +334,9 @@ def generate_stack_analysis_with_openai(ai_analysis,
 
         context_parts.append(f"Solution Explanation:\n{solution_explanation}")
 
-        if image_link:
+        # Only a public link helps here: a data: URL would put the whole image
+        # into the prompt as text, and a local /blobs/ path means nothing to the model
+        if image_link and image_link.startswith(('http://', 'https://')):
             context_parts.append(
                 f"Reference diagram available at: {image_link}")
 
@@ -342,19 +387,10 @@ Make sure to be thorough and specific with actual tool names, not generic catego
         raise
 
 
-def generate_diagram_description_with_openai(ideation_content):
-    """Generate a detailed diagram description based on ideation content using OpenAI with LangFuse tracing."""
-    try:
-        api_key = os.environ.get("OPENAI_API_KEY")
-        if not api_key:
-            logger.error("OPENAI_API_KEY environment variable not found")
-            return "Error: OpenAI API key not configured"
-
-        # Initialize LangFuse-wrapped OpenAI client
-        client = OpenAI(api_key=api_key)
-
-        # Create prompt for OpenAI
-        prompt = f"""
+def diagram_description_request(ideation_content):
+    """chat.completions.create() arguments for describing how to draw a solution's diagram."""
+    # Create prompt for OpenAI
+    prompt = f"""
         Based on the following ideation content, generate a detailed description of how a diagram should be drawn to represent this solution:
 
         IDEATION CONTENT:
@@ -382,22 +418,38 @@ def generate_diagram_description_with_openai(ideation_content):
         Be descriptive and include only relevant actionable details. Focus on technical accuracy and clarity. Do not include fluff or unnecessary commentary.
         """
 
+    return {
+        "model": "gpt-4o",
+        "messages": [{
+            "role":
+            "system",
+            "content":
+            "You are an expert technical diagram designer with deep knowledge of software architecture visualization, UML diagrams, and technical documentation. Provide clear, actionable diagram descriptions."
+        }, {
+            "role": "user",
+            "content": prompt
+        }],
+        "max_tokens": 1500,
+        "temperature": 0.3
+    }
+
+
+def generate_diagram_description_with_openai(ideation_content):
+    """Generate a detailed diagram description based on ideation content using OpenAI with LangFuse tracing."""
+    try:
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            logger.error("OPENAI_API_KEY environment variable not found")
+            return "Error: OpenAI API key not configured"
+
+        # Shared keep-alive client (tracing configured in utils.openai_client)
+        client = get_openai_client(timeout=TIMEOUT_CHAT)
+
         # Make the API request using OpenAI SDK with LangFuse tracing
         logger.info(
             "Sending API request to OpenAI for diagram description generation")
         response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{
-                "role":
-                "system",
-                "content":
-                "You are an expert technical diagram designer with deep knowledge of software architecture visualization, UML diagrams, and technical documentation. Provide clear, actionable diagram descriptions."
-            }, {
-                "role": "user",
-                "content": prompt
-            }],
-            max_tokens=1500,
-            temperature=0.3)
+            **diagram_description_request(ideation_content))
 
         diagram_description = response.choices[0].message.content.strip()
         logger.info("Successfully received diagram description from OpenAI")
@@ -408,6 +460,13 @@ def generate_diagram_description_with_openai(ideation_content):
         raise Exception(f"OpenAI API request failed: {str(e)}")
 
 
+def stream_diagram_description_with_openai(ideation_content):
+    """generate_diagram_description_with_openai(), streamed: yields the description as it is generated."""
+    client = get_openai_client(timeout=TIMEOUT_CHAT)
+    logger.info("Streaming API request to OpenAI for diagram description generation")
+    return stream_completion(client, **diagram_description_request(ideation_content))
+
+
 def generate_sketch_with_openai_assistant(planning_content):
     """Generate sketch content using OpenAI's assistant API based on planning content with LangFuse tracing."""
     try:
@@ -416,8 +475,8 @@ def generate_sketch_with_openai_assistant(planning_content):
             logger.error("OPENAI_API_KEY environment variable not found")
             return "Error: OpenAI API key not configured"
 
-        # Initialize LangFuse-wrapped OpenAI client
-        client = OpenAI(api_key=api_key)
+        # Shared keep-alive client (tracing configured in utils.openai_client)
+        client = get_openai_client(timeout=TIMEOUT_ASSISTANT_STEP)
 
         # Assistant ID for the specific assistant
         assistant_id = "asst_uui77dmWGC629GFlP22QoSzT"
@@ -426,93 +485,24 @@ def generate_sketch_with_openai_assistant(planning_content):
             f"Creating thread and running assistant {assistant_id} for sketch generation"
         )
 
-        # Create a thread
-        thread = client.beta.threads.create()
-
-        # Add the planning content as a message to the thread
-        client.beta.threads.messages.create(thread_id=thread.id,
-                                            role="user",
-                                            content=planning_content)
-
-        # Run the assistant
-        run = client.beta.threads.runs.create(thread_id=thread.id,
-                                              assistant_id=assistant_id)
-
-        # Wait for the run to complete with optimized polling
-        import time
-        max_wait_time = 120  # Reduced from 60 to 120 seconds for better reliability
-        start_time = time.time()
-        poll_interval = 2  # Start with 2 second intervals
-        
-        logger.info(f"Assistant run started with ID: {run.id}, polling for completion...")
-
-        while run.status in ['queued', 'in_progress', 'cancelling']:
-            elapsed_time = time.time() - start_time
-            
-            if elapsed_time > max_wait_time:
-                logger.error(f"Assistant run timed out after {max_wait_time} seconds")
-                # Try to cancel the run
-                try:
-                    client.beta.threads.runs.cancel(thread_id=thread.id, run_id=run.id)
-                    logger.info("Cancelled the timed-out assistant run")
-                except Exception as cancel_error:
-                    logger.warning(f"Could not cancel run: {cancel_error}")
-                return "Error: Assistant run timed out. Please try again with shorter content or try again later."
-
-            # Dynamic polling interval - start with 2s, increase to 3s after 30s
-            if elapsed_time > 30:
-                poll_interval = 3
-            
-            logger.debug(f"Assistant status: {run.status}, elapsed: {elapsed_time:.1f}s")
-            time.sleep(poll_interval)
-            
-            try:
-                run = client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
-            except Exception as retrieve_error:
-                logger.error(f"Error retrieving run status: {retrieve_error}")
-                return f"Error: Could not check assistant status: {str(retrieve_error)}"
-
-        logger.info(f"Assistant run completed with status: {run.status}")
-
-        if run.status == 'completed':
-            # Retrieve the messages
-            try:
-                messages = client.beta.threads.messages.list(thread_id=thread.id)
-            except Exception as messages_error:
-                logger.error(f"Error retrieving messages: {messages_error}")
-                return f"Error: Could not retrieve assistant response: {str(messages_error)}"
-
-            # Get the assistant's response (the first message should be the assistant's response)
-            for message in messages.data:
-                if message.role == 'assistant':
-                    # Extract text content from the message
-                    content = ""
-                    for content_block in message.content:
-                        if content_block.type == 'text':
-                            content += content_block.text.value
-
-                    if content.strip():
-                        logger.info("Successfully received sketch content from OpenAI assistant")
-                        return content.strip()
-
-            logger.error("No assistant response found in thread")
-            return "Error: No response received from assistant"
-        
-        elif run.status == 'failed':
-            logger.error(f"Assistant run failed. Last error: {getattr(run, 'last_error', 'Unknown error')}")
-            return "Error: Assistant run failed. Please try again."
-        
-        elif run.status == 'cancelled':
-            logger.warning("Assistant run was cancelled")
+        # Stream the run on a new thread; returns as soon as the run completes
+        try:
+            content = run_assistant(client, assistant_id, planning_content,
+                                    timeout=120, name="Sketch")
+        except AssistantRunTimeout:
+            return "Error: Assistant run timed out. Please try again with shorter content or try again later."
+        except AssistantRunCancelled:
             return "Error: Assistant run was cancelled. Please try again."
-        
-        elif run.status == 'expired':
-            logger.error("Assistant run expired")
-            return "Error: Assistant run expired. Please try again."
-        
-        else:
-            logger.error(f"Assistant run ended with unexpected status: {run.status}")
-            return f"Error: Assistant run ended with status: {run.status}. Please try again."
+        except AssistantRunError as run_error:
+            logger.error(f"Assistant run failed: {str(run_error)}")
+            if run_error.status == 'expired':
+                return "Error: Assistant run expired. Please try again."
+            if run_error.status == 'completed':
+                return "Error: No response received from assistant"
+            return "Error: Assistant run failed. Please try again."
+
+        logger.info("Successfully received sketch content from OpenAI assistant")
+        return content
 
     except Exception as e:
         logger.error(f"Error generating sketch with OpenAI assistant: {str(e)}")
@@ -33,6 +33,10 @@ CREATE INDEX idx_ai_sessions_uuid ON ai_architecture_sessions(uuid);
 CREATE INDEX idx_ai_sessions_type ON ai_architecture_sessions(session_type);
 CREATE INDEX idx_ai_sessions_created_at ON ai_architecture_sessions(created_at);
 CREATE INDEX idx_ai_sessions_title ON ai_architecture_sessions(title) WHERE title IS NOT NULL;
+-- Keyset pagination of the sessions listing (/api/sessions). CONCURRENTLY so
+-- it can be added to a live table without blocking writes; it cannot run
+-- inside a transaction block.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_ai_sessions_created_at_id ON ai_architecture_sessions(created_at DESC NULLS LAST, id DESC);
 
 -- Usage events indexes
 CREATE INDEX idx_usage_events_org_id ON usage_events(organization_id);
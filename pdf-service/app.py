@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Resident PDF render service.
+
+Keeps a pool of worker processes that have WeasyPrint and the generators
+already imported and warmed up, so a render request only pays for layout
+instead of interpreter start + cairo/pango import + fontconfig warm-up.
+
+Run with:
+    python3 app.py
+or  gunicorn -w 1 -b 0.0.0.0:5001 app:app
+(one gunicorn worker is enough - the parallelism lives in the render pool)
+"""
+
+import os
+
+# Service renders are reproducible by default (stable cache keys and ETags).
+# Must be set before the generators are imported and the pool forks.
+os.environ.setdefault('PDF_DETERMINISTIC', '1')
+
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import Flask, Response, jsonify, request
+
+import asset_store
+import render_worker
+from pdf_render import is_deterministic
+from render_cache import canonical_key, render_cache
+
+app = Flask(__name__)
+
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', os.cpu_count() or 2))
+PDF_RENDER_TIMEOUT = float(os.environ.get('PDF_RENDER_TIMEOUT', '120'))
+PDF_SERVICE_HOST = os.environ.get('PDF_SERVICE_HOST', '127.0.0.1')
+PDF_SERVICE_PORT = int(os.environ.get('PDF_SERVICE_PORT', '5001'))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the shared render pool, creating and pre-warming it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            print(f"🐍 Starting render pool with {PDF_WORKERS} workers", file=sys.stderr)
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS,
+                                        initializer=render_worker.init_worker)
+            # Force every worker to spawn (and run the initializer) now
+            # instead of on the first real requests.
+            for _ in range(PDF_WORKERS):
+                _pool.submit(os.getpid)
+        return _pool
+
+
+def reset_pool(broken_pool):
+    """Drop a pool whose worker died so the next request gets a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken_pool:
+            _pool = None
+    broken_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_pdf(doc_type, payload):
+    """Run one render on the pool, returning PDF bytes or None on failure."""
+    pool = get_pool()
+    try:
+        future = pool.submit(render_worker.render, doc_type, payload)
+        return future.result(timeout=PDF_RENDER_TIMEOUT)
+    except BrokenProcessPool:
+        print("❌ Render worker crashed, recycling pool", file=sys.stderr)
+        reset_pool(pool)
+        return None
+
+
+def cached_render(doc_type, payload, key):
+    """
+    Serve a render from the output cache when the same input was rendered
+    before, otherwise render on the pool and store the result.
+    Returns (pdf_bytes, cache_status).
+    """
+    if render_cache is None:
+        return render_pdf(doc_type, payload), 'bypass'
+
+    pdf_bytes = render_cache.get(key)
+    if pdf_bytes is not None:
+        return pdf_bytes, 'hit'
+
+    pdf_bytes = render_pdf(doc_type, payload)
+    if pdf_bytes:
+        render_cache.put(key, pdf_bytes)
+    return pdf_bytes, 'miss'
+
+
+def pdf_response(pdf_bytes, filename, cache_status, etag=None):
+    response = Response(pdf_bytes,
+                        status=200,
+                        mimetype='application/pdf',
+                        headers={'Content-Disposition': f'inline; filename="{filename}"',
+                                 'X-Render-Cache': cache_status})
+    if etag:
+        response.set_etag(etag)
+    return response
+
+
+def render_document(doc_type, payload, filename):
+    """
+    Render (or fetch from cache) and build the PDF response. Deterministic
+    renders are tagged with the input key as ETag, so a client that already
+    holds that exact PDF gets a 304 without anything being rendered.
+    """
+    key = canonical_key(doc_type, payload)
+    etag = key if is_deterministic(payload) else None
+    if etag and etag in request.if_none_match:
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+
+    try:
+        pdf_bytes, cache_status = cached_render(doc_type, payload, key)
+    except FutureTimeoutError:
+        print(f"❌ {doc_type} render timed out after {PDF_RENDER_TIMEOUT}s", file=sys.stderr)
+        return jsonify({'success': False, 'error': 'PDF generation timed out'}), 504
+    except Exception as e:
+        print(f"❌ Error rendering {doc_type} PDF: {str(e)}", file=sys.stderr)
+        return jsonify({'success': False, 'error': 'Failed to generate PDF'}), 500
+
+    if not pdf_bytes:
+        return jsonify({'success': False, 'error': 'Failed to generate PDF'}), 500
+
+    print(f"✅ {doc_type} PDF generated ({cache_status}), size: {len(pdf_bytes)} bytes", file=sys.stderr)
+    return pdf_response(pdf_bytes, filename, cache_status, etag)
+
+
+def render_json_document(doc_type, filename):
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Request body must be a JSON object'}), 400
+
+    # Logos may be sent as sha256: references; the caller re-registers on 422
+    missing = asset_store.missing_assets(data)
+    if missing:
+        return jsonify({'success': False, 'error': 'Unknown asset reference', 'missing': missing}), 422
+
+    return render_document(doc_type, data, filename)
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({'status': 'ok', 'workers': PDF_WORKERS})
+
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    if render_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **render_cache.snapshot()})
+
+
+@app.route('/assets', methods=['POST'])
+def register_asset():
+    """Register a base64 logo once, returning the sha256: reference to send instead."""
+    base64_data = request.get_data(as_text=True).strip()
+    if not base64_data:
+        return jsonify({'success': False, 'error': 'No asset data received'}), 400
+
+    ref = asset_store.register_asset(base64_data)
+    return jsonify({'success': True, 'ref': ref})
+
+
+@app.route('/assets/<digest>', methods=['GET'])
+def asset_exists(digest):
+    if not asset_store.has_asset(digest):
+        return jsonify({'success': False, 'error': 'Unknown asset'}), 404
+    return jsonify({'success': True, 'ref': f"{asset_store.REF_PREFIX}{digest}"})
+
+
+@app.route('/solutioning-pdf', methods=['POST'])
+def solutioning_pdf():
+    return render_json_document('solutioning', 'solutioning.pdf')
+
+
+@app.route('/sow-pdf', methods=['POST'])
+def sow_pdf():
+    return render_json_document('sow', 'sow.pdf')
+
+
+@app.route('/loe-pdf', methods=['POST'])
+def loe_pdf():
+    return render_json_document('loe', 'loe.pdf')
+
+
+@app.route('/html-to-pdf', methods=['POST'])
+def html_to_pdf():
+    html_content = request.get_data(as_text=True)
+    if not html_content.strip():
+        return jsonify({'success': False, 'error': 'No HTML content received'}), 400
+
+    return render_document('html', html_content, 'document.pdf')
+
+
+if __name__ == '__main__':
+    get_pool()
+    app.run(host=PDF_SERVICE_HOST, port=PDF_SERVICE_PORT, threaded=True)
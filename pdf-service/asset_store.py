@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store for the logos embedded in generated PDFs.
+
+Default logos are read and base64-encoded once per process. Organization
+logos are registered once (POST /assets on the render service) and can then
+be referenced as "sha256:<hex digest>" instead of shipping the full base64
+string in every payload. Registered assets are written to ASSET_DIR so the
+standalone scripts and every render worker process resolve the same
+references.
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+CURR_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MAIN_LOGO = 'Dry Ground AI_Full Logo_Black_RGB.png'
+HEADER_LOGO = 'dg.png'
+
+# Same probe order the generators used: ../public first, then pdf-service
+DEFAULT_LOGO_DIRS = (
+    os.path.join(CURR_DIR, '../public'),
+    CURR_DIR,
+    os.path.join(CURR_DIR, 'logos'),
+)
+
+ASSET_DIR = os.environ.get('PDF_ASSET_DIR',
+                           os.path.join(tempfile.gettempdir(), 'nexa-pdf-assets'))
+ASSET_MEMORY_ENTRIES = int(os.environ.get('PDF_ASSET_MEMORY_ENTRIES', '64'))
+
+REF_PREFIX = 'sha256:'
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Payload keys that may carry a logo (inline base64 or a sha256: reference)
+LOGO_KEYS = ('mainLogo', 'secondLogo')
+
+
+class UnknownAssetError(KeyError):
+    """Raised when a sha256: reference has never been registered."""
+
+
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def is_asset_ref(value):
+    return isinstance(value, str) and value.startswith(REF_PREFIX)
+
+
+def content_hash(base64_data):
+    """SHA-256 of the decoded asset bytes (of the raw string if it isn't valid base64)."""
+    try:
+        raw = base64.b64decode(base64_data, validate=True)
+    except (binascii.Error, ValueError):
+        raw = base64_data.encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _asset_path(digest):
+    return os.path.join(ASSET_DIR, f"{digest}.b64")
+
+
+def _remember(digest, base64_data):
+    with _memory_lock:
+        _memory[digest] = base64_data
+        _memory.move_to_end(digest)
+        while len(_memory) > ASSET_MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def register_asset(base64_data):
+    """
+    Store a base64-encoded asset and return its "sha256:<hex>" reference.
+    Registering the same content again is a no-op.
+    """
+    digest = content_hash(base64_data)
+    with _memory_lock:
+        known = digest in _memory
+    if not known:
+        path = _asset_path(digest)
+        if not os.path.exists(path):
+            try:
+                os.makedirs(ASSET_DIR, exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    f.write(base64_data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                # Still usable in this process, just not shared on disk
+                print(f"⚠️ Could not persist asset {digest[:12]}: {str(e)}", file=sys.stderr)
+        _remember(digest, base64_data)
+    return f"{REF_PREFIX}{digest}"
+
+
+def get_asset(ref):
+    """Return the base64 data for a "sha256:<hex>" reference."""
+    digest = ref[len(REF_PREFIX):] if is_asset_ref(ref) else ref
+    if not DIGEST_PATTERN.match(digest):
+        raise UnknownAssetError(ref)
+    with _memory_lock:
+        base64_data = _memory.get(digest)
+        if base64_data is not None:
+            _memory.move_to_end(digest)
+            return base64_data
+    try:
+        with open(_asset_path(digest)) as f:
+            base64_data = f.read()
+    except (OSError, ValueError):
+        raise UnknownAssetError(ref)
+    _remember(digest, base64_data)
+    return base64_data
+
+
+def has_asset(ref):
+    try:
+        get_asset(ref)
+        return True
+    except UnknownAssetError:
+        return False
+
+
+def resolve_asset(value):
+    """
+    Resolve a logo value from a payload to base64 data. References are looked
+    up, inline base64 (older callers) is passed through untouched.
+    """
+    if is_asset_ref(value):
+        return get_asset(value)
+    return value
+
+
+def missing_assets(data):
+    """References in data's logo keys that cannot be resolved."""
+    return [data[key] for key in LOGO_KEYS
+            if is_asset_ref(data.get(key)) and not has_asset(data[key])]
+
+
+@lru_cache(maxsize=None)
+def load_default_logo(filename):
+    """Base64 of a bundled default logo, read from disk once per process."""
+    for directory in DEFAULT_LOGO_DIRS:
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return base64.b64encode(f.read()).decode('utf-8')
+    print(f"Warning: Logo file not found: {filename}", file=sys.stderr)
+    return ""
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Batch PDF rendering: many documents in one invocation.
+
+Reads newline-delimited JSON jobs and renders them on a pool of warmed-up
+render workers (the same ones the render service uses), so a bulk export
+pays interpreter start and WeasyPrint warm-up once per core instead of
+once per document.
+
+Usage:
+    python3 batch_render.py jobs.ndjson --out-dir exports/
+    python3 batch_render.py - --framed < jobs.ndjson > results.bin
+
+Each input line is one job:
+    {"id": "sow-42", "type": "sow", "data": {...}}
+where type is one of solutioning, sow, loe (data is the usual JSON payload)
+or html (data is the HTML string). id is optional and defaults to the line
+number.
+
+Output:
+    --out-dir DIR   each PDF is written to DIR/<id>.pdf
+    --framed        results are streamed to stdout as they finish, one record
+                    per job: 4-byte big-endian header length, 4-byte body
+                    length, JSON header ({"id", "type", "status", ...}), body
+                    (the PDF bytes, empty for failed jobs)
+
+A status record per job (id, type, status, bytes, seconds, error, path) is
+written as NDJSON to --report, or to stderr. Exits 1 if any job failed.
+"""
+
+import argparse
+import json
+import os
+import re
+import struct
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import asset_store
+import render_worker
+
+PDF_BATCH_WORKERS = int(os.environ.get('PDF_BATCH_WORKERS', str(os.cpu_count() or 2)))
+
+# Jobs read ahead of the pool per worker; bounds memory on very large inputs
+PENDING_PER_WORKER = 2
+
+SAFE_ID_PATTERN = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+def render_job(doc_type, payload):
+    """Render one job in a worker process, returning (pdf_bytes, seconds)."""
+    start = time.perf_counter()
+    pdf_bytes = render_worker.render(doc_type, payload)
+    return pdf_bytes, time.perf_counter() - start
+
+
+def read_jobs(stream):
+    """
+    Yield (job_id, doc_type, payload, error) for every non-blank input line.
+    error is set, and the job is not rendered, when the line is invalid.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        job_id = str(line_number)
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield job_id, None, None, f"Invalid JSON: {str(e)}"
+            continue
+        if not isinstance(job, dict):
+            yield job_id, None, None, 'Job must be a JSON object'
+            continue
+
+        job_id = str(job.get('id', job_id))
+        doc_type = job.get('type')
+        payload = job.get('data')
+
+        if doc_type not in render_worker.RENDERERS:
+            yield job_id, doc_type, None, f"Unknown document type: {doc_type}"
+        elif doc_type == 'html' and not (isinstance(payload, str) and payload.strip()):
+            yield job_id, doc_type, None, 'html jobs need an HTML string as data'
+        elif doc_type != 'html' and not isinstance(payload, dict):
+            yield job_id, doc_type, None, 'data must be a JSON object'
+        elif doc_type != 'html' and asset_store.missing_assets(payload):
+            yield job_id, doc_type, None, f"Unknown asset reference: {asset_store.missing_assets(payload)}"
+        else:
+            yield job_id, doc_type, payload, None
+
+
+class ResultWriter:
+    """Writes finished jobs to an output directory or as framed records on stdout."""
+
+    def __init__(self, out_dir=None, framed=False):
+        self.out_dir = out_dir
+        self.framed = framed
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+
+    def write(self, status, pdf_bytes):
+        if self.framed:
+            header = json.dumps(status).encode('utf-8')
+            body = pdf_bytes or b''
+            sys.stdout.buffer.write(struct.pack('>II', len(header), len(body)))
+            sys.stdout.buffer.write(header)
+            sys.stdout.buffer.write(body)
+            sys.stdout.buffer.flush()
+        elif self.out_dir and pdf_bytes:
+            filename = f"{SAFE_ID_PATTERN.sub('_', status['id'])}.pdf"
+            path = os.path.join(self.out_dir, filename)
+            with open(path, 'wb') as f:
+                f.write(pdf_bytes)
+            status['path'] = path
+
+
+def run_batch(stream, writer, report, workers=PDF_BATCH_WORKERS):
+    """
+    Render every job from stream, keeping at most workers * PENDING_PER_WORKER
+    jobs in flight. Returns (succeeded, failed) counts.
+    """
+    succeeded = failed = 0
+    max_pending = max(1, workers) * PENDING_PER_WORKER
+
+    def finish(status, pdf_bytes=None):
+        nonlocal succeeded, failed
+        if status['status'] == 'ok':
+            succeeded += 1
+        else:
+            failed += 1
+        writer.write(status, pdf_bytes)
+        report.write(json.dumps(status) + '\n')
+        report.flush()
+
+    print(f"🐍 Starting batch render pool with {workers} workers", file=sys.stderr)
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=render_worker.init_worker)
+    pending = {}
+
+    def collect(done):
+        nonlocal pool
+        broken = False
+        for future in done:
+            job_id, doc_type, job_pool = pending.pop(future)
+            status = {'id': job_id, 'type': doc_type}
+            try:
+                pdf_bytes, seconds = future.result()
+            except BrokenProcessPool:
+                broken = broken or job_pool is pool
+                finish({**status, 'status': 'error', 'error': 'Render worker crashed'})
+                continue
+            except Exception as e:
+                finish({**status, 'status': 'error', 'error': str(e)})
+                continue
+
+            status['seconds'] = round(seconds, 3)
+            if pdf_bytes:
+                finish({**status, 'status': 'ok', 'bytes': len(pdf_bytes)}, pdf_bytes)
+            else:
+                finish({**status, 'status': 'error', 'error': 'Failed to generate PDF'})
+
+        if broken:
+            # A worker died: every job queued on that pool failed with it, start a fresh one
+            print("❌ Batch render worker crashed, recycling pool", file=sys.stderr)
+            pool.shutdown(wait=False, cancel_futures=True)
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=render_worker.init_worker)
+
+    try:
+        for job_id, doc_type, payload, error in read_jobs(stream):
+            if error:
+                finish({'id': job_id, 'type': doc_type, 'status': 'invalid', 'error': error})
+                continue
+
+            while len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[pool.submit(render_job, doc_type, payload)] = (job_id, doc_type, pool)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    finally:
+        pool.shutdown(wait=True)
+
+    return succeeded, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render NDJSON PDF jobs in one invocation.')
+    parser.add_argument('jobs', help="NDJSON job file, or - for stdin")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument('--out-dir', help='Directory to write <id>.pdf files to')
+    output.add_argument('--framed', action='store_true',
+                        help='Stream length-prefixed result records to stdout')
+    parser.add_argument('--workers', type=int, default=PDF_BATCH_WORKERS,
+                        help='Render processes (default: PDF_BATCH_WORKERS or CPU count)')
+    parser.add_argument('--report', help='Write per-job NDJSON status here instead of stderr')
+    args = parser.parse_args()
+
+    writer = ResultWriter(out_dir=args.out_dir, framed=args.framed)
+    report = open(args.report, 'w', encoding='utf-8') if args.report else sys.stderr
+    stream = sys.stdin if args.jobs == '-' else open(args.jobs, 'r', encoding='utf-8')
+
+    start = time.perf_counter()
+    try:
+        succeeded, failed = run_batch(stream, writer, report, workers=args.workers)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        if report is not sys.stderr:
+            report.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"🐍 Batch finished: {succeeded} rendered, {failed} failed in {elapsed:.1f}s",
+          file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
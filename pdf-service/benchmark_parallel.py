@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark: serial vs. parallel solutioning renders.
+
+Usage:
+    PDF_PARALLEL_WORKERS=4 python3 benchmark_parallel.py [iterations]
+
+Renders solutioning reports with 1, 5, 20 and 50 solutions through
+generate_solutioning_pdf_from_json, once with {"parallel": false} and once
+with {"parallel": true}, and prints wall time per render and the speedup.
+The page fragment cache is disabled so every iteration is a cold layout.
+Documents below PDF_PARALLEL_MIN_SOLUTIONS render serially in both columns.
+"""
+
+import os
+import sys
+import time
+
+os.environ['PDF_FRAGMENT_CACHE_BYTES'] = '0'
+
+from generate_solutioning_standalone import generate_solutioning_pdf_from_json
+import parallel_render
+
+SOLUTION_COUNTS = (1, 5, 20, 50)
+
+
+def sample_payload(solution_count, parallel):
+    return {
+        'basic': {
+            'date': '2025-05-01',
+            'title': 'Platform Modernization: Phase One',
+            'recipient': 'Acme Corp',
+            'engineer': 'Jordan Smith',
+        },
+        'solutions': [
+            {
+                'title': f'Solution {i + 1}',
+                'steps': 'Step one\nStep two\nStep three\n' * 4,
+                'approach': 'Approach description ' * 40,
+                'difficulty': 40,
+                'layout': (i % 5) + 1,
+                'imageData': '',
+            }
+            for i in range(solution_count)
+        ],
+        'sessionProtocol': 'SH123',
+        'deterministic': True,
+        'parallel': parallel,
+    }
+
+
+def time_render(payload, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if generate_solutioning_pdf_from_json(payload) is None:
+            raise RuntimeError('render failed')
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    if parallel_render.PdfWriter is None:
+        print('pypdf is not installed; parallel mode is unavailable', file=sys.stderr)
+        sys.exit(1)
+
+    # Spin the pool up outside the timed region
+    time_render(sample_payload(max(SOLUTION_COUNTS), True), 1)
+
+    print(f"workers: {parallel_render.PDF_PARALLEL_WORKERS}, "
+          f"min solutions: {parallel_render.PDF_PARALLEL_MIN_SOLUTIONS}")
+    print(f"{'solutions':<11}{'serial (ms)':>14}{'parallel (ms)':>16}{'speedup':>10}")
+
+    for count in SOLUTION_COUNTS:
+        serial = time_render(sample_payload(count, False), iterations)
+        parallel = time_render(sample_payload(count, True), iterations)
+        print(f"{count:<11}{serial:>14.1f}{parallel:>16.1f}{serial / parallel:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: per-render jinja2.Template(source) vs. the shared registry.
+
+Usage:
+    python3 benchmark_templates.py [iterations]
+
+For every document type this times the old pattern (parse + compile the
+template source on each call, then render) against template_env.get_template()
+(compiled once per process, then render) and prints the time saved per render.
+"""
+
+import sys
+import time
+
+from jinja2 import Template
+
+import template_env
+
+SAMPLE_SOLUTIONING = {
+    'basic_info': {
+        'date': '2025-05-01',
+        'title': 'Platform Modernization: Phase One',
+        'formatted_title': 'Platform Modernization:<br>Phase One',
+        'formatted_date': 'May 01, 2025',
+        'recipient': 'Acme Corp',
+        'engineer': 'Jordan Smith',
+    },
+    'solutions': [
+        {
+            'number': i + 1,
+            'title': f'Solution {i + 1}',
+            'steps': 'Step one\nStep two\nStep three',
+            'approach': 'Approach description ' * 20,
+            'difficulty': 40,
+            'layout': (i % 5) + 1,
+            'image_data': None,
+        }
+        for i in range(5)
+    ],
+    'total_solutions': 5,
+    'is_multi_solution': True,
+    'logo_base64': '',
+    'dg_logo_base64': '',
+    'session_id': 'SH123',
+}
+
+SAMPLE_SOW = {
+    'sow_data': {
+        'project': 'Platform Modernization',
+        'client': 'Acme Corp',
+        'prepared_by': 'Jordan Smith',
+        'project_purpose_background': 'Background ' * 40,
+        'objectives': ['Objective one', 'Objective two', 'Objective three'],
+        'in_scope_deliverables': [
+            {'deliverable': 'API', 'key_features': 'REST', 'primary_artifacts': 'Code'},
+            {'deliverable': 'UI', 'key_features': 'React', 'primary_artifacts': 'Code'},
+        ],
+        'out_of_scope': 'Mobile apps',
+        'functional_requirements': ['Login', 'Reporting'],
+        'non_functional_requirements': ['99.9% uptime'],
+        'project_phases_timeline': {
+            'phases': [
+                {'phase': 'Discovery', 'key_activities': 'Workshops', 'weeks_display': '0-2'},
+                {'phase': 'Build', 'key_activities': 'Sprints', 'weeks_display': '2-10'},
+            ]
+        },
+    },
+    'formatted_date': 'May 01, 2025',
+    'dg_logo_base64': '',
+    'refinement_midpoint': 5,
+    'refinement_endpoint': 10,
+}
+
+SAMPLE_LOE = {
+    'loe_data': {
+        'basic': {'project': 'Platform Modernization', 'client': 'Acme Corp', 'prepared_by': 'Jordan Smith'},
+        'overview': 'Overview ' * 40,
+        'workstreams': [{'workstream': 'Backend', 'activities': 'APIs', 'duration': '4'}],
+        'resources': [{'role': 'Engineer', 'personWeeks': 4, 'personHours': 160}],
+        'buffer': {'weeks': 1, 'hours': 40},
+        'assumptions': ['Client provides access', 'Two review cycles'],
+        'goodOptions': [{'feature': 'Drop reporting', 'hours': 40, 'weeks': 1}],
+        'bestOptions': [{'feature': 'Add SSO', 'hours': 80, 'weeks': 2}],
+    },
+    'formatted_date': 'May 01, 2025',
+    'dg_logo_base64': '',
+    'total_weeks': 5,
+    'total_hours': 200,
+    'good_total_hours': 40,
+    'good_total_weeks': 2.0,
+    'good_adjusted_hours': 160,
+    'good_adjusted_weeks': 8.0,
+    'best_total_hours': 80,
+    'best_total_weeks': 4.0,
+    'best_adjusted_hours': 280,
+    'best_adjusted_weeks': 14.0,
+}
+
+CASES = [
+    ('solutioning', 'solutioning.html', SAMPLE_SOLUTIONING),
+    ('sow', 'sow.html', SAMPLE_SOW),
+    ('loe', 'loe.html', SAMPLE_LOE),
+    ('loe_document', 'loe_document.html', SAMPLE_LOE),
+]
+
+
+def time_per_call(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"{'document':<14}{'per-call (ms)':>16}{'registry (ms)':>16}{'saved (ms)':>14}{'speedup':>10}")
+
+    for label, name, context in CASES:
+        source, _, _ = template_env.env.loader.get_source(template_env.env, name)
+        template_env.get_template(name).render(**context)  # warm the registry
+
+        uncached = time_per_call(lambda: Template(source).render(**context), iterations)
+        cached = time_per_call(lambda: template_env.get_template(name).render(**context), iterations)
+
+        print(f"{label:<14}{uncached:>16.3f}{cached:>16.3f}{uncached - cached:>14.3f}{uncached / cached:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Page fragment cache for incrementally re-rendered reports.
+
+A solutioning report is a cover page plus one layout page per solution, and
+each of those only depends on a handful of inputs. Fragments are laid out as
+separate WeasyPrint Documents, kept in an in-process LRU keyed on exactly the
+inputs that fragment reads and bounded by their estimated memory, and the final PDF is assembled by merging their
+pages. Editing one solution therefore re-lays out one page instead of the
+whole report. The cache lives in the render worker process, so it only pays
+off in the resident render service, not in one-shot script runs.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import template_env
+from pdf_render import render_document
+from render_metrics import count, stage
+
+PDF_FRAGMENT_CACHE_BYTES = int(os.environ.get('PDF_FRAGMENT_CACHE_BYTES', str(128 * 1024 * 1024)))
+
+# A laid-out Document cannot be measured directly; its box tree, text runs
+# and decoded images grow with the HTML it was laid out from (base64 images
+# included), so an entry is charged this many bytes per byte of source HTML
+FRAGMENT_BYTES_PER_HTML_BYTE = 8
+
+
+def fragment_key(kind, key_parts, options=None):
+    """
+    Hash of everything a fragment's layout depends on.
+    Args:
+        kind (str): Fragment kind, e.g. 'cover' or 'solution'.
+        key_parts (dict): JSON-serializable inputs of the fragment. Large
+            values such as logos should be passed as digests.
+        options (dict): WeasyPrint render options used for the fragment.
+    """
+    digest = hashlib.sha256()
+    for part in (kind, template_env.template_version(),
+                 json.dumps(key_parts, sort_keys=True, separators=(',', ':'),
+                            ensure_ascii=False, default=str),
+                 json.dumps(options or {}, sort_keys=True, default=str)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def estimate_size(html_content):
+    """Estimated memory held by the Document laid out from html_content."""
+    return len(html_content) * FRAGMENT_BYTES_PER_HTML_BYTE
+
+
+def asset_digest(value):
+    """Short content digest of a (base64) asset string for use in fragment keys."""
+    return hashlib.sha256((value or '').encode('utf-8')).hexdigest()[:32]
+
+
+class FragmentCache:
+    """LRU of laid-out Documents, bounded by their total estimated size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (document, estimated size)
+        self._size = 0
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+        }
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def put(self, key, document, size):
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+            self._entries[key] = (document, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.stats['evictions'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, 'entries': len(self._entries), 'estimated_bytes': self._size}
+
+
+fragment_cache = FragmentCache(PDF_FRAGMENT_CACHE_BYTES) \
+    if PDF_FRAGMENT_CACHE_BYTES > 0 else None
+
+
+def render_fragments(template, fragments, **options):
+    """
+    Lay out each fragment (reusing cached ones) and merge their pages.
+    Args:
+        template: Compiled Jinja template every fragment is rendered from.
+        fragments (list): (kind, key_parts, context) tuples in page order;
+            context is passed to template.render().
+        options: WeasyPrint render options.
+    Returns:
+        Document: One document holding the pages of every fragment, with
+        the metadata of the first.
+    """
+    documents = []
+    reused = 0
+
+    for kind, key_parts, context in fragments:
+        key = fragment_key(kind, key_parts, options)
+        document = fragment_cache.get(key) if fragment_cache is not None else None
+        if document is None:
+            with stage('template'):
+                html_content = template.render(**context)
+            document = render_document(html_content, **options)
+            if fragment_cache is not None:
+                fragment_cache.put(key, document, estimate_size(html_content))
+        else:
+            reused += 1
+        documents.append(document)
+
+    print(f"🐍 Reused {reused} of {len(documents)} page fragments", file=sys.stderr)
+    count('fragments_reused', reused)
+
+    merged = documents[0].copy([page for document in documents for page in document.pages])
+    # copy() shares the metadata object; keep the cached fragment's untouched
+    merged.metadata = copy.copy(documents[0].metadata)
+    return merged
@@ -2,8 +2,49 @@
 
 import sys
 import os
-from weasyprint import HTML, CSS
+from weasyprint import CSS
 
+from pdf_render import is_deterministic, write_pdf
+from render_metrics import traced
+
+BASE_CSS = """
+    @page {
+        margin: 40px;
+        size: A4;
+    }
+    body {
+        font-family: Arial, sans-serif;
+        line-height: 1.6;
+        color: #333;
+    }
+    h1, h2, h3 {
+        color: #2c3e50;
+        margin-top: 20px;
+        margin-bottom: 10px;
+    }
+    .solution {
+        margin: 20px 0;
+        padding: 15px;
+        border-left: 3px solid #007bff;
+        background-color: #f8f9fa;
+    }
+    .meta {
+        color: #666;
+        font-size: 14px;
+        margin-bottom: 20px;
+    }
+"""
+
+@traced('html')
+def convert_html_to_pdf(html_content):
+    """Convert an HTML template string to PDF bytes."""
+    # Basic CSS for better PDF rendering
+    base_css = CSS(string=BASE_CSS)
+    
+    # Convert HTML to PDF
+    return write_pdf(html_content, deterministic=is_deterministic(), stylesheets=[base_css])
+
+@traced('html')
 def main():
     """Convert HTML template from stdin to PDF and output to stdout."""
     try:
@@ -16,38 +57,7 @@ def main():
         
         print(f"🐍 Processing HTML template, length: {len(html_content)} characters", file=sys.stderr)
         
-        # Basic CSS for better PDF rendering
-        base_css = CSS(string="""
-            @page {
-                margin: 40px;
-                size: A4;
-            }
-            body {
-                font-family: Arial, sans-serif;
-                line-height: 1.6;
-                color: #333;
-            }
-            h1, h2, h3 {
-                color: #2c3e50;
-                margin-top: 20px;
-                margin-bottom: 10px;
-            }
-            .solution {
-                margin: 20px 0;
-                padding: 15px;
-                border-left: 3px solid #007bff;
-                background-color: #f8f9fa;
-            }
-            .meta {
-                color: #666;
-                font-size: 14px;
-                margin-bottom: 20px;
-            }
-        """)
-        
-        # Convert HTML to PDF
-        html_doc = HTML(string=html_content)
-        pdf_bytes = html_doc.write_pdf(stylesheets=[base_css])
+        pdf_bytes = convert_html_to_pdf(html_content)
         
         print(f"✅ PDF generated successfully, size: {len(pdf_bytes)} bytes", file=sys.stderr)
         
@@ -60,4 +70,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Normalization of uploaded solution diagrams before they are embedded.
+
+Uploads arrive as full-resolution base64 and used to be scaled down only by
+CSS, so WeasyPrint had to decode, hold and re-compress every pixel. Here each
+image is downscaled to the print resolution of its layout box, re-encoded
+(palette PNG for flat diagrams, JPEG for photographic content) and cached by
+content hash, so repeated renders of the same session skip the work entirely.
+"""
+
+import base64
+import binascii
+import hashlib
+import io
+import math
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow ships with WeasyPrint; without it images pass through
+    Image = None
+
+PDF_IMAGE_DPI = int(os.environ.get('PDF_IMAGE_DPI', '200'))
+PDF_IMAGE_JPEG_QUALITY = int(os.environ.get('PDF_IMAGE_JPEG_QUALITY', '85'))
+PDF_IMAGE_CACHE_ENTRIES = int(os.environ.get('PDF_IMAGE_CACHE_ENTRIES', '128'))
+
+CSS_PX_PER_INCH = 96
+
+# Rendered width (CSS px) of .layout-1-image, which every solution layout
+# uses: 714px page content minus the image box's padding/border, at width: 90%
+SOLUTION_IMAGE_WIDTH = 605
+
+# Images with at most this many colours are treated as diagrams (palette PNG)
+PALETTE_MAX_COLORS = 256
+
+# Options handed to WeasyPrint for documents that embed solution images
+WEASYPRINT_IMAGE_OPTIONS = {
+    'optimize_images': True,
+    'jpeg_quality': PDF_IMAGE_JPEG_QUALITY,
+    'dpi': PDF_IMAGE_DPI,
+}
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def target_width():
+    """Pixel width an image needs to print sharply in the solution image box."""
+    return math.ceil(SOLUTION_IMAGE_WIDTH * PDF_IMAGE_DPI / CSS_PX_PER_INCH)
+
+
+def _encode(img):
+    """Re-encode a decoded image, returning (bytes, mime type)."""
+    output = io.BytesIO()
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+
+    if has_alpha:
+        img.convert('RGBA').save(output, format='PNG', optimize=True)
+        return output.getvalue(), 'image/png'
+
+    rgb = img.convert('RGB')
+    if rgb.getcolors(maxcolors=PALETTE_MAX_COLORS) is not None:
+        rgb.quantize(colors=PALETTE_MAX_COLORS).save(output, format='PNG', optimize=True)
+        return output.getvalue(), 'image/png'
+
+    rgb.save(output, format='JPEG', quality=PDF_IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+    return output.getvalue(), 'image/jpeg'
+
+
+def _normalize(base64_data):
+    raw = base64.b64decode(base64_data)
+    width = target_width()
+
+    with Image.open(io.BytesIO(raw)) as img:
+        source_mime = Image.MIME.get(img.format, 'image/png')
+        # Let the JPEG decoder subsample directly instead of inflating full size
+        img.draft('RGB', (width, 1))
+        resized = img.width > width
+        if resized:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        else:
+            img.load()
+        encoded, mime = _encode(img)
+
+    # Keep the upload when re-encoding a small image would only grow it
+    if not resized and len(encoded) >= len(raw):
+        return base64_data, source_mime
+    return base64.b64encode(encoded).decode('utf-8'), mime
+
+
+def normalize_image(base64_data):
+    """
+    Downscale and re-encode a base64 solution image for its layout box.
+    Args:
+        base64_data (str): Image bytes, base64 without the data: prefix.
+    Returns:
+        tuple: (base64 data, mime type). The input is returned unchanged if
+        Pillow is unavailable or the image cannot be decoded.
+    """
+    if not base64_data or Image is None:
+        return base64_data, 'image/png'
+
+    key = hashlib.sha256(f"{target_width()}:{base64_data}".encode('utf-8')).hexdigest()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+
+    try:
+        result = _normalize(base64_data)
+    except (binascii.Error, ValueError, OSError, Image.DecompressionBombError) as e:
+        print(f"⚠️ Could not normalize solution image, embedding as uploaded: {str(e)}", file=sys.stderr)
+        return base64_data, 'image/png'
+
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > PDF_IMAGE_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return result
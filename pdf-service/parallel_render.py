@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Opt-in multi-core rendering of large multi-solution reports.
+
+WeasyPrint lays out a document on a single core. Solutioning reports already
+break into independent pages (the cover plus one page-break-delimited page
+per solution), so in parallel mode those fragments are split into contiguous
+chunks, each chunk is laid out and written in its own process, and the chunk
+PDFs are concatenated in order with pypdf. Footers are per-page running
+elements without page counters, so every page reads the same as in a serial
+render and the merged page order is the document order.
+
+Enable per process with PDF_PARALLEL=1 or per payload with
+{"parallel": true}. Needs pypdf; without it rendering stays serial.
+"""
+
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from pdf_render import render_document, write_document
+from render_metrics import count, stage
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # optional: parallel mode falls back to a serial render
+    PdfReader = PdfWriter = None
+
+PDF_PARALLEL = os.environ.get('PDF_PARALLEL', '0') == '1'
+PDF_PARALLEL_WORKERS = int(os.environ.get('PDF_PARALLEL_WORKERS', str(os.cpu_count() or 1)))
+
+# Below this many solutions the process round trip costs more than it saves
+PDF_PARALLEL_MIN_SOLUTIONS = int(os.environ.get('PDF_PARALLEL_MIN_SOLUTIONS', '4'))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def is_parallel(data=None, total_solutions=0):
+    """Payload flag wins over PDF_PARALLEL; small documents always render serially."""
+    if PdfWriter is None or PDF_PARALLEL_WORKERS < 2:
+        return False
+    if total_solutions < PDF_PARALLEL_MIN_SOLUTIONS:
+        return False
+    if isinstance(data, dict) and 'parallel' in data:
+        return bool(data['parallel'])
+    return PDF_PARALLEL
+
+
+def get_pool():
+    """Chunk render pool, created on first parallel render."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_PARALLEL_WORKERS)
+        return _pool
+
+
+def _reset_pool(broken_pool):
+    global _pool
+    with _pool_lock:
+        if _pool is broken_pool:
+            _pool = None
+    broken_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def split_chunks(items, chunk_count):
+    """Split items into at most chunk_count contiguous, evenly sized chunks."""
+    chunk_count = max(1, min(chunk_count, len(items)))
+    size, extra = divmod(len(items), chunk_count)
+    chunks = []
+    start = 0
+    for index in range(chunk_count):
+        end = start + size + (1 if index < extra else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+def render_chunk(html_contents, deterministic, document_date, options):
+    """
+    Lay out a run of page fragments and write them as one PDF (runs in a pool process).
+    Args:
+        html_contents (list): Rendered template of each fragment, in order.
+        deterministic (bool): Pin the metadata timestamps.
+        document_date (str): 'YYYY-MM-DD' used for the metadata timestamps.
+        options (dict): WeasyPrint render/write options.
+    Returns:
+        bytes: PDF file bytes of the chunk.
+    """
+    documents = [render_document(html_content, **options) for html_content in html_contents]
+    merged = documents[0].copy([page for document in documents for page in document.pages])
+    return write_document(merged,
+                          deterministic=deterministic,
+                          seed=html_contents,
+                          document_date=document_date,
+                          **options)
+
+
+def merge_pdfs(chunk_pdfs):
+    """Concatenate chunk PDFs in order, keeping the first chunk's document info."""
+    writer = PdfWriter()
+    for index, pdf_bytes in enumerate(chunk_pdfs):
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        writer.append(reader)
+        if index == 0 and reader.metadata:
+            writer.add_metadata(reader.metadata)
+
+    count('pages', len(writer.pages))
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def render_parallel(template, fragments, deterministic=False, document_date=None, **options):
+    """
+    Render page fragments across the chunk pool and merge the result.
+    Args:
+        template: Compiled Jinja template every fragment is rendered from.
+        fragments (list): (kind, key_parts, context) tuples in page order, as
+            for fragment_cache.render_fragments().
+        deterministic (bool): Pin the metadata timestamps.
+        document_date (str): 'YYYY-MM-DD' used for the metadata timestamps.
+        options: WeasyPrint render/write options (must be picklable).
+    Returns:
+        bytes: PDF file bytes, or None if the pool broke (caller renders serially).
+    """
+    with stage('template'):
+        html_contents = [template.render(**context) for _, _, context in fragments]
+    chunks = split_chunks(html_contents, PDF_PARALLEL_WORKERS)
+
+    print(f"🐍 Rendering {len(html_contents)} page fragments in {len(chunks)} parallel chunks",
+          file=sys.stderr)
+
+    pool = get_pool()
+    try:
+        futures = [pool.submit(render_chunk, chunk, deterministic, document_date, options)
+                   for chunk in chunks]
+        with stage('parallel_chunks'):
+            chunk_pdfs = [future.result() for future in futures]
+    except BrokenProcessPool:
+        print("⚠️ Parallel render pool died, falling back to a serial render", file=sys.stderr)
+        _reset_pool(pool)
+        return None
+
+    with stage('merge'):
+        pdf_bytes = merge_pdfs(chunk_pdfs)
+    count('output_bytes', len(pdf_bytes))
+    return pdf_bytes
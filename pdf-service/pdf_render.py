@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+HTML -> PDF step shared by every generator.
+
+In deterministic mode the same input always produces byte-identical output:
+the PDF /CreationDate and /ModDate come from the document's own date (or a
+fixed epoch) rather than wall-clock time, and the PDF file identifier is
+derived from a hash of the input instead of being left to the writer.
+WeasyPrint already emits objects in document order, so nothing else varies
+between runs. Deterministic output is what lets the render cache, ETags and
+downstream dedupe key on content.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+
+from weasyprint import HTML
+
+from render_metrics import count, stage
+
+# Opt in per process (the render service turns it on) or per payload
+# with {"deterministic": true}
+PDF_DETERMINISTIC = os.environ.get('PDF_DETERMINISTIC', '0') == '1'
+
+# Used when the document has no usable date of its own
+FIXED_TIMESTAMP = '2000-01-01T00:00:00Z'
+
+
+def is_deterministic(data=None):
+    """Payload flag wins over the process-wide PDF_DETERMINISTIC setting."""
+    if isinstance(data, dict) and 'deterministic' in data:
+        return bool(data['deterministic'])
+    return PDF_DETERMINISTIC
+
+
+def input_digest(data):
+    """Stable SHA-256 hex digest of a JSON-serializable input."""
+    if isinstance(data, str):
+        normalized = data
+    else:
+        normalized = json.dumps(data, sort_keys=True, separators=(',', ':'),
+                                ensure_ascii=False, default=str)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def document_timestamp(date_str):
+    """W3C timestamp for a 'YYYY-MM-DD' document date, FIXED_TIMESTAMP otherwise."""
+    try:
+        date_obj = datetime.datetime.strptime(date_str or '', '%Y-%m-%d')
+        return date_obj.strftime('%Y-%m-%dT00:00:00Z')
+    except ValueError:
+        return FIXED_TIMESTAMP
+
+
+def render_document(html_content, **options):
+    """Lay out an HTML string into a WeasyPrint Document."""
+    with stage('html_parse'):
+        html = HTML(string=html_content)
+    with stage('layout'):
+        return html.render(**options)
+
+
+def write_document(document, target=None, deterministic=False, seed=None,
+                   document_date=None, **options):
+    """
+    Write an already laid-out Document to PDF.
+    Args:
+        document: WeasyPrint Document (e.g. pages merged from several renders).
+        target: Path or file object to write to; bytes are returned if None.
+        deterministic (bool): Pin timestamps and the file identifier.
+        seed: Generator input (dict or str) the identifier is derived from.
+            Required in deterministic mode.
+        document_date (str): 'YYYY-MM-DD' used for the metadata timestamps.
+        options: Extra WeasyPrint options (optimize_images, ...).
+    Returns:
+        bytes: PDF file bytes if target is None, otherwise None.
+    """
+    if deterministic:
+        timestamp = document_timestamp(document_date)
+        document.metadata.created = timestamp
+        document.metadata.modified = timestamp
+        digest = input_digest(seed)
+        options['pdf_identifier'] = digest[:32].encode('ascii')
+
+    with stage('serialize'):
+        pdf_bytes = document.write_pdf(target, **options)
+
+    count('pages', len(document.pages))
+    if pdf_bytes is not None:
+        count('output_bytes', len(pdf_bytes))
+    elif isinstance(target, (str, os.PathLike)):
+        count('output_bytes', os.path.getsize(target))
+    return pdf_bytes
+
+
+def write_pdf(html_content, target=None, deterministic=False, seed=None,
+              document_date=None, **options):
+    """
+    Render an HTML string to PDF.
+    Args:
+        html_content (str): Rendered template.
+        target: Path or file object to write to; bytes are returned if None.
+        deterministic (bool): Pin timestamps and the file identifier.
+        seed: Generator input (dict or str) the identifier is derived from;
+            defaults to html_content. Only hashed in deterministic mode.
+        document_date (str): 'YYYY-MM-DD' used for the metadata timestamps.
+        options: Extra WeasyPrint options (stylesheets, optimize_images, ...).
+    Returns:
+        bytes: PDF file bytes if target is None, otherwise None.
+    """
+    document = render_document(html_content, **options)
+    return write_document(document, target,
+                          deterministic=deterministic,
+                          seed=seed if seed is not None else html_content,
+                          document_date=document_date,
+                          **options)
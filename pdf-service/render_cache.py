@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Two-tier cache of rendered PDFs for the render service.
+
+Entries are keyed by a canonical hash of (document type, template version,
+render options, normalized input), so re-previewing unchanged session data
+returns the stored bytes instead of re-running the WeasyPrint layout. The memory tier is an LRU
+bounded by total bytes; the disk tier lives in PDF_CACHE_DIR, is bounded by
+PDF_CACHE_DISK_BYTES and evicts least-recently-used files first.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+import parallel_render
+import template_env
+from image_pipeline import PDF_IMAGE_DPI, PDF_IMAGE_JPEG_QUALITY
+from pdf_render import is_deterministic
+
+# Bump when a generator change alters output without touching a template
+RENDER_CACHE_VERSION = '3'
+
+PDF_CACHE_ENABLED = os.environ.get('PDF_CACHE_ENABLED', '1') != '0'
+PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR',
+                               os.path.join(tempfile.gettempdir(), 'nexa-pdf-render-cache'))
+PDF_CACHE_MEMORY_BYTES = int(os.environ.get('PDF_CACHE_MEMORY_BYTES', str(64 * 1024 * 1024)))
+PDF_CACHE_DISK_BYTES = int(os.environ.get('PDF_CACHE_DISK_BYTES', str(512 * 1024 * 1024)))
+
+
+def render_options(payload):
+    """
+    Settings outside the payload that change the rendered bytes: image
+    resampling, pinned metadata timestamps and how pages are split across
+    the parallel chunk pool. The disk tier outlives the process, so a
+    restart with different settings must not serve the old renders.
+    """
+    parallel = None
+    if parallel_render.PdfWriter is not None and parallel_render.PDF_PARALLEL_WORKERS >= 2:
+        parallel = {
+            'default': parallel_render.PDF_PARALLEL,
+            'workers': parallel_render.PDF_PARALLEL_WORKERS,
+            'min_solutions': parallel_render.PDF_PARALLEL_MIN_SOLUTIONS,
+        }
+    return {
+        'image_dpi': PDF_IMAGE_DPI,
+        'jpeg_quality': PDF_IMAGE_JPEG_QUALITY,
+        'deterministic': is_deterministic(payload),
+        'parallel': parallel,
+    }
+
+
+def canonical_key(doc_type, payload):
+    """
+    Hash of the normalized input and the render options it is rendered
+    with. JSON payloads are serialized with sorted keys and no
+    insignificant whitespace so key order in the request body does not
+    matter; HTML payloads are hashed as-is.
+    """
+    if isinstance(payload, str):
+        normalized = payload
+    else:
+        normalized = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    options = json.dumps(render_options(payload), sort_keys=True, separators=(',', ':'))
+
+    digest = hashlib.sha256()
+    for part in (doc_type, RENDER_CACHE_VERSION, template_env.template_version(), options, normalized):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """In-memory LRU in front of a size-bounded disk directory."""
+
+    def __init__(self, cache_dir, memory_bytes, disk_bytes):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = OrderedDict()  # key -> size, least recently used first
+        self._disk_size = 0
+        self._disk_enabled = disk_bytes > 0
+
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0,
+        }
+
+        if self._disk_enabled:
+            self._load_disk_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def _load_disk_index(self):
+        """Rebuild the LRU order of the disk tier from file mtimes."""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.pdf'):
+                    continue
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, name[:-len('.pdf')], stat.st_size))
+        except OSError as e:
+            print(f"⚠️ Render cache disk tier disabled: {str(e)}", file=sys.stderr)
+            self._disk_enabled = False
+            return
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+        self._evict_disk()
+
+    def _store_memory(self, key, pdf_bytes):
+        if len(pdf_bytes) > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        self._memory[key] = pdf_bytes
+        self._memory_size += len(pdf_bytes)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+            self.stats['memory_evictions'] += 1
+
+    def _evict_disk(self):
+        while self._disk_size > self.disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            self.stats['disk_evictions'] += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def get(self, key):
+        """Return cached PDF bytes for key, or None."""
+        with self._lock:
+            pdf_bytes = self._memory.get(key)
+            if pdf_bytes is not None:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return pdf_bytes
+
+            if self._disk_enabled and key in self._disk:
+                try:
+                    with open(self._path(key), 'rb') as f:
+                        pdf_bytes = f.read()
+                    os.utime(self._path(key))
+                except OSError:
+                    self._disk_size -= self._disk.pop(key)
+                    pdf_bytes = None
+                if pdf_bytes is not None:
+                    self._disk.move_to_end(key)
+                    self._store_memory(key, pdf_bytes)
+                    self.stats['disk_hits'] += 1
+                    return pdf_bytes
+
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key, pdf_bytes):
+        with self._lock:
+            self.stats['stores'] += 1
+            self._store_memory(key, pdf_bytes)
+
+            if not self._disk_enabled or len(pdf_bytes) > self.disk_bytes:
+                return
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(pdf_bytes)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"⚠️ Could not write render cache entry: {str(e)}", file=sys.stderr)
+                return
+            if key in self._disk:
+                self._disk_size -= self._disk.pop(key)
+            self._disk[key] = len(pdf_bytes)
+            self._disk_size += len(pdf_bytes)
+            self._evict_disk()
+
+    def snapshot(self):
+        """Counters plus current tier sizes, for the /cache/stats endpoint."""
+        with self._lock:
+            lookups = self.stats['memory_hits'] + self.stats['disk_hits'] + self.stats['misses']
+            hits = lookups - self.stats['misses']
+            return {
+                **self.stats,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_size,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_size,
+            }
+
+
+render_cache = RenderCache(PDF_CACHE_DIR, PDF_CACHE_MEMORY_BYTES, PDF_CACHE_DISK_BYTES) \
+    if PDF_CACHE_ENABLED else None
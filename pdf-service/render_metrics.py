@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Stage-level timing and memory instrumentation for the PDF generators.
+
+Every traced render emits exactly one JSON record on stderr, on a line that
+starts with METRICS_PREFIX so callers can pick it out of the emoji status
+output:
+
+    PDF_METRICS {"event": "pdf_render", "doc_type": "sow", "status": "ok",
+                 "total_ms": 812.4, "peak_rss_kb": 98304, "pages": 4,
+                 "image_bytes": 48211, "output_bytes": 151220,
+                 "stages": {"parse": {"ms": 0.4, "calls": 1, "peak_rss_kb": ...},
+                            "logos": ..., "template": ..., "html_parse": ...,
+                            "layout": ..., "serialize": ...}}
+
+Stages that run several times per render (e.g. one layout per page
+fragment) are summed, with their call count. peak_rss_kb is the process
+high-water mark when the stage finished, so the first stage where it jumps
+is the one that allocated. The active trace is held in a context variable,
+so the helpers here are no-ops outside a traced call and nested traced
+calls (a script's main() calling its generator) share one record.
+
+PDF_METRICS=0 turns instrumentation off; PDF_METRICS_FILE additionally
+appends every record to that file as NDJSON.
+"""
+
+import functools
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+PDF_METRICS = os.environ.get('PDF_METRICS', '1') != '0'
+PDF_METRICS_FILE = os.environ.get('PDF_METRICS_FILE', '')
+
+METRICS_PREFIX = 'PDF_METRICS '
+
+_current_trace = ContextVar('render_trace', default=None)
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux but bytes on macOS
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class RenderTrace:
+    """Stage timings and counters collected for one render."""
+
+    def __init__(self, doc_type):
+        self.doc_type = doc_type
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+
+    def add_stage(self, name, seconds):
+        entry = self.stages.setdefault(name, {'ms': 0.0, 'calls': 0, 'peak_rss_kb': None})
+        entry['ms'] += seconds * 1000
+        entry['calls'] += 1
+        entry['peak_rss_kb'] = peak_rss_kb()
+
+    def record(self):
+        return {
+            'event': 'pdf_render',
+            'doc_type': self.doc_type,
+            'pid': os.getpid(),
+            # A render that produced output is a success; generators swallow
+            # their errors and return None, so there is nothing else to go by
+            'status': 'ok' if self.counters.get('output_bytes') else 'error',
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'peak_rss_kb': peak_rss_kb(),
+            **self.counters,
+            'stages': {
+                name: {**entry, 'ms': round(entry['ms'], 2)}
+                for name, entry in self.stages.items()
+            },
+        }
+
+
+def emit(record):
+    line = json.dumps(record, separators=(',', ':'))
+    print(f"{METRICS_PREFIX}{line}", file=sys.stderr)
+    if PDF_METRICS_FILE:
+        try:
+            with open(PDF_METRICS_FILE, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            print(f"⚠️ Could not write render metrics: {str(e)}", file=sys.stderr)
+
+
+def traced(doc_type):
+    """
+    Decorator: run the function inside a render trace for doc_type and emit
+    its record when it returns (or raises, including sys.exit()). Calls made
+    while a trace is already active join that trace.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not PDF_METRICS or _current_trace.get() is not None:
+                return fn(*args, **kwargs)
+
+            trace = RenderTrace(doc_type)
+            token = _current_trace.set(trace)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _current_trace.reset(token)
+                emit(trace.record())
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def stage(name):
+    """Time a stage of the active render (no-op without one)."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_stage(name, time.perf_counter() - start)
+
+
+def count(name, value):
+    """Add value to a counter (pages, image_bytes, output_bytes) of the active render."""
+    trace = _current_trace.get()
+    if trace is not None and value:
+        trace.counters[name] = trace.counters.get(name, 0) + value
+
+
+def count_image(base64_data):
+    """Count the decoded size of an embedded base64 image."""
+    if base64_data:
+        count('image_bytes', len(base64_data) * 3 // 4)
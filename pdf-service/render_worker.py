@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+from generate_solutioning_standalone import generate_solutioning_pdf_from_json
+from generate_sow_standalone import generate_sow_pdf_from_json
+from generate_loe_standalone import generate_loe_pdf_from_json
+from html_to_pdf import convert_html_to_pdf
+import template_env
+
+# Document type -> generator. JSON document types take the parsed payload,
+# 'html' takes the raw template string.
+RENDERERS = {
+    'solutioning': generate_solutioning_pdf_from_json,
+    'sow': generate_sow_pdf_from_json,
+    'loe': generate_loe_pdf_from_json,
+    'html': convert_html_to_pdf,
+}
+
+WARM_UP_HTML = """
+<!DOCTYPE html>
+<html><head><meta charset="utf-8"></head>
+<body style="font-family: Arial, Helvetica, sans-serif;"><p>Warm-up</p></body>
+</html>
+"""
+
+def init_worker():
+    """
+    Process pool initializer: the generator imports above already pulled in
+    WeasyPrint/cairo/pango, this compiles the templates and runs one
+    throwaway render so fontconfig and the font caches are hot before the
+    first real request lands.
+    """
+    try:
+        template_env.preload()
+        convert_html_to_pdf(WARM_UP_HTML)
+        print(f"🔥 Render worker {os.getpid()} warmed up", file=sys.stderr)
+    except Exception as e:
+        # A failed warm-up is not fatal, the first real render pays instead
+        print(f"⚠️ Render worker {os.getpid()} warm-up failed: {str(e)}", file=sys.stderr)
+
+def render(doc_type, payload):
+    """
+    Render one document inside a worker process.
+    Args:
+        doc_type (str): One of RENDERERS' keys.
+        payload: Parsed JSON dict for document types, HTML string for 'html'.
+    Returns:
+        bytes: PDF file bytes, or None if generation failed.
+    """
+    renderer = RENDERERS.get(doc_type)
+    if renderer is None:
+        raise ValueError(f"Unknown document type: {doc_type}")
+    return renderer(payload)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Shared Jinja environment for the PDF generators.
+
+Templates live in ./templates and are compiled at most once per process:
+get_template() keeps every compiled template in a registry, and the
+on-disk bytecode cache lets a fresh process (e.g. one of the standalone
+scripts spawned per request) skip parsing/compiling as well.
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+from functools import lru_cache
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+# Every template the generators render, compiled up front by preload()
+TEMPLATE_NAMES = (
+    'solutioning.html',
+    'sow.html',
+    'loe.html',
+    'loe_document.html',
+)
+
+BYTECODE_CACHE_DIR = os.environ.get(
+    'PDF_TEMPLATE_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'nexa-pdf-template-cache'))
+
+
+def _make_bytecode_cache():
+    """Bytecode cache in BYTECODE_CACHE_DIR, or None if it is not writable."""
+    try:
+        os.makedirs(BYTECODE_CACHE_DIR, exist_ok=True)
+        return FileSystemBytecodeCache(BYTECODE_CACHE_DIR)
+    except OSError as e:
+        print(f"⚠️ Template bytecode cache disabled: {str(e)}", file=sys.stderr)
+        return None
+
+
+# Same defaults as a bare jinja2.Template (no autoescape), so output is
+# unchanged. auto_reload is off: templates only change on deploy.
+env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    bytecode_cache=_make_bytecode_cache(),
+    auto_reload=False,
+)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_template(name):
+    """Return the compiled template for name, compiling it on first use only."""
+    template = _registry.get(name)
+    if template is None:
+        with _registry_lock:
+            template = _registry.get(name)
+            if template is None:
+                template = env.get_template(name)
+                _registry[name] = template
+    return template
+
+
+def preload():
+    """Compile every known template, e.g. from a render worker initializer."""
+    for name in TEMPLATE_NAMES:
+        get_template(name)
+
+
+@lru_cache(maxsize=None)
+def template_version():
+    """Hash of every template source, so caches keyed on it drop stale output on deploy."""
+    digest = hashlib.sha256()
+    for name in TEMPLATE_NAMES:
+        source, _, _ = env.loader.get_source(env, name)
+        digest.update(name.encode('utf-8'))
+        digest.update(source.encode('utf-8'))
+    return digest.hexdigest()[:16]
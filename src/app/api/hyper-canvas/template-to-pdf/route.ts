@@ -1,6 +1,7 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { spawn } from 'child_process'
 import path from 'path'
+import { renderWithPdfService } from '@/lib/pdf/pdf-service-client'
 
 export async function POST(request: NextRequest) {
   try {
@@ -18,8 +19,8 @@ export async function POST(request: NextRequest) {
     
     console.log('📊 Template-to-PDF: Template length:', htmlTemplate.length, 'characters')
     
-    // Call Python script to convert HTML to PDF
-    const pdfBuffer = await convertHtmlToPdf(htmlTemplate)
+    // Prefer the resident PDF service, fall back to spawning the Python script
+    const pdfBuffer = await renderWithPdfService('html', htmlTemplate) ?? await convertHtmlToPdf(htmlTemplate)
     
     if (!pdfBuffer) {
       throw new Error('Failed to convert HTML template to PDF')
@@ -3,6 +3,7 @@ import { spawn } from 'child_process'
 import path from 'path'
 import { getUserRoleFromRequest } from '@/lib/api-rbac'
 import { getOrganizationPreferences } from '@/lib/preferences/preferences-service'
+import { renderWithPdfService } from '@/lib/pdf/pdf-service-client'
 
 export async function POST(request: NextRequest) {
   try {
@@ -71,57 +72,8 @@ export async function POST(request: NextRequest) {
       bestOptionsCount: pythonData.bestOptions.length
     })
 
-    // Path to the Python script
-    const scriptPath = path.join(process.cwd(), 'pdf-service', 'generate_loe_standalone.py')
-    console.log('🐍 LOE PDF Download: Using Python script at:', scriptPath)
-
-    // Spawn Python process
-    const python = spawn('python3', [scriptPath], {
-      stdio: ['pipe', 'pipe', 'pipe']
-    })
-
-    const chunks: Buffer[] = []
-    const errorChunks: Buffer[] = []
-
-    // Collect stdout (PDF data)
-    python.stdout.on('data', (chunk) => {
-      chunks.push(chunk)
-    })
-
-    // Collect stderr (error messages)
-    python.stderr.on('data', (chunk) => {
-      errorChunks.push(chunk)
-    })
-
-    // Send JSON data to Python script via stdin
-    python.stdin.write(JSON.stringify(pythonData))
-    python.stdin.end()
-
-    // Wait for Python process to complete
-    const result = await new Promise<Buffer>((resolve, reject) => {
-      python.on('close', (code) => {
-        const errorOutput = Buffer.concat(errorChunks).toString()
-        
-        if (errorOutput) {
-          console.log('🐍 LOE PDF Download: Python stderr:', errorOutput)
-        }
-
-        if (code === 0 && chunks.length > 0) {
-          const pdfBuffer = Buffer.concat(chunks)
-          console.log('✅ LOE PDF Download: Successfully generated PDF, size:', pdfBuffer.length, 'bytes')
-          resolve(pdfBuffer)
-        } else {
-          const errorMessage = errorOutput || `Python script failed with exit code: ${code}`
-          console.error('❌ LOE PDF Download: Python script failed:', errorMessage)
-          reject(new Error(`Python script failed with code: ${code}, error: ${errorMessage}`))
-        }
-      })
-
-      python.on('error', (error) => {
-        console.error('❌ LOE PDF Download: Python process error:', error)
-        reject(error)
-      })
-    })
+    // Prefer the resident PDF service, fall back to spawning the script
+    const result = await renderWithPdfService('loe', pythonData) ?? await callPythonScript(pythonData)
 
     // Generate filename with project name and date
     const projectName = pythonData.basic.project?.replace(/[^a-zA-Z0-9]/g, '_') || 'LOE'
@@ -146,4 +98,56 @@ export async function POST(request: NextRequest) {
   }
 }
 
+async function callPythonScript(pythonData: any): Promise<Buffer> {
+  // Path to the Python script
+  const scriptPath = path.join(process.cwd(), 'pdf-service', 'generate_loe_standalone.py')
+  console.log('🐍 LOE PDF Download: Using Python script at:', scriptPath)
+
+  // Spawn Python process
+  const python = spawn('python3', [scriptPath], {
+    stdio: ['pipe', 'pipe', 'pipe']
+  })
+
+  const chunks: Buffer[] = []
+  const errorChunks: Buffer[] = []
+
+  // Collect stdout (PDF data)
+  python.stdout.on('data', (chunk) => {
+    chunks.push(chunk)
+  })
+
+  // Collect stderr (error messages)
+  python.stderr.on('data', (chunk) => {
+    errorChunks.push(chunk)
+  })
+
+  // Send JSON data to Python script via stdin
+  python.stdin.write(JSON.stringify(pythonData))
+  python.stdin.end()
+
+  // Wait for Python process to complete
+  return new Promise<Buffer>((resolve, reject) => {
+    python.on('close', (code) => {
+      const errorOutput = Buffer.concat(errorChunks).toString()
+      
+      if (errorOutput) {
+        console.log('🐍 LOE PDF Download: Python stderr:', errorOutput)
+      }
 
+      if (code === 0 && chunks.length > 0) {
+        const pdfBuffer = Buffer.concat(chunks)
+        console.log('✅ LOE PDF Download: Successfully generated PDF, size:', pdfBuffer.length, 'bytes')
+        resolve(pdfBuffer)
+      } else {
+        const errorMessage = errorOutput || `Python script failed with exit code: ${code}`
+        console.error('❌ LOE PDF Download: Python script failed:', errorMessage)
+        reject(new Error(`Python script failed with code: ${code}, error: ${errorMessage}`))
+      }
+    })
+
+    python.on('error', (error) => {
+      console.error('❌ LOE PDF Download: Python process error:', error)
+      reject(error)
+    })
+  })
+}
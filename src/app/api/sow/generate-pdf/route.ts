@@ -3,6 +3,7 @@ import { spawn } from 'child_process'
 import path from 'path'
 import { getUserRoleFromRequest } from '@/lib/api-rbac'
 import { getOrganizationPreferences } from '@/lib/preferences/preferences-service'
+import { renderWithPdfService } from '@/lib/pdf/pdf-service-client'
 
 export async function POST(request: NextRequest) {
   try {
@@ -83,8 +84,8 @@ export async function POST(request: NextRequest) {
     
     console.log('📊 SOW PDF Download: Python data:', pythonData)
     
-    // Call Python script
-    const pdfBuffer = await callPythonScript(pythonData)
+    // Prefer the resident PDF service, fall back to spawning the Python script
+    const pdfBuffer = await renderWithPdfService('sow', pythonData) ?? await callPythonScript(pythonData)
     
     if (!pdfBuffer) {
       throw new Error('Failed to generate PDF')
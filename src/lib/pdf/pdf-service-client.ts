@@ -0,0 +1,102 @@
+/**
+ * Client for the resident Python PDF service (pdf-service/app.py).
+ *
+ * When PDF_SERVICE_URL is set, renders go to the warm worker pool over HTTP
+ * instead of spawning a fresh python3 process per request. Returns null when
+ * the service is not configured or the call fails, so callers can fall back
+ * to spawning the standalone script.
+ */
+
+import { createHash } from 'crypto'
+
+export type PdfDocumentType = 'solutioning' | 'sow' | 'loe' | 'html'
+
+const ENDPOINTS: Record<PdfDocumentType, string> = {
+  solutioning: '/solutioning-pdf',
+  sow: '/sow-pdf',
+  loe: '/loe-pdf',
+  html: '/html-to-pdf'
+}
+
+// Organization logos are registered with the service once and then sent as
+// "sha256:<digest>" references instead of the full base64 string.
+const LOGO_KEYS = ['mainLogo', 'secondLogo'] as const
+const registeredLogos = new Map<string, string>()
+
+async function toAssetRef(baseUrl: string, value: string): Promise<string> {
+  if (!value || value.startsWith('sha256:')) {
+    return value
+  }
+
+  const key = createHash('sha256').update(value).digest('hex')
+  const knownRef = registeredLogos.get(key)
+  if (knownRef) {
+    return knownRef
+  }
+
+  try {
+    const response = await fetch(`${baseUrl}/assets`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'text/plain' },
+      body: value
+    })
+    if (!response.ok) {
+      return value
+    }
+    const { ref } = await response.json()
+    registeredLogos.set(key, ref)
+    return ref
+  } catch {
+    return value
+  }
+}
+
+async function withAssetRefs(baseUrl: string, payload: any): Promise<any> {
+  const result = { ...payload }
+  for (const key of LOGO_KEYS) {
+    if (typeof result[key] === 'string') {
+      result[key] = await toAssetRef(baseUrl, result[key])
+    }
+  }
+  return result
+}
+
+export async function renderWithPdfService(
+  docType: PdfDocumentType,
+  payload: any
+): Promise<Buffer | null> {
+  const configuredUrl = process.env.PDF_SERVICE_URL
+  if (!configuredUrl) {
+    return null
+  }
+  const baseUrl = configuredUrl.replace(/\/$/, '')
+
+  try {
+    const isHtml = docType === 'html'
+    const post = async (body: any) => fetch(`${baseUrl}${ENDPOINTS[docType]}`, {
+      method: 'POST',
+      headers: { 'Content-Type': isHtml ? 'text/html; charset=utf-8' : 'application/json' },
+      body: isHtml ? body : JSON.stringify(body)
+    })
+
+    let response = await post(isHtml ? payload : await withAssetRefs(baseUrl, payload))
+
+    if (response.status === 422 && !isHtml) {
+      // The service lost a registered logo (e.g. fresh asset dir) - send inline and re-register next time
+      registeredLogos.clear()
+      response = await post(payload)
+    }
+
+    if (!response.ok) {
+      console.warn(`⚠️ PDF service returned ${response.status} for ${docType}, falling back to script`)
+      return null
+    }
+
+    const pdfBuffer = Buffer.from(await response.arrayBuffer())
+    console.log(`✅ PDF service rendered ${docType}, size:`, pdfBuffer.length, 'bytes')
+    return pdfBuffer
+  } catch (error) {
+    console.warn(`⚠️ PDF service unavailable for ${docType}, falling back to script:`, error)
+    return null
+  }
+}